@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src.config import TIMEFRAME, CPU_BUDGET
+from src.fees import DEFAULT_TAKER_FEE, network_fee
+from src.label import HORIZON
+from src.schema import FEATURE_COLS, pooled_matrix
+from src.storage import list_symbols, read_table, timeframe_dir
+
+
+def load_history(symbols: list, timeframe: str = TIMEFRAME) -> pd.DataFrame:
+    """Features gravadas de todos os `symbols` num DataFrame longo (date, symbol, FEATURE_COLS)."""
+    frames = []
+    for symbol in symbols:
+        try:
+            df = read_table('features', symbol, columns=['date'] + FEATURE_COLS, timeframe=timeframe)
+        except FileNotFoundError:
+            print(f"[SKIP] {symbol}: features não encontradas")
+            continue
+        frames.append(df.assign(symbol=symbol))
+    if not frames:
+        raise ValueError("Nenhum símbolo com features")
+    return pd.concat(frames, ignore_index=True)
+
+
+def _walk_forward(train_dates: np.ndarray, X_train: np.ndarray, y_train: np.ndarray, test_dates: np.ndarray,
+                  X_test: np.ndarray, params: dict, cpu_budget: int) -> np.ndarray:
+    """
+    Sinal de cada linha de teste dado por um modelo que não viu a data:
+    para cada fold de model.date_folds (com HORIZON datas entre treino e
+    teste, pois o label de uma vela usa o fechamento HORIZON velas à
+    frente), treina com as linhas até o fim do treino e avalia as linhas
+    de teste do período seguinte. O último período vai até o fim do
+    histórico (velas ainda sem label); antes do primeiro, NaN.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from src.model import date_folds
+
+    signal = np.full(len(test_dates), np.nan)
+    folds = date_folds(train_dates, gap=HORIZON)
+    for k, (fold_train, fold_test) in enumerate(folds):
+        rows = test_dates >= fold_test[0]
+        if k < len(folds) - 1:
+            rows &= test_dates <= fold_test[-1]
+        rows = np.flatnonzero(rows)
+        if not len(rows):
+            continue
+        train = np.flatnonzero(train_dates <= fold_train[-1])
+        model = RandomForestClassifier(**params, n_jobs=cpu_budget).fit(X_train[train], y_train[train])
+        signal[rows] = model.predict(X_test[rows])
+    return signal
+
+
+def historical_signals(df: pd.DataFrame, timeframe: str = TIMEFRAME, pooled: bool = False,
+                       cpu_budget: int = CPU_BUDGET) -> np.ndarray:
+    """
+    Sinal fora da amostra de cada linha de `df` (de load_history): os
+    modelos são retreinados walk-forward com as features e labels
+    gravados (ver _walk_forward), nos mesmos folds por data do treino e
+    com os parâmetros do --tune, se houver. Os modelos finais gravados
+    não são usados: foram treinados sobre este mesmo histórico.
+    NaN nas linhas sem modelo (início do histórico ou símbolo sem labels).
+    """
+    from src.model import load_params, load_symbol_frame, load_pooled_frame
+    from src.parallel import SkipSymbol
+
+    signal = np.full(len(df), np.nan)
+    dates = df['date'].to_numpy()
+    if pooled:
+        train = load_pooled_frame(timeframe)
+        ids = {s: i for i, s in enumerate(sorted(train['symbol'].unique()))}
+        known = np.flatnonzero(df['symbol'].isin(ids).to_numpy())
+        rows = df.iloc[known]
+        signal[known] = _walk_forward(
+            train['date'].to_numpy(), pooled_matrix(train, train['symbol'].map(ids).to_numpy()),
+            train['label'].to_numpy(), dates[known], pooled_matrix(rows, rows['symbol'].map(ids).to_numpy()),
+            load_params('pooled', timeframe), cpu_budget)
+        return signal
+
+    for symbol, idx in df.groupby('symbol').indices.items():
+        try:
+            train = load_symbol_frame(symbol, timeframe)
+        except (SkipSymbol, FileNotFoundError) as e:
+            print(f"[SKIP] {symbol}: sem features/labels para o treino ({e})")
+            continue
+        signal[idx] = _walk_forward(train['date'].to_numpy(), train[FEATURE_COLS].to_numpy(dtype=float),
+                                    train['label'].to_numpy(), dates[idx],
+                                    df[FEATURE_COLS].iloc[idx].to_numpy(dtype=float),
+                                    load_params(symbol, timeframe), cpu_budget)
+    return signal
+
+
+def to_panel(df: pd.DataFrame) -> tuple:
+    """
+    Matrizes (datas × símbolos) de close e signal a partir do DataFrame
+    longo; NaN onde o símbolo não tem vela (ou sinal).
+    """
+    close = df.pivot(index='date', columns='symbol', values='close').sort_index()
+    signal = df.pivot(index='date', columns='symbol', values='signal').reindex_like(close)
+    return close.index, list(close.columns), close.to_numpy(dtype=float), signal.to_numpy(dtype=float)
+
+
+def run_backtest(dates, symbols: list, close: np.ndarray, signal: np.ndarray, capital: float = 10000.0,
+                 hold: int = HORIZON, taker_fee: float = DEFAULT_TAKER_FEE) -> dict:
+    """
+    Estratégia de simulation.simulate_purchase repetida sobre o histórico:
+    a cada `hold` velas, o capital é dividido igualmente entre os símbolos
+    com sinal 1, descontando a taxa taker e a taxa de rede (fees.py) na
+    compra; as posições são vendidas `hold` velas depois (com taxa taker).
+    Sem sinais, o capital fica em caixa. Só o capital de cada período é
+    sequencial (K escalares); o resto é vetorizado no painel.
+    Retorna curvas (equity, drawdown) por data e as métricas.
+    """
+    T, S = close.shape
+    starts = np.arange(0, T - hold, hold)
+    entry, exit_ = close[starts], close[starts + hold]
+    picked = (signal[starts] == 1) & np.isfinite(entry) & np.isfinite(exit_)
+    n = picked.sum(axis=1)
+    ratio = np.where(picked, exit_ / np.where(picked, entry, 1.0), 0.0)
+    net_fee = np.array([network_fee(s) for s in symbols])
+
+    # Capital por período: per_asset = (capital/n − taxa de rede) / (1 + taker)
+    per_asset = np.zeros(picked.shape)
+    cash = np.zeros(len(starts))
+    equity_start = np.empty(len(starts) + 1)
+    equity_start[0] = capital
+    for k in range(len(starts)):
+        budget = equity_start[k] / n[k] if n[k] else 0.0
+        alloc = np.where(picked[k], (budget - net_fee) / (1 + taker_fee), 0.0)
+        alloc[alloc < 0] = 0.0            # capital insuficiente para a taxa de rede
+        spent = (alloc * (1 + taker_fee) + np.where(alloc > 0, net_fee, 0.0)).sum()
+        per_asset[k] = alloc
+        cash[k] = equity_start[k] - spent
+        equity_start[k + 1] = cash[k] + (alloc * ratio[k]).sum() * (1 - taker_fee)
+
+    # Curva diária: quantidades de cada período marcadas a mercado
+    qty = np.where(per_asset > 0, per_asset / np.where(picked, entry, 1.0), 0.0)
+    period = np.minimum(np.arange(T) // hold, len(starts) - 1) if len(starts) else np.zeros(T, dtype=int)
+    rows = np.arange(len(starts) * hold) if len(starts) else np.arange(0)
+    marked = np.nan_to_num(close[rows]) * qty[period[rows]]
+    equity = cash[period[rows]] + marked.sum(axis=1) * (1 - taker_fee)
+    equity = np.append(equity, equity_start[-1])
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    trade_ret = np.where(per_asset > 0, ratio * (1 - taker_fee) * per_asset /
+                         np.where(per_asset > 0, per_asset * (1 + taker_fee) + net_fee, 1.0) - 1, np.nan)
+    trades = np.isfinite(trade_ret)
+    years = max((pd.Timestamp(dates[len(rows)]) - pd.Timestamp(dates[0])).days / 365.25, 1e-9) if len(rows) else 0
+    metrics = {
+        'capital_inicial': capital,
+        'capital_final': float(equity[-1]),
+        'retorno_total': float(equity[-1] / capital - 1),
+        'cagr': float((equity[-1] / capital) ** (1 / years) - 1) if years else 0.0,
+        'max_drawdown': float(drawdown.min()),
+        'operacoes': int(trades.sum()),
+        'taxa_acerto': float((trade_ret[trades] > 0).mean()) if trades.any() else 0.0,
+        'exposicao': float((n > 0).mean()) if len(n) else 0.0,
+        'periodos': int(len(starts)),
+        'hold': hold,
+        'taker_fee': taker_fee,
+    }
+    curve = pd.DataFrame({'equity': equity, 'drawdown': drawdown},
+                         index=pd.Index(dates[:len(equity)], name='date'))
+    return {'curve': curve, 'metrics': metrics}
+
+
+def main(timeframe: str = TIMEFRAME, capital: float = 10000.0, hold: int = HORIZON,
+         taker_fee: float = DEFAULT_TAKER_FEE, pooled: bool = False):
+    """
+    Backtest offline de todos os símbolos com features e labels gravados,
+    com sinais fora da amostra (ver historical_signals), a partir do
+    primeiro período de teste do walk-forward. Compara com o peso igual
+    em todas as moedas disponíveis no mesmo período (mesmas taxas) e
+    grava as curvas e as métricas em <timeframe>/backtest/.
+    """
+    start = time.perf_counter()
+    df = load_history(list_symbols('features', timeframe=timeframe), timeframe)
+    # Só as datas de rebalanceamento precisam de sinal
+    all_dates = np.sort(df['date'].unique())
+    rebalance = df['date'].isin(all_dates[np.arange(0, max(len(all_dates) - hold, 0), hold)]).to_numpy()
+    df['signal'] = np.nan
+    df.loc[rebalance, 'signal'] = historical_signals(df[rebalance], timeframe, pooled)
+    if df['signal'].isna().all():
+        raise ValueError("Nenhum sinal fora da amostra: histórico curto demais para o walk-forward")
+    # Estratégia e benchmark só no período fora da amostra (a partir de uma data de rebalanceamento)
+    df = df[df['date'] >= df.loc[df['signal'].notna(), 'date'].min()]
+    dates, symbols, close, signal = to_panel(df)
+    result = run_backtest(dates, symbols, close, signal, capital, hold, taker_fee)
+    bench = run_backtest(dates, symbols, close, np.isfinite(close).astype(float), capital, hold, taker_fee)
+    elapsed = time.perf_counter() - start
+
+    out_dir = os.path.join(timeframe_dir(timeframe), 'backtest')
+    os.makedirs(out_dir, exist_ok=True)
+    curve = result['curve'].join(bench['curve'].add_prefix('benchmark_'))
+    curve.to_csv(os.path.join(out_dir, 'equity.csv'))
+    summary = {'estrategia': result['metrics'], 'benchmark': bench['metrics'],
+               'simbolos': len(symbols), 'velas': len(dates)}
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print(f"### Backtest ({len(symbols)} símbolos × {len(dates)} velas, {elapsed:.2f}s) ###")
+    for name, m in (('Estratégia', result['metrics']), ('Peso igual', bench['metrics'])):
+        print(f"{name:<11} retorno {m['retorno_total']:>9.2%} | CAGR {m['cagr']:>8.2%} | "
+              f"max DD {m['max_drawdown']:>8.2%} | acerto {m['taxa_acerto']:>6.1%} em {m['operacoes']} operações")
+    print(f"Curvas e métricas em: {out_dir}")
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest histórico vetorizado dos sinais")
+    parser.add_argument('--capital', type=float, default=10000.0, help='Capital inicial em USD')
+    parser.add_argument('--hold', type=int, default=HORIZON, help='Velas entre rebalanceamentos (padrão: horizonte dos labels)')
+    parser.add_argument('--taker-fee', type=float, default=DEFAULT_TAKER_FEE, help='Taxa taker por operação')
+    parser.add_argument('--pooled', action='store_true', help='Usa o modelo pooled')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    main(args.timeframe, args.capital, args.hold, args.taker_fee, args.pooled)
@@ -0,0 +1,304 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import tracemalloc
+import contextlib
+import io
+import zlib
+import multiprocessing
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src import config
+from src.storage import write_table, timeframe_dir, signals_path
+from src.features import generate_features
+from src.label import generate_labels
+from src.model import train_and_evaluate, folds_path, FEATURE_COLS
+from src.inference import infer_symbol
+from src.registry import registry
+from src.simulation import simulate_purchase
+from src.pricing import Pricing
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage (a coluna peak_rss_mb fica ausente)
+    resource = None
+
+# O benchmark roda offline num DATA_DIR temporário próprio (ver use_data_dir)
+BENCH_DATA_DIR = os.path.join(tempfile.gettempdir(), 'crypto-ml-bench')
+
+# Escalas padrão (velas por símbolo) e tolerância do --compare
+DEFAULT_SCALES = [500, 2000]
+DEFAULT_TOLERANCE = 0.20
+MIN_DELTA_MS = 10.0     # diferenças de latência menores que isso são ruído de medição
+MIN_DELTA_RSS_MB = 5.0  # idem para o pico de RSS (páginas e arenas do alocador)
+STAGES = ['features', 'labels', 'train', 'infer', 'simulate']
+
+# Duração de uma vela por timeframe (ms)
+TIMEFRAME_MS = {'1m': 60_000, '5m': 300_000, '15m': 900_000, '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+
+
+def synthetic_ohlcv(symbol: str, n_bars: int, timeframe: str = '1d', seed: int = 0,
+                    start: str = '2020-01-01') -> pd.DataFrame:
+    """
+    OHLCV sintético e determinístico de `symbol`: passeio aleatório
+    geométrico do close (semente derivada de `seed` e do símbolo), com
+    open/high/low coerentes e volume log-normal. Mesmas colunas do fetch.
+    """
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+    step = TIMEFRAME_MS[timeframe]
+    timestamp = pd.Timestamp(start).value // 1_000_000 + step * np.arange(n_bars, dtype=np.int64)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.03, n_bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.002, n_bars))
+    spread = np.abs(rng.normal(0, 0.01, n_bars))
+    df = pd.DataFrame({
+        'timestamp': timestamp,
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + spread),
+        'low': np.minimum(open_, close) * (1 - spread),
+        'close': close,
+        'volume': rng.lognormal(10, 1, n_bars),
+    })
+    df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+
+class OfflineExchange:
+    """Exchange falsa para simulate_purchase: tickers e taxas fixos, sem rede."""
+
+    has = {'fetchTickers': True}
+
+    def __init__(self, prices: dict):
+        self.prices = prices
+        self.markets = {f"{symbol}/USDT": {} for symbol in prices}
+
+    def fetch_tickers(self, pairs):
+        return {pair: {'last': self.prices[pair.partition('/')[0]]} for pair in pairs}
+
+    def fetch_trading_fees(self):
+        return {pair: {'taker': 0.001} for pair in self.markets}
+
+
+@contextlib.contextmanager
+def use_data_dir(data_dir: str):
+    """Aponta config.DATA_DIR para `data_dir` durante o bloco e restaura o valor anterior."""
+    previous = vars(config).get('DATA_DIR')
+    config.DATA_DIR = data_dir
+    try:
+        yield data_dir
+    finally:
+        if previous is None:
+            # Ainda não resolvido: volta a ser lido do .env no próximo acesso
+            del config.DATA_DIR
+        else:
+            config.DATA_DIR = previous
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss: KB no Linux, bytes no macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def stage_rss(func):
+    """
+    Pico de RSS (MB) de uma execução de `func` acima do RSS inicial, num
+    processo filho (fork): inclui a memória nativa (arrays do numpy/pyarrow,
+    árvores do sklearn) que o tracemalloc não vê. No filho, ru_maxrss parte
+    do RSS atual do pai, não do pico dele; a medida inclui alguns MB de
+    páginas de bibliotecas que o filho volta a mapear. None sem fork ou
+    getrusage.
+    """
+    if resource is None or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    ctx = multiprocessing.get_context('fork')
+    recv, send = ctx.Pipe(duplex=False)
+
+    def child():
+        start = _max_rss_mb()
+        try:
+            func()
+            send.send(_max_rss_mb() - start)
+        except Exception:
+            send.send(None)
+
+    proc = ctx.Process(target=child)
+    proc.start()
+    try:
+        return recv.recv()
+    except EOFError:    # filho encerrado sem resposta (ex.: morto por falta de memória)
+        return None
+    finally:
+        proc.join()
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Executa `func` `repeat` vezes medindo o tempo (sem tracemalloc), mais
+    uma vez com tracemalloc para o pico do heap do Python (py_heap_mb: só
+    objetos alocados pelo Python) e uma vez num processo filho para o pico
+    de RSS do processo (peak_rss_mb, ver stage_rss).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'latency_s': float(np.median(times)), 'min_s': float(min(times)), 'py_heap_mb': peak / 1e6,
+            'peak_rss_mb': stage_rss(func)}
+
+
+def bench_scale(n_bars: int, n_symbols: int, timeframe: str, repeat: int, seed: int) -> list:
+    """Mede todas as etapas para `n_symbols` símbolos com `n_bars` velas cada."""
+    symbols = [f"SYN{i}" for i in range(n_symbols)]
+    raw = {s: synthetic_ohlcv(s, n_bars, timeframe, seed) for s in symbols}
+    feats = {s: generate_features(df.copy()) for s, df in raw.items()}
+    labels = {s: generate_labels(df.copy()) for s, df in feats.items()}
+    for s in symbols:
+        write_table(feats[s], 'features', s, timeframe=timeframe)
+        write_table(labels[s], 'labels', s, timeframe=timeframe)
+
+    def train():
+        for s in symbols:
+            # Sem o cache de folds, para medir o treino completo
+            path = folds_path(s, timeframe)
+            if os.path.exists(path):
+                os.remove(path)
+            train_and_evaluate(s, labels[s], timeframe=timeframe)
+
+    def infer():
+        # Inferência a frio: modelos recarregados do disco a cada execução
+        registry.clear()
+        for s in symbols:
+            infer_symbol(s, timeframe)
+
+    pricing = Pricing(exchange=OfflineExchange({s: float(raw[s]['close'].iloc[-1]) for s in symbols}))
+    with open(signals_path(timeframe), 'w') as f:
+        json.dump(symbols, f)
+
+    stages = {
+        'features': (lambda: [generate_features(df.copy()) for df in raw.values()], n_bars * n_symbols),
+        'labels': (lambda: [generate_labels(df.copy()) for df in feats.values()], n_bars * n_symbols),
+        'train': (train, sum(len(df) for df in labels.values())),
+        'infer': (infer, n_symbols),
+        'simulate': (lambda: simulate_purchase(1000.0, pricing=pricing, timeframe=timeframe), n_symbols),
+    }
+    results = []
+    for name in STAGES:
+        func, rows = stages[name]
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = measure(func, 1 if name == 'train' else repeat)
+        results.append({'stage': name, 'bars': n_bars, 'symbols': n_symbols, 'rows': rows,
+                        'throughput_rows_s': rows / m['latency_s'] if m['latency_s'] else None, **m})
+        rss = f"{m['peak_rss_mb']:.1f}MB" if m['peak_rss_mb'] is not None else '-'
+        print(f"[OK] {name:<9} {n_bars:>7} velas × {n_symbols} | {m['latency_s'] * 1000:>10.1f}ms "
+              f"| {results[-1]['throughput_rows_s']:>12,.0f} linhas/s | heap Python {m['py_heap_mb']:.1f}MB "
+              f"| RSS {rss}")
+    return results
+
+
+def run(scales: list = None, n_symbols: int = 2, timeframe: str = '1d', repeat: int = 3, seed: int = 0,
+        output: str = None, data_dir: str = None) -> dict:
+    """
+    Executa o benchmark em cada escala, com os dados em `data_dir` (padrão:
+    $BENCH_DATA_DIR ou BENCH_DATA_DIR), e grava o JSON em `output`.
+    """
+    scales = scales or DEFAULT_SCALES
+    results = []
+    with use_data_dir(data_dir or os.environ.get('BENCH_DATA_DIR', BENCH_DATA_DIR)):
+        # Começa de um diretório limpo (só o DATA_DIR do benchmark)
+        for sub in ('features', 'labels', 'models', 'simulations'):
+            shutil.rmtree(os.path.join(timeframe_dir(timeframe), sub), ignore_errors=True)
+        for n_bars in scales:
+            results.extend(bench_scale(n_bars, n_symbols, timeframe, repeat, seed))
+
+    import sklearn
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'params': {'scales': scales, 'symbols': n_symbols, 'timeframe': timeframe,
+                       'repeat': repeat, 'seed': seed, 'feature_cols': FEATURE_COLS},
+        },
+        'results': results,
+    }
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados gravados em: {output}")
+    return report
+
+
+def compare(baseline: str, current: str, tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    """
+    Compara dois JSON do benchmark por (etapa, velas, símbolos): marca
+    regressão quando a latência ou um dos picos de memória (heap do Python
+    e RSS, quando os dois arquivos têm a medida) crescem mais que
+    `tolerance` (fração); na latência, só acima de MIN_DELTA_MS. Retorna
+    True se não houver regressões.
+    """
+    with open(baseline, encoding='utf-8') as f:
+        base = {(r['stage'], r['bars'], r['symbols']): r for r in json.load(f)['results']}
+    with open(current, encoding='utf-8') as f:
+        cur = {(r['stage'], r['bars'], r['symbols']): r for r in json.load(f)['results']}
+
+    def memory(r: dict, col: str):
+        # JSON antigos: 'peak_mb' era o pico do tracemalloc (heap do Python)
+        return r.get(col, r.get('peak_mb') if col == 'py_heap_mb' else None)
+
+    def delta(b, c) -> float:
+        return c / b - 1 if b and c is not None else 0.0
+
+    def fmt(b, c) -> str:
+        return f"{b:>7.1f} → {c:>7.1f} {delta(b, c):>+8.1%}" if b is not None and c is not None else f"{'-':>26}"
+
+    ok = True
+    print(f"{'etapa':<9} {'velas':>7} {'latência':>22} {'Δ':>8} {'heap Python (MB)':>18} {'Δ':>8} "
+          f"{'pico RSS (MB)':>18} {'Δ':>8}")
+    for key in sorted(base.keys() & cur.keys(), key=lambda k: (k[1], STAGES.index(k[0]) if k[0] in STAGES else 99)):
+        b, c = base[key], cur[key]
+        d_lat = c['latency_s'] / b['latency_s'] - 1 if b['latency_s'] else 0.0
+        heap = memory(b, 'py_heap_mb'), memory(c, 'py_heap_mb')
+        rss = memory(b, 'peak_rss_mb'), memory(c, 'peak_rss_mb')
+        slower = d_lat > tolerance and (c['latency_s'] - b['latency_s']) * 1000 > MIN_DELTA_MS
+        rss_grew = delta(*rss) > tolerance and rss[1] - rss[0] > MIN_DELTA_RSS_MB
+        regressed = slower or delta(*heap) > tolerance or rss_grew
+        ok = ok and not regressed
+        print(f"{key[0]:<9} {key[1]:>7} {b['latency_s'] * 1000:>9.1f} → {c['latency_s'] * 1000:>8.1f}ms {d_lat:>+8.1%} "
+              f"{fmt(*heap)} {fmt(*rss)}  {'[REGRESSÃO]' if regressed else '[OK]'}")
+    for key in sorted(base.keys() ^ cur.keys()):
+        print(f"[SKIP] {key[0]} {key[1]} velas × {key[2]}: presente em só um dos arquivos")
+    print("Sem regressões." if ok else f"Regressões acima de {tolerance:.0%} encontradas.")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark offline das etapas do pipeline com OHLCV sintético")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='Velas por símbolo em cada escala')
+    parser.add_argument('--symbols', type=int, default=2, help='Símbolos sintéticos por escala')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições por etapa (mediana; o treino roda 1 vez)')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador sintético')
+    parser.add_argument('--timeframe', type=str, default='1d', help="Timeframe das velas sintéticas (ex.: '1d', '1h')")
+    parser.add_argument('--output', type=str, default=None, help='Arquivo JSON dos resultados (ex.: benchmarks/baseline.json)')
+    parser.add_argument('--data-dir', type=str, default=None, help='Diretório de dados do benchmark (padrão: BENCH_DATA_DIR)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'ATUAL'), help='Compara dois JSON do benchmark')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Aumento tolerado (fração) no --compare')
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(0 if compare(args.compare[0], args.compare[1], args.tolerance) else 1)
+    run(args.scales, args.symbols, args.timeframe, args.repeat, args.seed, args.output, args.data_dir)
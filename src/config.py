@@ -1,15 +1,58 @@
 # src/config.py
+# As configurações são resolvidas no primeiro acesso (__getattr__ do
+# módulo): importar src.config não lê o .env, e a falta das variáveis
+# obrigatórias só é acusada quando uma delas é usada.
 import os
-from dotenv import load_dotenv
 
-# 1) procura um arquivo ".env" no diretório atual ou acima
-load_dotenv()
+# Variáveis que dependem do .env (MARKET_DATA_DIR tem DATA_DIR como base)
+REQUIRED = ('EXCHANGE_ID', 'VS_CURRENCY', 'DATA_DIR', 'MARKET_DATA_DIR')
 
-# 2) lê as variáveis
-EXCHANGE_ID = os.getenv("CCXT_EXCHANGE")      # ex: 'binance'
-VS_CURRENCY = os.getenv("CG_CURRENCY")        # ex: 'usd'
-DATA_DIR    = os.getenv("DATA_DIR")           # ex: './data'
+_settings = None
 
-# 3) checagem simples
-if EXCHANGE_ID is None or VS_CURRENCY is None or DATA_DIR is None:
-    raise ValueError("Faltam variáveis no .env! Verifique CCXT_EXCHANGE, CG_CURRENCY e DATA_DIR.")
+
+def _load() -> dict:
+    from dotenv import load_dotenv
+
+    # 1) procura um arquivo ".env" no diretório atual ou acima
+    load_dotenv()
+
+    # 2) lê as variáveis
+    EXCHANGE_ID = os.getenv("CCXT_EXCHANGE")      # ex: 'binance'
+    VS_CURRENCY = os.getenv("CG_CURRENCY")        # ex: 'usd'
+    DATA_DIR    = os.getenv("DATA_DIR")           # ex: './data'
+
+    # 3) parâmetros opcionais (com padrão)
+    FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))   # downloads simultâneos
+    FETCH_RETRIES     = int(os.getenv("FETCH_RETRIES", "5"))       # tentativas por requisição
+    MARKETS_TTL       = int(os.getenv("MARKETS_TTL", "86400"))     # validade (s) do cache de mercados
+    TIMEFRAME         = os.getenv("TIMEFRAME", "1d")               # ex: '1d', '1h', '15m'
+    HISTORY_START     = os.getenv("HISTORY_START", "2017-01-01")   # início do histórico completo (ISO 8601)
+    WORKERS           = int(os.getenv("WORKERS", "1"))             # processos para as etapas por símbolo
+    CPU_BUDGET        = int(os.getenv("CPU_BUDGET", str(os.cpu_count() or 1)))  # núcleos para o treino (folds + árvores)
+    WARM_START_TREES  = int(os.getenv("WARM_START_TREES", "0"))    # >0: refit final reaproveita o último fold + N árvores
+    TUNE_MAX_FITS     = int(os.getenv("TUNE_MAX_FITS", "60"))      # --tune: máximo de treinos por modelo
+    TUNE_MAX_SECONDS  = float(os.getenv("TUNE_MAX_SECONDS", "600")) # --tune: tempo máximo (s) por modelo
+    REGISTRY_MAX_MB   = int(os.getenv("REGISTRY_MAX_MB", "512"))   # memória máxima do cache de modelos
+    REGISTRY_MMAP     = int(os.getenv("REGISTRY_MMAP", "0"))       # 1: abre os .joblib com mmap_mode='r'
+    REGISTRY_VERIFY_HASH = int(os.getenv("REGISTRY_VERIFY_HASH", "0"))  # 1: invalida também por SHA-256
+    SERVICE_HOST      = os.getenv("SERVICE_HOST", "127.0.0.1")     # serviço de sinais (src.service)
+    SERVICE_PORT      = int(os.getenv("SERVICE_PORT", "8765"))
+    FEES_TTL          = int(os.getenv("FEES_TTL", "3600"))         # validade (s) da tabela de taxas (src.pricing)
+    MARKET_DATA_MODE  = os.getenv("MARKET_DATA_MODE", "live")      # live | record | replay (src.marketdata)
+    MARKET_DATA_DIR   = os.getenv("MARKET_DATA_DIR") or (DATA_DIR and os.path.join(DATA_DIR, "cache", "marketdata"))
+    MARKET_DATA_LATENCY = float(os.getenv("MARKET_DATA_LATENCY", "0"))  # replay: atraso simulado (s) por chamada
+
+    return {name: value for name, value in locals().items() if name.isupper()}
+
+
+def __getattr__(name: str):
+    global _settings
+    if _settings is None:
+        _settings = _load()
+    if name not in _settings:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # 4) checagem simples, no primeiro uso de uma variável obrigatória
+    if name in REQUIRED and _settings[name] is None:
+        raise ValueError("Faltam variáveis no .env! Verifique CCXT_EXCHANGE, CG_CURRENCY e DATA_DIR.")
+    globals()[name] = _settings[name]
+    return _settings[name]
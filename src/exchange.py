@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import ccxt
+from src import config
+from src.config import MARKETS_TTL
+from src.marketdata import wrap
+
+# Lista de moedas de cotação em ordem de preferência
+QUOTE_CURRENCIES = ["USDT", "BUSD", "USDC"]
+
+# Instâncias e catálogos já carregados neste processo, por exchange
+_exchanges = {}
+_catalogs = {}
+
+
+def markets_cache_path(exchange_id: str = None) -> str:
+    """Caminho do cache em disco dos mercados: DATA_DIR/cache/markets_<id>.json"""
+    return os.path.join(config.DATA_DIR, 'cache', f"markets_{exchange_id or config.EXCHANGE_ID}.json")
+
+
+def build_pair_index(markets: dict) -> dict:
+    """
+    Monta o índice símbolo → par preferido (ex.: 'BTC' → 'BTC/USDT'),
+    seguindo a ordem de QUOTE_CURRENCIES.
+    """
+    rank = {quote: i for i, quote in enumerate(QUOTE_CURRENCIES)}
+    index = {}
+    for pair in markets:
+        base, _, quote = pair.partition('/')
+        if quote not in rank:
+            continue
+        current = index.get(base)
+        if current is None or rank[quote] < rank[current.partition('/')[2]]:
+            index[base] = pair
+    return index
+
+
+def load_catalog(exchange_id: str = None, refresh: bool = False) -> dict:
+    """
+    Retorna o catálogo {'markets', 'currencies', 'pairs'} da exchange.
+    Usa o cache em disco se tiver menos de MARKETS_TTL segundos; caso
+    contrário, chama load_markets() uma vez e regrava o cache.
+    """
+    exchange_id = exchange_id or config.EXCHANGE_ID
+    if not refresh and exchange_id in _catalogs:
+        return _catalogs[exchange_id]
+
+    path = markets_cache_path(exchange_id)
+    data = None
+    if not refresh and os.path.exists(path) and time.time() - os.path.getmtime(path) < MARKETS_TTL:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    if data is None:
+        exchange = wrap(getattr(ccxt, exchange_id)(), exchange_id)
+        exchange.load_markets()
+        data = {'markets': exchange.markets, 'currencies': exchange.currencies}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    data['pairs'] = build_pair_index(data['markets'])
+    _catalogs[exchange_id] = data
+    return data
+
+
+def get_exchange(exchange_id: str = None):
+    """
+    Retorna a instância compartilhada da exchange, já com os mercados
+    do catálogo (sem novo load_markets()).
+    """
+    exchange_id = exchange_id or config.EXCHANGE_ID
+    if exchange_id not in _exchanges:
+        catalog = load_catalog(exchange_id)
+        # Com MARKET_DATA_MODE=record/replay, as chamadas de rede passam por src.marketdata
+        exchange = wrap(getattr(ccxt, exchange_id)({'enableRateLimit': True}), exchange_id)
+        exchange.set_markets(catalog['markets'], catalog['currencies'] or None)
+        _exchanges[exchange_id] = exchange
+    return _exchanges[exchange_id]
+
+
+def resolve_pair(symbol: str, exchange_id: str = None) -> str:
+    """
+    Retorna o par preferido de `symbol` (consulta ao índice do catálogo).
+    Lança ValueError se não houver par em QUOTE_CURRENCIES.
+    """
+    pair = load_catalog(exchange_id)['pairs'].get(symbol)
+    if pair is None:
+        raise ValueError(f"Nenhum par suportado para {symbol}")
+    return pair
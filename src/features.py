@@ -1,8 +1,8 @@
-import os
-import glob
 import pandas as pd
 import ta
-from src.config import DATA_DIR
+from src.config import TIMEFRAME, WORKERS
+from src.parallel import run_per_symbol
+from src.storage import list_symbols, read_table, write_table
 
 def generate_features(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -31,25 +31,36 @@ def generate_features(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna().reset_index(drop=True)
     return df
 
-def main():
+def features_for(symbol: str, timeframe: str = TIMEFRAME, incremental: bool = True) -> str:
     """
-    Processa todos os arquivos OHLCV em DATA_DIR/ohlcv, gera features
-    e salva em DATA_DIR/features como SYMBOL_feat.csv.
+    Gera e salva as features de um símbolo (ver main). Retorna o caminho gravado.
     """
-    ohlcv_dir = os.path.join(DATA_DIR, 'ohlcv')
-    features_dir = os.path.join(DATA_DIR, 'features')
-    os.makedirs(features_dir, exist_ok=True)
-
-    for filepath in glob.glob(os.path.join(ohlcv_dir, '*.csv')):
-        symbol = os.path.splitext(os.path.basename(filepath))[0]
-        try:
-            df_ohlcv = pd.read_csv(filepath)
-            df_feat = generate_features(df_ohlcv)
-            out_path = os.path.join(features_dir, f"{symbol}_feat.csv")
-            df_feat.to_csv(out_path, index=False)
-            print(f"[OK] Features para {symbol} → {out_path}")
-        except Exception as e:
-            print(f"[ERRO] {symbol}: {e}")
+    from src.indicators import update_features, remove_state
+
+    if incremental:
+        out_path, n_rows = update_features(symbol, timeframe=timeframe)
+        print(f"[OK] Features para {symbol} → {out_path} ({n_rows} linhas calculadas)")
+        return out_path
+    df_ohlcv = read_table('ohlcv', symbol, timeframe=timeframe)
+    df_feat = generate_features(df_ohlcv)
+    out_path = write_table(df_feat, 'features', symbol, timeframe=timeframe)
+    # O estado incremental não corresponde mais à tabela gravada
+    remove_state(symbol, timeframe=timeframe)
+    print(f"[OK] Features para {symbol} → {out_path}")
+    return out_path
+
+
+def main(timeframe: str = TIMEFRAME, incremental: bool = True, workers: int = WORKERS):
+    """
+    Processa todos os arquivos OHLCV do `timeframe` em DATA_DIR/ohlcv, gera
+    features e salva em DATA_DIR/features como SYMBOL_feat.parquet.
+    As janelas dos indicadores são em velas do timeframe.
+    Com `incremental`, calcula só as velas novas a partir do estado salvo
+    dos indicadores (src.indicators); sem ele, recalcula tudo com o `ta`.
+    Com `workers` > 1, processa os símbolos em paralelo.
+    """
+    run_per_symbol(features_for, list_symbols('ohlcv', timeframe=timeframe), workers=workers,
+                   timeframe=timeframe, incremental=incremental)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,17 @@
+# Modelo de custos das compras simuladas (simulation.py e backtest.py)
+
+# Taxas de rede (USD) por ativo; personalize conforme necessário
+DEFAULT_NETWORK_FEE = 2.0  # taxa padrão se ativo não estiver em NETWORK_FEES
+NETWORK_FEES = {
+    'BTC': 5.0,
+    'ETH': 10.0,
+    # adicione mais símbolos se desejar
+}
+
+# Taxa taker usada quando a exchange não informa a do par
+DEFAULT_TAKER_FEE = 0.001
+
+
+def network_fee(symbol: str) -> float:
+    """Taxa de rede (USD) de `symbol`."""
+    return NETWORK_FEES.get(symbol, DEFAULT_NETWORK_FEE)
@@ -0,0 +1,144 @@
+import time
+import random
+import asyncio
+import ccxt
+import ccxt.async_support as ccxt_async
+from src import config
+from src.config import FETCH_CONCURRENCY, FETCH_RETRIES, TIMEFRAME, HISTORY_START, MARKET_DATA_MODE
+from src.exchange import load_catalog, resolve_pair
+from src.fetch_ohlcv import bars_to_frame
+from src.storage import TableWriter, last_value
+from src.metrics import record
+from src.marketdata import wrap
+
+# Erros transitórios que justificam nova tentativa
+RETRY_ERRORS = (ccxt.NetworkError, ccxt.ExchangeNotAvailable)
+
+
+class TokenBucket:
+    """
+    Limitador de taxa compartilhado entre as tarefas: libera `rate`
+    requisições por segundo, com rajadas de até `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def call_with_retry(bucket: TokenBucket, func, *args, retries: int = FETCH_RETRIES, **kwargs):
+    """
+    Executa `func` respeitando o token bucket; em erro transitório,
+    tenta de novo com backoff exponencial (com jitter).
+    """
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            return await func(*args, **kwargs)
+        except RETRY_ERRORS:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random() / 2))
+
+
+async def aiter_ohlcv_pages(exchange, bucket: TokenBucket, pair: str, timeframe: str = TIMEFRAME,
+                            since: int = None, limit: int = None):
+    """Versão assíncrona de fetch_ohlcv.iter_ohlcv_pages."""
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    if since is None:
+        since = exchange.parse8601(HISTORY_START)
+    last = None
+    while True:
+        page = await call_with_retry(bucket, exchange.fetch_ohlcv, pair, timeframe=timeframe,
+                                     since=since, limit=limit)
+        if last is not None:
+            page = [b for b in page if b[0] > last]
+        if not page:
+            return
+        yield page
+        last = page[-1][0]
+        if last + tf_ms > exchange.milliseconds():
+            return
+        since = last + 1
+
+
+async def fetch_symbol(exchange, bucket: TokenBucket, symbol: str, incremental: bool = True,
+                       limit: int = None, timeframe: str = TIMEFRAME) -> str:
+    """
+    Baixa e grava o OHLCV de `symbol` página a página, com a mesma saída
+    de fetch_ohlcv.update_ohlcv_for. Retorna o caminho gravado.
+    """
+    pair = resolve_pair(symbol)
+    since = None
+    if incremental:
+        since = await asyncio.to_thread(last_value, 'ohlcv', symbol, 'timestamp', timeframe=timeframe)
+    if since is not None:
+        since = int(since)
+    with TableWriter('ohlcv', symbol, append_key='timestamp' if since is not None else None,
+                     timeframe=timeframe) as writer:
+        async for page in aiter_ohlcv_pages(exchange, bucket, pair, timeframe, since=since, limit=limit):
+            await asyncio.to_thread(writer.write, bars_to_frame(page))
+    return writer.path
+
+
+async def fetch_all(symbols: list, incremental: bool = True, concurrency: int = FETCH_CONCURRENCY,
+                    limit: int = None, timeframe: str = TIMEFRAME) -> dict:
+    """
+    Baixa OHLCV de todos os `symbols` com uma única sessão da exchange,
+    até `concurrency` símbolos ao mesmo tempo.
+    Retorna {símbolo: latência em segundos} dos downloads bem-sucedidos.
+    """
+    # O controle de taxa fica com o token bucket, não com a ccxt;
+    # os mercados vêm do catálogo em cache (sem load_markets())
+    catalog = load_catalog()
+    exchange = wrap(getattr(ccxt_async, config.EXCHANGE_ID)({'enableRateLimit': False}), config.EXCHANGE_ID)
+    exchange.set_markets(catalog['markets'], catalog['currencies'] or None)
+    # No replay não há limite da exchange a respeitar (só o atraso simulado)
+    rate = 1000.0 / exchange.rateLimit if MARKET_DATA_MODE != 'replay' else 1e9
+    bucket = TokenBucket(rate=rate, capacity=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {}
+
+    async def run(sym):
+        async with semaphore:
+            start = time.perf_counter()
+            status = 'ok'
+            try:
+                out_path = await fetch_symbol(exchange, bucket, sym, incremental=incremental, limit=limit,
+                                              timeframe=timeframe)
+                latencies[sym] = time.perf_counter() - start
+                print(f"[OK]  {sym} → {out_path} ({latencies[sym]:.2f}s)")
+            except ValueError as ve:
+                status = 'skip'
+                print(f"[SKIP] {sym}: {ve}")
+            except Exception as e:
+                status = 'error'
+                print(f"[ERRO] {sym}: {e}")
+            # Downloads concorrentes no mesmo processo: só o tempo de relógio é por símbolo
+            record({'type': 'symbol', 'stage': 'fetch_symbol', 'symbol': sym, 'status': status,
+                    'wall_s': time.perf_counter() - start})
+
+    try:
+        await asyncio.gather(*(run(sym) for sym in symbols))
+    finally:
+        await exchange.close()
+
+    if latencies:
+        values = sorted(latencies.values())
+        print(f"\nLatência por símbolo: mediana {values[len(values) // 2]:.2f}s, "
+              f"máxima {values[-1]:.2f}s ({len(values)} símbolos)")
+    return latencies
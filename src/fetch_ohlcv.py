@@ -1,50 +1,107 @@
 import os
 import csv
-import time
-import ccxt
+import asyncio
+import argparse
 import pandas as pd
-from src.config import EXCHANGE_ID, DATA_DIR
+from src import config
+from src.config import FETCH_CONCURRENCY, TIMEFRAME, HISTORY_START
+from src.exchange import get_exchange, resolve_pair
+from src.storage import TableWriter, last_value
 
-# Lista de moedas de cotação em ordem de preferência
-QUOTE_CURRENCIES = ["USDT", "BUSD", "USDC"]
+# Colunas numéricas das velas
+OHLCV_COLS = ['open', 'high', 'low', 'close', 'volume']
 
-def fetch_ohlcv_for(symbol: str, since: int = None, limit: int = None) -> pd.DataFrame:
+
+def bars_to_frame(bars: list) -> pd.DataFrame:
+    """Converte a lista de velas da ccxt no DataFrame OHLCV do pipeline."""
+    df = pd.DataFrame(bars, columns=['timestamp','open','high','low','close','volume'])
+    df['timestamp'] = df['timestamp'].astype('int64')
+    df[OHLCV_COLS] = df[OHLCV_COLS].astype(float)
+    df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+
+def iter_ohlcv_pages(exchange, pair: str, timeframe: str = TIMEFRAME, since: int = None, limit: int = None):
+    """
+    Gera as páginas de velas de `pair` a partir de `since` (ms; padrão:
+    HISTORY_START) até a vela atual, uma requisição por página.
+    Cada página é uma lista de velas da ccxt, sem repetir velas anteriores.
+    """
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    if since is None:
+        since = exchange.parse8601(HISTORY_START)
+    last = None
+    while True:
+        page = exchange.fetch_ohlcv(pair, timeframe=timeframe, since=since, limit=limit)
+        if last is not None:
+            page = [b for b in page if b[0] > last]
+        if not page:
+            return
+        yield page
+        last = page[-1][0]
+        # Para quando a última vela recebida já for a vela atual
+        if last + tf_ms > exchange.milliseconds():
+            return
+        since = last + 1
+
+
+def fetch_ohlcv_for(symbol: str, since: int = None, limit: int = None, timeframe: str = TIMEFRAME) -> pd.DataFrame:
     """
-    Busca OHLCV diário de `symbol` em um par suportado pela exchange.
+    Busca OHLCV de `symbol` no `timeframe` em um par suportado pela exchange.
     Tenta, na ordem, SYMBOL/USDT, SYMBOL/BUSD e SYMBOL/USDC.
-    since: timestamp em ms; limit: número de velas.
+    since: timestamp em ms (padrão: HISTORY_START); limit: velas por página.
+    Pagina até a vela atual e retorna tudo em memória; para históricos
+    longos, prefira update_ohlcv_for, que grava página a página.
     Retorna DataFrame com colunas: timestamp, open, high, low, close, volume, date.
     """
-    # Inicializa a exchange
-    exchange = getattr(ccxt, EXCHANGE_ID)()
-    # Carrega mercados disponíveis
-    exchange.load_markets()
+    # Exchange compartilhada, com mercados do cache
+    exchange = get_exchange()
 
     # Identifica par disponível
-    market_pair = None
-    for quote in QUOTE_CURRENCIES:
-        pair = f"{symbol}/{quote}"
-        if pair in exchange.markets:
-            market_pair = pair
-            break
-    if market_pair is None:
-        raise ValueError(f"Nenhum par suportado para {symbol}")
-
-    print(f"--> Buscando {market_pair} …")
-    bars = exchange.fetch_ohlcv(market_pair, timeframe='1d', since=since, limit=limit)
+    market_pair = resolve_pair(symbol)
+
+    print(f"--> Buscando {market_pair} ({timeframe}) …")
+    bars = []
+    for page in iter_ohlcv_pages(exchange, market_pair, timeframe, since=since, limit=limit):
+        bars.extend(page)
 
     # Constrói DataFrame
-    df = pd.DataFrame(bars, columns=['timestamp','open','high','low','close','volume'])
-    df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-    return df
+    return bars_to_frame(bars)
+
 
+def update_ohlcv_for(symbol: str, incremental: bool = True, limit: int = None, timeframe: str = TIMEFRAME) -> str:
+    """
+    Baixa o OHLCV de `symbol` gravando cada página assim que chega
+    (memória limitada a uma página). Com `incremental`, começa no último
+    timestamp salvo (inclusive, pois a última vela pode estar incompleta)
+    e substitui a vela sobreposta; sem dados em disco, baixa o histórico
+    completo. A gravação é atômica. Retorna o caminho gravado.
+    """
+    exchange = get_exchange()
+    market_pair = resolve_pair(symbol)
+    since = last_value('ohlcv', symbol, 'timestamp', timeframe=timeframe) if incremental else None
+    if since is not None:
+        since = int(since)
+
+    print(f"--> Buscando {market_pair} ({timeframe}) …")
+    with TableWriter('ohlcv', symbol, append_key='timestamp' if since is not None else None,
+                     timeframe=timeframe) as writer:
+        for page in iter_ohlcv_pages(exchange, market_pair, timeframe, since=since, limit=limit):
+            writer.write(bars_to_frame(page))
+    return writer.path
 
-def main():
+
+def main(incremental: bool = True, concurrency: int = FETCH_CONCURRENCY, timeframe: str = TIMEFRAME):
     """
     Lê `data/top50.csv`, faz o download de OHLCV para cada símbolo
-    e salva em `DATA_DIR/ohlcv/SYMBOL.csv`.
+    e salva em `DATA_DIR/ohlcv/SYMBOL.parquet` (para timeframes além
+    de '1d', em `DATA_DIR/<timeframe>/ohlcv/SYMBOL.parquet`).
+    Com `incremental`, baixa só as velas novas de cada símbolo já salvo.
+    Os downloads são concorrentes (até `concurrency`), via src.fetch_async.
     """
-    top50_file = os.path.join(DATA_DIR, 'top50.csv')
+    from src.fetch_async import fetch_all
+
+    top50_file = os.path.join(config.DATA_DIR, 'top50.csv')
     if not os.path.exists(top50_file):
         print(f"[ERRO] Arquivo não encontrado: {top50_file}")
         return
@@ -56,25 +113,13 @@ def main():
         for row in reader:
             symbols.append(row['symbol'])
 
-    # Prepara diretório de saída
-    ohlcv_dir = os.path.join(DATA_DIR, 'ohlcv')
-    os.makedirs(ohlcv_dir, exist_ok=True)
-    since = None  # Pode definir timestamp em ms para histórico limitado
-    limit = None  # Padrão: máximo permitido pela exchange
-
-    # Loop de download
-    for sym in symbols:
-        try:
-            df = fetch_ohlcv_for(sym, since=since, limit=limit)
-            out_path = os.path.join(ohlcv_dir, f"{sym}.csv")
-            df.to_csv(out_path, index=False)
-            print(f"[OK]  {sym} → {out_path}\n")
-        except ValueError as ve:
-            print(f"[SKIP] {sym}: {ve}")
-        except Exception as e:
-            print(f"[ERRO] {sym}: {e}")
-        # Respeita rate limit da exchange
-        time.sleep(1.2)
+    # Download concorrente; o rate limit é respeitado pelo token bucket
+    asyncio.run(fetch_all(symbols, incremental=incremental, concurrency=concurrency, timeframe=timeframe))
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Download de OHLCV do top50")
+    parser.add_argument('--full', action='store_true', help='Baixa o histórico completo em vez de só as velas novas')
+    parser.add_argument('--concurrency', type=int, default=FETCH_CONCURRENCY, help='Número de downloads simultâneos')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h', '15m')")
+    args = parser.parse_args()
+    main(incremental=not args.full, concurrency=args.concurrency, timeframe=args.timeframe)
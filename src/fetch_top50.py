@@ -1,16 +1,17 @@
 import os
 import csv
 from pycoingecko import CoinGeckoAPI
-from src.config import VS_CURRENCY, DATA_DIR
+from src import config
+from src.marketdata import wrap
 
 def fetch_top50():
     """
     Busca as 50 maiores criptomoedas por market cap no CoinGecko
     e salva em data/top50.csv com colunas: rank, symbol, name, market_cap.
     """
-    cg = CoinGeckoAPI()
+    cg = wrap(CoinGeckoAPI(), 'coingecko')
     top50_data = cg.get_coins_markets(
-        vs_currency=VS_CURRENCY,
+        vs_currency=config.VS_CURRENCY,
         order='market_cap_desc',
         per_page=50,
         page=1,
@@ -18,8 +19,8 @@ def fetch_top50():
     )
 
     # Garante diretório de dados
-    os.makedirs(DATA_DIR, exist_ok=True)
-    output_file = os.path.join(DATA_DIR, 'top50.csv')
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    output_file = os.path.join(config.DATA_DIR, 'top50.csv')
 
     # Escreve CSV
     with open(output_file, mode='w', newline='', encoding='utf-8') as f:
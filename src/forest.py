@@ -0,0 +1,207 @@
+import os
+import time
+import argparse
+import numpy as np
+from src import config
+from src.schema import FEATURE_COLS
+from src.storage import list_symbols, read_table, models_dir
+
+# Extensão da floresta compilada (arrays NumPy, sem pickle)
+COMPILED_EXT = '.npz'
+
+
+def compile_forest(model, **extra) -> dict:
+    """
+    Achata as árvores de um RandomForestClassifier treinado em arrays
+    contíguos com os nós de todas as árvores: feature, threshold, filhos
+    (índices globais; -1 nas folhas), lado dos valores ausentes e as
+    probabilidades de cada nó. `extra` é gravado junto (ex.: símbolos).
+    """
+    feature, threshold, left, right, missing_left, value, roots = [], [], [], [], [], [], []
+    offset = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        children_left = tree.children_left.astype(np.int32)
+        children_right = tree.children_right.astype(np.int32)
+        leaf = children_left == -1
+        roots.append(offset)
+        feature.append(tree.feature.astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        left.append(np.where(leaf, -1, children_left + offset))
+        right.append(np.where(leaf, -1, children_right + offset))
+        missing_left.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(n)), dtype=bool))
+        # Mesma normalização de DecisionTreeClassifier.predict_proba
+        proba = tree.value[:, 0, :].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        offset += n
+
+    names = getattr(model, 'feature_names_in_', None)
+    return {
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'left': np.concatenate(left),
+        'right': np.concatenate(right),
+        'missing_left': np.concatenate(missing_left),
+        'value': np.concatenate(value),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'classes': np.asarray(model.classes_),
+        'feature_names': np.asarray(names if names is not None else [], dtype=str),
+        **{k: np.asarray(v) for k, v in extra.items()},
+    }
+
+
+def export_forest(model, path: str, **extra) -> str:
+    """Grava a floresta compilada em `path` (.npz), de forma atômica."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **compile_forest(model, **extra))
+    os.replace(tmp_path, path)
+    return path
+
+
+class CompiledForest:
+    """
+    Floresta compilada: predict/predict_proba por percurso vetorizado em
+    NumPy de todas as árvores para todas as linhas de uma vez, com o mesmo
+    resultado do RandomForestClassifier (X em float32 e `x <= threshold`,
+    como no sklearn; probabilidades somadas árvore a árvore, na ordem).
+    """
+
+    def __init__(self, arrays):
+        for name in ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots', 'classes'):
+            setattr(self, name, arrays[name])
+        self.feature_names = list(arrays['feature_names'])
+        self.extra = {k: arrays[k] for k in arrays if k not in self.__dict__ and k != 'feature_names'}
+        # Índices nativos (intp) para o percurso, sem conversão a cada chamada
+        self._roots, self._left, self._right, self._feature = (
+            np.asarray(a, dtype=np.intp) for a in (self.roots, self.left, self.right, self.feature))
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledForest':
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def _matrix(self, X) -> np.ndarray:
+        # DataFrame (sem importar o pandas): colunas na ordem do treino
+        if self.feature_names and hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X) -> np.ndarray:
+        """Índice global da folha de cada linha em cada árvore: (linhas, árvores)."""
+        X = self._matrix(X)
+        (n, n_cols), n_trees = X.shape, len(self.roots)
+        flat = X.ravel()
+        # Um caminho por (linha, árvore); só os que ainda não chegaram a uma folha avançam
+        nodes = np.tile(self._roots, n)
+        base = np.repeat(np.arange(n, dtype=np.intp) * n_cols, n_trees)
+        active = np.flatnonzero(self._left[nodes] != -1)
+        while active.size:
+            node = nodes[active]
+            x = flat[base[active] + self._feature[node]]
+            go_left = x <= self.threshold[node]
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.missing_left[node], go_left)
+            node = np.where(go_left, self._left[node], self._right[node])
+            nodes[active] = node
+            active = active[self._left[node] != -1]
+        return nodes.reshape(n, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        # cumsum soma árvore a árvore, na mesma ordem do sklearn
+        proba = np.cumsum(self.value[leaves], axis=1)[:, -1]
+        return proba / leaves.shape[1]
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compiled_path(model_file: str) -> str:
+    """models/SYMBOL_model.joblib → models/SYMBOL_model.npz"""
+    return os.path.splitext(model_file)[0] + COMPILED_EXT
+
+
+def load_model(model_file: str, mmap_mode: str = None):
+    """
+    Carrega o modelo de `model_file` (.joblib): a versão compilada, se
+    existir e não for mais antiga que o pickle; senão, o próprio pickle
+    (com `mmap_mode`, ex. 'r', os arrays são mapeados do disco).
+    """
+    npz = compiled_path(model_file)
+    if os.path.exists(npz) and (not os.path.exists(model_file)
+                                or os.path.getmtime(npz) >= os.path.getmtime(model_file)):
+        return CompiledForest.load(npz)
+    # Só aqui: com a versão compilada, a inferência não importa joblib nem sklearn
+    import joblib
+    return joblib.load(model_file, mmap_mode=mmap_mode)
+
+
+def compile_all(timeframe: str = None):
+    """Compila os modelos por símbolo já treinados (models/*_model.joblib)."""
+    import joblib
+
+    base = models_dir(timeframe)
+    for name in sorted(os.listdir(base)) if os.path.isdir(base) else []:
+        if not name.endswith('_model.joblib'):
+            continue
+        model_file = os.path.join(base, name)
+        try:
+            model = joblib.load(model_file)
+            extra = {}
+            if isinstance(model, dict):
+                # Modelo pooled: {modelo, símbolos}
+                model, extra = model['model'], {'symbols': model['symbols']}
+            out_path = export_forest(model, compiled_path(model_file), **extra)
+            print(f"[OK] {model_file} → {out_path}")
+        except Exception as e:
+            print(f"[ERRO] {model_file}: {e}")
+
+
+def check(timeframe: str = None) -> bool:
+    """
+    Compara a floresta compilada com o pickle em todas as linhas de
+    features de cada símbolo, e mede tamanho e tempo de carga.
+    """
+    import joblib
+
+    ok = True
+    base = models_dir(timeframe)
+    for symbol in list_symbols('features', timeframe=timeframe):
+        model_file = os.path.join(base, f"{symbol}_model.joblib")
+        npz = compiled_path(model_file)
+        if not os.path.exists(model_file) or not os.path.exists(npz):
+            print(f"[SKIP] {symbol}: modelo ou versão compilada ausente")
+            continue
+        t0 = time.perf_counter()
+        model = joblib.load(model_file)
+        t_pickle = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        compiled = CompiledForest.load(npz)
+        t_npz = time.perf_counter() - t0
+
+        X = read_table('features', symbol, columns=FEATURE_COLS, timeframe=timeframe)
+        same_pred = (compiled.predict(X) == model.predict(X)).all()
+        same_proba = np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+        ok = ok and same_pred
+        print(f"[{'OK' if same_pred else 'ERRO'}] {symbol}: predict {'idêntico' if same_pred else 'DIFERENTE'}"
+              f" (proba {'idêntica' if same_proba else 'diferente'}) | carga {t_pickle * 1000:.1f}ms → "
+              f"{t_npz * 1000:.1f}ms | {os.path.getsize(model_file) / 1e6:.2f}MB → {os.path.getsize(npz) / 1e6:.2f}MB")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Florestas compiladas em arrays NumPy")
+    parser.add_argument('--compile', action='store_true', help='Compila os modelos .joblib existentes')
+    parser.add_argument('--check', action='store_true', help='Compara com o sklearn (predict, carga e tamanho)')
+    parser.add_argument('--timeframe', type=str, default=config.TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    if args.compile:
+        compile_all(args.timeframe)
+    if args.check:
+        raise SystemExit(0 if check(args.timeframe) else 1)
+    if not (args.compile or args.check):
+        parser.print_help()
@@ -0,0 +1,337 @@
+import os
+import json
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.config import TIMEFRAME
+from src.storage import (list_symbols, read_table, read_rows_after, write_table, append_table,
+                         table_path, timeframe_dir)
+
+# Janelas dos indicadores (as mesmas de features.generate_features)
+SMA_WINDOW = 20
+EMA_WINDOW = 50
+MACD_FAST, MACD_SLOW, MACD_SIGN = 12, 26, 9
+RSI_WINDOW = 14
+ATR_WINDOW = 14
+
+# Colunas geradas, na ordem de features.generate_features
+INDICATOR_COLS = ['sma20', 'ema50', 'macd', 'rsi14', 'atr14', 'obv']
+
+
+def _ema_step(prev: float, value: float, alpha: float) -> float:
+    """Um passo da EMA recursiva (equivalente a ewm(adjust=False))."""
+    return value if prev is None else (1 - alpha) * prev + alpha * value
+
+
+class IndicatorState:
+    """
+    Estado acumulado dos indicadores de um símbolo: valores das EMAs,
+    médias de Wilder do RSI/ATR, total do OBV e a última janela da SMA.
+    Cada chamada a update() processa uma vela e devolve os indicadores
+    dela, com os mesmos valores do `ta` sobre o histórico completo.
+    """
+
+    def __init__(self, data: dict = None):
+        data = data or {}
+        self.n = data.get('n', 0)
+        self.last_close = data.get('last_close')
+        self.closes = deque(data.get('closes', []), maxlen=SMA_WINDOW)
+        self.ema = data.get('ema')
+        self.ema_fast = data.get('ema_fast')
+        self.ema_slow = data.get('ema_slow')
+        self.macd_signal = data.get('macd_signal')
+        self.macd_count = data.get('macd_count', 0)
+        self.rsi_up = data.get('rsi_up')
+        self.rsi_down = data.get('rsi_down')
+        self.tr_sum = data.get('tr_sum', 0.0)
+        self.atr = data.get('atr', 0.0)
+        self.obv = data.get('obv', 0.0)
+
+    def to_dict(self) -> dict:
+        return {
+            'n': self.n, 'last_close': self.last_close, 'closes': list(self.closes),
+            'ema': self.ema, 'ema_fast': self.ema_fast, 'ema_slow': self.ema_slow,
+            'macd_signal': self.macd_signal, 'macd_count': self.macd_count,
+            'rsi_up': self.rsi_up, 'rsi_down': self.rsi_down,
+            'tr_sum': self.tr_sum, 'atr': self.atr, 'obv': self.obv,
+        }
+
+    def update(self, high: float, low: float, close: float, volume: float) -> dict:
+        """Processa uma vela e retorna {indicador: valor} (NaN no aquecimento)."""
+        i = self.n
+        prev_close = self.last_close
+
+        # SMA: média da última janela
+        self.closes.append(close)
+        sma = sum(self.closes) / SMA_WINDOW if len(self.closes) == SMA_WINDOW else np.nan
+
+        # EMAs (iniciam na primeira vela; válidas após `window` velas)
+        self.ema = _ema_step(self.ema, close, 2 / (EMA_WINDOW + 1))
+        self.ema_fast = _ema_step(self.ema_fast, close, 2 / (MACD_FAST + 1))
+        self.ema_slow = _ema_step(self.ema_slow, close, 2 / (MACD_SLOW + 1))
+        ema = self.ema if i >= EMA_WINDOW - 1 else np.nan
+
+        # MACD: a linha de sinal começa na primeira linha MACD válida
+        macd = np.nan
+        if i >= MACD_SLOW - 1:
+            line = self.ema_fast - self.ema_slow
+            self.macd_signal = _ema_step(self.macd_signal, line, 2 / (MACD_SIGN + 1))
+            self.macd_count += 1
+            if self.macd_count >= MACD_SIGN:
+                macd = line - self.macd_signal
+
+        # RSI (médias de Wilder; a primeira vela conta como variação zero)
+        diff = 0.0 if prev_close is None else close - prev_close
+        self.rsi_up = _ema_step(self.rsi_up, max(diff, 0.0), 1 / RSI_WINDOW)
+        self.rsi_down = _ema_step(self.rsi_down, max(-diff, 0.0), 1 / RSI_WINDOW)
+        rsi = np.nan
+        if i >= RSI_WINDOW - 1:
+            rsi = 100.0 if self.rsi_down == 0 else 100 - 100 / (1 + self.rsi_up / self.rsi_down)
+
+        # ATR: média simples da primeira janela, depois suavização de Wilder
+        tr = high - low
+        if prev_close is not None:
+            tr = max(tr, abs(high - prev_close), abs(low - prev_close))
+        if i < ATR_WINDOW - 1:
+            self.tr_sum += tr
+        elif i == ATR_WINDOW - 1:
+            self.atr = (self.tr_sum + tr) / ATR_WINDOW
+        else:
+            self.atr = (self.atr * (ATR_WINDOW - 1) + tr) / ATR_WINDOW
+
+        # OBV
+        self.obv += -volume if prev_close is not None and close < prev_close else volume
+
+        self.n += 1
+        self.last_close = close
+        return {'sma20': sma, 'ema50': ema, 'macd': macd, 'rsi14': rsi, 'atr14': self.atr, 'obv': self.obv}
+
+
+def compute_rows(state: IndicatorState, df_ohlcv: pd.DataFrame) -> tuple:
+    """
+    Processa as velas de `df_ohlcv` (em ordem) a partir de `state`.
+    Retorna (features, estado_antes_da_última_vela): as features só têm
+    as linhas já aquecidas, como em generate_features após o dropna; o
+    estado é o anterior à última vela, que pode ser revisada depois.
+    """
+    rows = []
+    snapshot = state.to_dict()
+    last = len(df_ohlcv) - 1
+    for i, (high, low, close, volume) in enumerate(
+            df_ohlcv[['high', 'low', 'close', 'volume']].itertuples(index=False, name=None)):
+        if i == last:
+            snapshot = state.to_dict()
+        rows.append(state.update(high, low, close, volume))
+
+    df = df_ohlcv.reset_index(drop=True).copy()
+    df[INDICATOR_COLS] = pd.DataFrame(rows, columns=INDICATOR_COLS)
+    df = df.dropna(subset=INDICATOR_COLS).reset_index(drop=True)
+    return df, snapshot
+
+
+def _ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """EMA recursiva de `values` (o mesmo de _ema_step em sequência), no kernel do pandas."""
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _history_arrays(df_ohlcv: pd.DataFrame) -> dict:
+    """
+    Séries completas dos valores que IndicatorState acumula, calculadas de
+    uma vez (sem laço em Python) sobre as velas de `df_ohlcv`, em ordem.
+    Antes do início do sinal do MACD e do ATR, os valores ficam NaN.
+    """
+    high, low, close, volume = (df_ohlcv[c].to_numpy(dtype=float) for c in ('high', 'low', 'close', 'volume'))
+    m = len(close)
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    diff = np.nan_to_num(close - prev_close)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    ema_fast = _ewm(close, 2 / (MACD_FAST + 1))
+    ema_slow = _ewm(close, 2 / (MACD_SLOW + 1))
+    signal = np.full(m, np.nan)
+    signal[MACD_SLOW - 1:] = _ewm((ema_fast - ema_slow)[MACD_SLOW - 1:], 2 / (MACD_SIGN + 1))
+
+    # ATR: média simples da primeira janela, depois suavização de Wilder
+    atr = np.full(m, np.nan)
+    if m >= ATR_WINDOW:
+        atr[ATR_WINDOW - 1:] = _ewm(np.concatenate([[tr[:ATR_WINDOW].mean()], tr[ATR_WINDOW:]]), 1 / ATR_WINDOW)
+
+    return {
+        'close': close, 'tr': tr, 'ema': _ewm(close, 2 / (EMA_WINDOW + 1)),
+        'ema_fast': ema_fast, 'ema_slow': ema_slow, 'macd_signal': signal,
+        'rsi_up': _ewm(np.maximum(diff, 0.0), 1 / RSI_WINDOW),
+        'rsi_down': _ewm(np.maximum(-diff, 0.0), 1 / RSI_WINDOW),
+        'atr': atr, 'obv': np.cumsum(np.where(diff < 0, -volume, volume)),
+    }
+
+
+def _state_at(arrays: dict, n: int) -> dict:
+    """Snapshot de IndicatorState após as primeiras `n` velas de `arrays`."""
+    if n == 0:
+        return IndicatorState().to_dict()
+    i = n - 1
+
+    def value(key):
+        return None if np.isnan(arrays[key][i]) else float(arrays[key][i])
+
+    return {
+        'n': n, 'last_close': float(arrays['close'][i]),
+        'closes': arrays['close'][max(0, n - SMA_WINDOW):n].tolist(),
+        'ema': value('ema'), 'ema_fast': value('ema_fast'), 'ema_slow': value('ema_slow'),
+        'macd_signal': value('macd_signal'), 'macd_count': max(0, n - (MACD_SLOW - 1)),
+        'rsi_up': value('rsi_up'), 'rsi_down': value('rsi_down'),
+        'tr_sum': float(arrays['tr'][:min(n, ATR_WINDOW - 1)].sum()),
+        'atr': value('atr') or 0.0, 'obv': float(arrays['obv'][i]),
+    }
+
+
+def history_state(df_ohlcv: pd.DataFrame) -> IndicatorState:
+    """Estado após todas as velas de `df_ohlcv`, sem processá-las uma a uma."""
+    return IndicatorState(_state_at(_history_arrays(df_ohlcv), len(df_ohlcv)))
+
+
+def compute_history(df_ohlcv: pd.DataFrame) -> tuple:
+    """
+    Versão vetorizada de compute_rows(IndicatorState(), df_ohlcv) para o
+    histórico completo: mesmas features e mesmo estado antes da última vela.
+    """
+    arrays = _history_arrays(df_ohlcv)
+    age = np.arange(len(df_ohlcv))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(arrays['rsi_down'] == 0, 100.0, 100 - 100 / (1 + arrays['rsi_up'] / arrays['rsi_down']))
+
+    df = df_ohlcv.reset_index(drop=True).copy()
+    df['sma20'] = pd.Series(arrays['close']).rolling(SMA_WINDOW).mean().to_numpy()
+    df['ema50'] = np.where(age >= EMA_WINDOW - 1, arrays['ema'], np.nan)
+    df['macd'] = np.where(age >= MACD_SLOW + MACD_SIGN - 2,
+                          arrays['ema_fast'] - arrays['ema_slow'] - arrays['macd_signal'], np.nan)
+    df['rsi14'] = np.where(age >= RSI_WINDOW - 1, rsi, np.nan)
+    df['atr14'] = np.nan_to_num(arrays['atr'])
+    df['obv'] = arrays['obv']
+    df = df.dropna(subset=INDICATOR_COLS).reset_index(drop=True)
+    return df, _state_at(arrays, max(0, len(df_ohlcv) - 1))
+
+
+def state_path(symbol: str, timeframe: str = None) -> str:
+    """Arquivo de estado dos indicadores: <features>/SYMBOL_state.json"""
+    return os.path.join(timeframe_dir(timeframe), 'features', f"{symbol}_state.json")
+
+
+def load_state(symbol: str, timeframe: str = None):
+    """Retorna (estado, timestamp da vela a reprocessar), ou (None, None)."""
+    path = state_path(symbol, timeframe)
+    if not os.path.exists(path):
+        return None, None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return IndicatorState(data['state']), data['resume_timestamp']
+
+
+def save_state(symbol: str, snapshot: dict, resume_timestamp: int, timeframe: str = None):
+    """Grava o estado anterior à última vela (`resume_timestamp`), de forma atômica."""
+    path = state_path(symbol, timeframe)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'resume_timestamp': int(resume_timestamp), 'state': snapshot}, f)
+    os.replace(tmp_path, path)
+
+
+def remove_state(symbol: str, timeframe: str = None):
+    """Descarta o estado salvo (o próximo update recalcula tudo)."""
+    path = state_path(symbol, timeframe)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def update_features(symbol: str, timeframe: str = TIMEFRAME) -> tuple:
+    """
+    Atualiza as features de `symbol` a partir do estado salvo: lê só as
+    velas a partir da última processada (que é reprocessada, pois pode
+    ter sido revisada), calcula as linhas novas e as acrescenta.
+    Sem estado válido, recalcula o histórico inteiro.
+    Retorna (caminho gravado, linhas calculadas).
+    """
+    state, resume_ts = load_state(symbol, timeframe)
+    df_new = None
+    if state is not None and os.path.exists(table_path('features', symbol, timeframe=timeframe)):
+        df_new = read_rows_after('ohlcv', symbol, 'timestamp', resume_ts, timeframe=timeframe)
+        df_new = df_new.sort_values('timestamp')
+        # O histórico mudou antes do ponto salvo: recalcula do início
+        if df_new.empty or df_new['timestamp'].iloc[0] != resume_ts:
+            df_new = None
+
+    if df_new is None:
+        df_ohlcv = read_table('ohlcv', symbol, timeframe=timeframe).sort_values('timestamp')
+        if df_ohlcv.empty:
+            raise ValueError(f"Sem dados OHLCV para {symbol}")
+        df_feat, snapshot = compute_history(df_ohlcv)
+        out_path = write_table(df_feat, 'features', symbol, timeframe=timeframe)
+        save_state(symbol, snapshot, df_ohlcv['timestamp'].iloc[-1], timeframe)
+        return out_path, len(df_feat)
+
+    df_feat, snapshot = compute_rows(state, df_new)
+    out_path = table_path('features', symbol, timeframe=timeframe)
+    if not df_feat.empty:
+        out_path = append_table(df_feat, 'features', symbol, key='timestamp', timeframe=timeframe)
+    save_state(symbol, snapshot, df_new['timestamp'].iloc[-1], timeframe)
+    return out_path, len(df_feat)
+
+
+def check_parity(df_ohlcv: pd.DataFrame, chunks: int = 5) -> float:
+    """
+    Compara o cálculo incremental (em `chunks` blocos de velas, com a
+    última vela de cada bloco reprocessada) com generate_features sobre
+    o histórico completo. Retorna a maior diferença relativa.
+    """
+    from src.features import generate_features
+
+    df_ohlcv = df_ohlcv.sort_values('timestamp').reset_index(drop=True)
+    full = generate_features(df_ohlcv.copy())
+
+    state = IndicatorState()
+    parts = []
+    bounds = np.linspace(0, len(df_ohlcv), chunks + 1).astype(int)
+    start = 0
+    for end in bounds[1:]:
+        if end <= start:
+            continue
+        part, snapshot = compute_rows(state, df_ohlcv.iloc[start:end])
+        parts.append(part)
+        # Retoma da última vela do bloco, como update_features
+        state = IndicatorState(snapshot)
+        start = end - 1
+    inc = pd.concat(parts).drop_duplicates('timestamp', keep='last').reset_index(drop=True)
+
+    if len(inc) != len(full) or not (inc['timestamp'].values == full['timestamp'].values).all():
+        raise ValueError(f"Linhas diferentes: incremental={len(inc)} completo={len(full)}")
+    a = inc[INDICATOR_COLS].to_numpy(dtype=float)
+    b = full[INDICATOR_COLS].to_numpy(dtype=float)
+    return float(np.max(np.abs(a - b) / np.maximum(np.abs(b), 1.0))) if len(b) else 0.0
+
+
+def main(timeframe: str = TIMEFRAME, tolerance: float = 1e-9):
+    """Verifica a paridade incremental × `ta` para todos os símbolos."""
+    ok = True
+    for symbol in list_symbols('ohlcv', timeframe=timeframe):
+        try:
+            diff = check_parity(read_table('ohlcv', symbol, timeframe=timeframe))
+            if diff <= tolerance:
+                print(f"[OK] {symbol}: diferença máxima {diff:.2e}")
+            else:
+                ok = False
+                print(f"[ERRO] {symbol}: diferença máxima {diff:.2e} > {tolerance:.0e}")
+        except Exception as e:
+            ok = False
+            print(f"[ERRO] {symbol}: {e}")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Features incrementais: verificação de paridade com o `ta`")
+    parser.add_argument('--check', action='store_true', help='Compara o cálculo incremental com o completo')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if main(args.timeframe) else 1)
+    parser.print_help()
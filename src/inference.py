@@ -1,129 +1,158 @@
 import os
-import glob
-import pandas as pd
-import joblib
-from src.config import DATA_DIR
-
-# Diretórios de entrada e saída\FEATURES_DIR = os.path.join(DATA_DIR, 'features')
-# Diretórios de saída de modelos
-FEATURES_DIR = os.path.join(DATA_DIR, 'features')
-MODELS_DIR = os.path.join(DATA_DIR, 'models')
-
-# Colunas usadas como features pelo modelo
-FEATURE_COLS = [
-    'open', 'high', 'low', 'close', 'volume',
-    'sma20', 'ema50', 'rsi14', 'macd', 'atr14', 'obv'
-]
-
-def infer_symbol(symbol: str) -> int:
+from typing import TYPE_CHECKING
+import numpy as np
+from src.schema import FEATURE_COLS, POOLED_MODEL, pooled_matrix
+from src.forest import CompiledForest
+from src.registry import get_model
+from src.storage import list_symbols, read_tail, models_dir, timeframe_dir, signals_path
+
+# pandas só na primeira leitura/avaliação; timeframe None = TIMEFRAME do .env (resolvido em storage)
+if TYPE_CHECKING:
+    import pandas as pd
+
+def predict_signal(model, df_feat: 'pd.DataFrame') -> int:
+    """Aplica `model` à última linha de features e retorna o sinal (1/0)."""
+    if df_feat.empty:
+        raise ValueError("Sem dados de features suficientes")
+    last_row = df_feat.iloc[[-1]][FEATURE_COLS]
+    return int(model.predict(last_row)[0])
+
+
+def infer_symbol(symbol: str, timeframe: str = None) -> int:
     """
     Retorna o sinal de compra (1) ou não (0) para o símbolo.
     Lança ValueError se não houver dados suficientes.
     """
-    feat_file = os.path.join(FEATURES_DIR, f"{symbol}_feat.csv")
-    if not os.path.exists(feat_file):
+    # Só a última linha de features
+    try:
+        last_row = read_tail('features', symbol, 1, columns=FEATURE_COLS, timeframe=timeframe)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Features não encontradas para {symbol}")
 
-    df_feat = pd.read_csv(feat_file, parse_dates=['date'])
-    if df_feat.empty:
+    if last_row.empty:
         raise ValueError(f"Sem dados de features suficientes para {symbol}")
 
-    # Seleciona a última linha de features
-    last_row = df_feat.iloc[[-1]][FEATURE_COLS]
-
-    model_file = os.path.join(MODELS_DIR, f"{symbol}_model.joblib")
+    model_file = os.path.join(models_dir(timeframe), f"{symbol}_model.joblib")
     if not os.path.exists(model_file):
         raise FileNotFoundError(f"Modelo não encontrado para {symbol}")
 
-    model = joblib.load(model_file)
-    signal = model.predict(last_row)[0]
-    return int(signal)
+    # Do cache do registro; floresta compilada (.npz) quando disponível
+    model = get_model(model_file)
+    return predict_signal(model, last_row)
 
-if __name__ == '__main__':
-    buy_list = []
-    skip_list = []
+def buy_proba(model, X) -> tuple:
+    """Retorna (sinais, probabilidade da classe 1) de `model` para as linhas de X."""
+    proba = model.predict_proba(X)
+    classes = np.asarray(model.classes_ if hasattr(model, 'classes_') else model.classes)
+    signals = classes[np.argmax(proba, axis=1)].astype(int)
+    buy = proba[:, classes == 1][:, 0] if (classes == 1).any() else np.zeros(len(proba))
+    return signals, buy
 
-    # Itera sobre todos os arquivos de features gerados
-    for feat_path in glob.glob(os.path.join(FEATURES_DIR, '*_feat.csv')):
-        symbol = os.path.basename(feat_path).split('_')[0]
-        try:
-            sig = infer_symbol(symbol)
-            if sig == 1:
-                buy_list.append(symbol)
-        except Exception as e:
-            skip_list.append(f"{symbol}: {e}")
 
-    # Exibe sinais de compra
-    print("### Sinais de Compra ###")
-    if buy_list:
-        print(', '.join(sorted(buy_list)))
-    else:
-        print("Nenhum sinal de compra no momento.")
+def last_feature_row(symbol: str, timeframe: str = None) -> np.ndarray:
+    """Última linha de features de `symbol` (em FEATURE_COLS), lida com read_tail."""
+    try:
+        df = read_tail('features', symbol, 1, columns=FEATURE_COLS, timeframe=timeframe)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Features não encontradas para {symbol}")
+    if df.empty:
+        raise ValueError(f"Sem dados de features suficientes para {symbol}")
+    return df[FEATURE_COLS].to_numpy(dtype=float)[0]
 
-    # Exibe erros e pulos
-    if skip_list:
-        print("\n### Erros/Pulos ###")
-        for err in skip_list:
-            print(err)
 
-    # (Opcional) Exportar sinais de compra para arquivo
-    output_json = os.path.join(DATA_DIR, 'buy_signals.json')
-    pd.Series(buy_list).to_json(output_json, orient='values')
-    print(f"\nSinais exportados em: {output_json}")
-import os
-import glob
-import pandas as pd
-import joblib
-from src.config import DATA_DIR
-
-# Diretórios de entrada e saída\FEATURES_DIR = os.path.join(DATA_DIR, 'features')
-# Diretórios de saída de modelos
-FEATURES_DIR = os.path.join(DATA_DIR, 'features')
-MODELS_DIR = os.path.join(DATA_DIR, 'models')
-
-# Colunas usadas como features pelo modelo
-FEATURE_COLS = [
-    'open', 'high', 'low', 'close', 'volume',
-    'sma20', 'ema50', 'rsi14', 'macd', 'atr14', 'obv'
-]
-
-def infer_symbol(symbol: str) -> int:
+def infer_batch(symbols: list, timeframe: str = None, pooled: bool = False) -> tuple:
     """
-    Retorna o sinal de compra (1) ou não (0) para o símbolo.
-    Lança ValueError se não houver dados suficientes.
+    Inferência de todos os `symbols` de uma vez: lê só a última linha de
+    features de cada um (read_tail) e avalia com score_rows.
+    Retorna (DataFrame indexado por símbolo com 'signal' e 'proba',
+    {símbolo: exceção} dos que não puderam ser avaliados).
     """
-    feat_file = os.path.join(FEATURES_DIR, f"{symbol}_feat.csv")
-    if not os.path.exists(feat_file):
-        raise FileNotFoundError(f"Features não encontradas para {symbol}")
-
-    df_feat = pd.read_csv(feat_file, parse_dates=['date'])
-    if df_feat.empty:
-        raise ValueError(f"Sem dados de features suficientes para {symbol}")
-
-    # Seleciona a última linha de features
-    last_row = df_feat.iloc[[-1]][FEATURE_COLS]
+    errors = {}
+    frames = {}
+    for symbol in symbols:
+        try:
+            frames[symbol] = last_feature_row(symbol, timeframe)
+        except Exception as e:
+            errors[symbol] = e
+    result, score_errors = score_rows(frames, timeframe, pooled)
+    errors.update(score_errors)
+    return result, errors
 
-    model_file = os.path.join(MODELS_DIR, f"{symbol}_model.joblib")
-    if not os.path.exists(model_file):
-        raise FileNotFoundError(f"Modelo não encontrado para {symbol}")
 
-    model = joblib.load(model_file)
-    signal = model.predict(last_row)[0]
-    return int(signal)
+def score_rows(frames: dict, timeframe: str = None, pooled: bool = False) -> tuple:
+    """
+    Avalia {símbolo: linha de features}: monta uma matriz (símbolos ×
+    FEATURE_COLS) e chama predict_proba uma vez por modelo: uma única vez
+    com o modelo pooled, ou uma por arquivo de modelo por símbolo.
+    Retorna (DataFrame com 'signal' e 'proba', {símbolo: exceção}).
+    """
+    import pandas as pd
 
-if __name__ == '__main__':
-    buy_list = []
-    skip_list = []
+    errors = {}
 
-    # Itera sobre todos os arquivos de features gerados
-    for feat_path in glob.glob(os.path.join(FEATURES_DIR, '*_feat.csv')):
-        symbol = os.path.basename(feat_path).split('_')[0]
+    # Agrupa as linhas por arquivo de modelo
+    groups = {}
+    if pooled:
+        model_file = os.path.join(models_dir(timeframe), POOLED_MODEL)
+        if frames:
+            groups[model_file] = list(frames)
+    else:
+        for symbol in frames:
+            model_file = os.path.join(models_dir(timeframe), f"{symbol}_model.joblib")
+            if os.path.exists(model_file):
+                groups.setdefault(model_file, []).append(symbol)
+            else:
+                errors[symbol] = FileNotFoundError(f"Modelo não encontrado para {symbol}")
+
+    out = []
+    for model_file, group in groups.items():
         try:
-            sig = infer_symbol(symbol)
-            if sig == 1:
-                buy_list.append(symbol)
+            part = _score_group(model_file, group, frames, pooled, errors)
         except Exception as e:
-            skip_list.append(f"{symbol}: {e}")
+            # Modelo corrompido, coluna ausente etc.: falham só os símbolos deste modelo
+            for symbol in group:
+                errors.setdefault(symbol, e)
+            continue
+        if part is not None:
+            out.append(part)
+
+    result = pd.concat(out) if out else pd.DataFrame({'signal': pd.Series(dtype=int), 'proba': pd.Series(dtype=float)})
+    return result, errors
+
+
+def _score_group(model_file: str, group: list, frames: dict, pooled: bool, errors: dict) -> 'pd.DataFrame':
+    """Avalia as linhas de `group` com o modelo de `model_file` (ver score_rows)."""
+    import pandas as pd
+
+    model = get_model(model_file)
+    X = np.vstack([frames[s] for s in group])
+    if not (isinstance(model, CompiledForest) and model.feature_names == FEATURE_COLS):
+        # Modelos do sklearn (e o pooled) recebem as colunas por nome
+        X = pd.DataFrame(X, columns=FEATURE_COLS)
+    if pooled:
+        if isinstance(model, CompiledForest):
+            model = {'model': model, 'symbols': list(model.extra['symbols'])}
+        symbol_ids = {s: i for i, s in enumerate(model['symbols'])}
+        known = [s in symbol_ids for s in group]
+        for symbol, ok in zip(group, known):
+            if not ok:
+                errors[symbol] = ValueError(f"{symbol} não fez parte do treino do modelo pooled")
+        group = [s for s, ok in zip(group, known) if ok]
+        if not group:
+            return None
+        X = pooled_matrix(X[known].reset_index(drop=True), [symbol_ids[s] for s in group])
+        model = model['model']
+    signals, buy = buy_proba(model, X)
+    return pd.DataFrame({'signal': signals, 'proba': buy}, index=pd.Index(group, name='symbol'))
+
+
+def report_signals(buy_list: list, skip_list: list, timeframe: str = None, probabilities: dict = None) -> str:
+    """
+    Exibe os sinais de compra e os erros/pulos e exporta os sinais em
+    buy_signals.json (e, se dadas, as probabilidades de compra por
+    símbolo em buy_probabilities.json). Retorna o caminho do JSON.
+    """
+    import pandas as pd
 
     # Exibe sinais de compra
     print("### Sinais de Compra ###")
@@ -138,7 +167,18 @@ if __name__ == '__main__':
         for err in skip_list:
             print(err)
 
-    # (Opcional) Exportar sinais de compra para arquivo
-    output_json = os.path.join(DATA_DIR, 'buy_signals.json')
+    # Exporta sinais de compra para arquivo
+    output_json = signals_path(timeframe)
     pd.Series(buy_list).to_json(output_json, orient='values')
+    if probabilities is not None:
+        pd.Series(probabilities, dtype=float).to_json(
+            os.path.join(timeframe_dir(timeframe), 'buy_probabilities.json'), orient='index')
     print(f"\nSinais exportados em: {output_json}")
+    return output_json
+
+if __name__ == '__main__':
+    # Avalia todos os símbolos com features geradas
+    signals, errors = infer_batch(list_symbols('features'))
+    buy_list = list(signals.index[signals['signal'] == 1])
+    skip_list = [f"{symbol}: {e}" for symbol, e in errors.items()]
+    report_signals(buy_list, skip_list, probabilities=signals['proba'].to_dict())
@@ -1,10 +1,10 @@
-import os
-import glob
 import pandas as pd
-from src.config import DATA_DIR
+from src.config import TIMEFRAME, WORKERS
+from src.parallel import run_per_symbol
+from src.storage import list_symbols, read_table, write_table
 
 # Parâmetros de labeling
-HORIZON = 7       # horizonte em dias para calcular retorno futuro
+HORIZON = 7       # horizonte em velas (dias no timeframe '1d') para calcular retorno futuro
 THRESHOLD = 0.05  # limiar de retorno para definir sinal de compra
 
 
@@ -23,25 +23,23 @@ def generate_labels(df: pd.DataFrame, horizon: int = HORIZON, threshold: float =
     return df.dropna().reset_index(drop=True)
 
 
-def main():
+def labels_for(symbol: str, timeframe: str = TIMEFRAME) -> str:
+    """Gera e salva os labels de um símbolo (ver main). Retorna o caminho gravado."""
+    df_feat = read_table('features', symbol, timeframe=timeframe)
+    df_lab = generate_labels(df_feat)
+    out_path = write_table(df_lab, 'labels', symbol, timeframe=timeframe)
+    print(f"[OK] Labels para {symbol} → {out_path}")
+    return out_path
+
+
+def main(timeframe: str = TIMEFRAME, workers: int = WORKERS):
     """
-    Lê todos os arquivos de features em DATA_DIR/features,
-    gera labels e salva em DATA_DIR/labels/SYMBOL_label.csv.
+    Lê todos os arquivos de features do `timeframe` em DATA_DIR/features,
+    gera labels e salva em DATA_DIR/labels/SYMBOL_label.parquet.
+    Com `workers` > 1, processa os símbolos em paralelo.
     """
-    features_dir = os.path.join(DATA_DIR, 'features')
-    labels_dir = os.path.join(DATA_DIR, 'labels')
-    os.makedirs(labels_dir, exist_ok=True)
-
-    for filepath in glob.glob(os.path.join(features_dir, '*_feat.csv')):
-        symbol = os.path.basename(filepath).split('_')[0]
-        try:
-            df_feat = pd.read_csv(filepath, parse_dates=['date'])
-            df_lab = generate_labels(df_feat)
-            out_path = os.path.join(labels_dir, f"{symbol}_label.csv")
-            df_lab.to_csv(out_path, index=False)
-            print(f"[OK] Labels para {symbol} → {out_path}")
-        except Exception as e:
-            print(f"[ERRO] {symbol}: {e}")
+    run_per_symbol(labels_for, list_symbols('features', timeframe=timeframe), workers=workers,
+                   timeframe=timeframe)
 
 if __name__ == '__main__':
     main()
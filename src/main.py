@@ -1,42 +1,34 @@
-import argparse
 import sys
+import time
+import argparse
+
+# Só o necessário para o argparse: cada etapa importa os seus módulos ao
+# ser executada (ex.: --infer não carrega ccxt, pycoingecko, sklearn nem ta).
+# O .env só é lido ao montar o argparse (config resolve no primeiro acesso)
+from src import config
+from src.metrics import start_run, finish_run, stage, PROFILE_TOP
 
-# Importa módulos internos
-from src.fetch_top50 import fetch_top50
-from src.fetch_ohlcv import main as fetch_ohlcv_all
-from src.features import main as gen_all_features
-from src.label import main as gen_all_labels
-from src.model import main as train_all_models
-from src.inference import infer_symbol, FEATURE_COLS
-from src.config import DATA_DIR
-import glob
-import os
-import pandas as pd
 
+def run_inference(timeframe: str = None, pooled: bool = False):
+    """
+    Sinais de todos os símbolos em lote (ver inference.infer_batch):
+    só a última linha de features de cada um e um predict por modelo.
+    """
+    from src.inference import infer_batch, report_signals
+    from src.registry import registry
+    from src.storage import list_symbols
 
-def run_inference():
-    from src.inference import infer_symbol
-    buy_list = []
-    skip_list = []
-    features_dir = os.path.join(DATA_DIR, 'features')
-    for feat_path in glob.glob(os.path.join(features_dir, '*_feat.csv')):
-        symbol = os.path.basename(feat_path).split('_')[0]
-        try:
-            sig = infer_symbol(symbol)
-            if sig == 1:
-                buy_list.append(symbol)
-        except Exception as e:
-            skip_list.append(f"{symbol}: {e}")
-    # Exibe
-    print("### Sinais de Compra ###")
-    print(', '.join(sorted(buy_list)) or "Nenhum sinal de compra no momento.")
-    if skip_list:
-        print("\n### Erros/Pulos ###")
-        print('\n'.join(skip_list))
-    # Exporta JSON
-    output_json = os.path.join(DATA_DIR, 'buy_signals.json')
-    pd.Series(buy_list).to_json(output_json, orient='values')
-    print(f"\nSinais exportados em: {output_json}")
+    start = time.perf_counter()
+    symbols = list_symbols('features', timeframe=timeframe)
+    with stage('inference') as extra:
+        signals, errors = infer_batch(symbols, timeframe=timeframe, pooled=pooled)
+        # Tempo de carga dos modelos (separado do predict)
+        extra['models'] = registry.stats()
+    buy_list = [s for s in signals.index if signals.at[s, 'signal'] == 1]
+    skip_list = [f"{symbol}: {errors[symbol]}" for symbol in symbols if symbol in errors]
+    print(f"Inferência de {len(signals)} símbolos em {time.perf_counter() - start:.3f}s")
+    print(registry.format_stats())
+    report_signals(buy_list, skip_list, timeframe=timeframe, probabilities=signals['proba'].to_dict())
 
 
 def main():
@@ -51,31 +43,92 @@ def main():
     group.add_argument('--labels', action='store_true', help='Gera labels de buy/sell')
     group.add_argument('--train', action='store_true', help='Treina modelos para todas as criptos')
     group.add_argument('--infer', action='store_true', help='Executa inferência e gera sinais')
+    parser.add_argument('--full', action='store_true', help='Reprocessa tudo: histórico OHLCV completo e features recalculadas do zero')
+    parser.add_argument('--panel', action='store_true', help='Gera as features de todos os símbolos de uma vez (modo painel)')
+    parser.add_argument('--workers', type=int, default=config.WORKERS, help='Processos para as etapas por símbolo (features, labels, treino)')
+    parser.add_argument('--fused', action='store_true', help='Com --all: processa cada símbolo em memória, sem arquivos intermediários')
+    parser.add_argument('--write-intermediate', action='store_true', help='Com --fused: grava também as tabelas de features e labels')
+    parser.add_argument('--force', action='store_true', help='Com --all: executa todas as etapas, mesmo as com entradas inalteradas')
+    parser.add_argument('--pooled', action='store_true', help='Treino/inferência com um único modelo para todos os símbolos')
+    parser.add_argument('--profile', action='store_true', help='Roda cada símbolo sob cProfile e guarda os perfis dos mais lentos')
+    parser.add_argument('--profile-top', type=int, default=PROFILE_TOP, help='Com --profile: perfis mantidos por etapa')
+    parser.add_argument('--timeframe', type=str, default=config.TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h', '15m')")
 
     args = parser.parse_args()
 
-    if args.all:
-        fetch_top50()
-        fetch_ohlcv_all()
-        gen_all_features()
-        gen_all_labels()
-        train_all_models()
-        run_inference()
-    elif args.fetch_top50:
-        fetch_top50()
-    elif args.fetch_ohlcv:
-        fetch_ohlcv_all()
-    elif args.features:
-        gen_all_features()
-    elif args.labels:
-        gen_all_labels()
-    elif args.train:
-        train_all_models()
-    elif args.infer:
-        run_inference()
-    else:
-        parser.print_help()
-        sys.exit(1)
+    tf = args.timeframe
+
+    def train_models():
+        from src.model import main as train_all_models, train_pooled
+        with stage('train'):
+            if args.pooled:
+                train_pooled(timeframe=tf)
+            else:
+                train_all_models(timeframe=tf, workers=args.workers)
+
+    def run_features():
+        with stage('features'):
+            if args.panel:
+                from src.panel import main as gen_all_features_panel
+                gen_all_features_panel(timeframe=tf)
+            else:
+                from src.features import main as gen_all_features
+                gen_all_features(timeframe=tf, incremental=not args.full, workers=args.workers)
+
+    def run_labels():
+        from src.label import main as gen_all_labels
+        with stage('labels'):
+            gen_all_labels(timeframe=tf, workers=args.workers)
+
+    def run_fetch_top50():
+        from src.fetch_top50 import fetch_top50
+        with stage('fetch_top50'):
+            fetch_top50()
+
+    def run_fetch_ohlcv():
+        from src.fetch_ohlcv import main as fetch_ohlcv_all
+        with stage('fetch_ohlcv'):
+            fetch_ohlcv_all(incremental=not args.full, timeframe=tf)
+
+    # Métricas por etapa e por símbolo em <timeframe>/metrics/run_*.jsonl
+    start_run(tf, profile=args.profile, top=args.profile_top)
+    try:
+        if args.all:
+            run_fetch_top50()
+            run_fetch_ohlcv()
+            if args.fused:
+                from src.pipeline import run_fused
+                with stage('fused'):
+                    run_fused(timeframe=tf, workers=args.workers, write_intermediate=args.write_intermediate)
+            elif args.panel or args.pooled:
+                run_features()
+                run_labels()
+                train_models()
+                run_inference(timeframe=tf, pooled=args.pooled)
+            else:
+                # Só reexecuta as etapas cujas entradas mudaram desde a última execução
+                from src.pipeline import run_dag
+                with stage('dag'):
+                    run_dag(timeframe=tf, workers=args.workers, force=args.force or args.full,
+                            incremental=not args.full)
+                run_inference(timeframe=tf)
+        elif args.fetch_top50:
+            run_fetch_top50()
+        elif args.fetch_ohlcv:
+            run_fetch_ohlcv()
+        elif args.features:
+            run_features()
+        elif args.labels:
+            run_labels()
+        elif args.train:
+            train_models()
+        elif args.infer:
+            run_inference(timeframe=tf, pooled=args.pooled)
+        else:
+            parser.print_help()
+            sys.exit(1)
+    finally:
+        finish_run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import glob
+import asyncio
+import hashlib
+import inspect
+import argparse
+from src import config
+from src.config import MARKET_DATA_MODE, MARKET_DATA_LATENCY
+
+# Modos do backend de dados de mercado
+MODES = ('live', 'record', 'replay')
+
+# Chamadas de rede gravadas/reproduzidas (ccxt e CoinGecko)
+NETWORK_METHODS = {'load_markets', 'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_trading_fees',
+                   'get_coins_markets'}
+
+
+class MarketDataMissing(LookupError):
+    """Chamada sem resposta gravada no modo replay."""
+
+
+def call_key(method: str, args: tuple, kwargs: dict) -> str:
+    """Chave da chamada: hash do método e dos argumentos (JSON canônico)."""
+    payload = json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class MarketData:
+    """
+    Envolve um cliente de dados de mercado (exchange ccxt, síncrona ou
+    assíncrona, ou CoinGeckoAPI). No modo 'record', cada chamada de
+    NETWORK_METHODS vai à rede e a resposta é gravada em
+    <base_dir>/<source>/<método>/<hash>.json; no modo 'replay', as
+    respostas vêm só do disco (com `latency` segundos de atraso simulado).
+    Os demais atributos (parse_timeframe, markets, ...) são os do cliente.
+    """
+
+    def __init__(self, target, source: str, mode: str = MARKET_DATA_MODE, base_dir: str = None,
+                 latency: float = MARKET_DATA_LATENCY):
+        if mode not in MODES:
+            raise ValueError(f"MARKET_DATA_MODE inválido: {mode} (use {', '.join(MODES)})")
+        self._target = target
+        self._source = source
+        self._mode = mode
+        self._base_dir = base_dir or config.MARKET_DATA_DIR
+        self._latency = latency
+
+    def _path(self, method: str, args: tuple, kwargs: dict) -> str:
+        return os.path.join(self._base_dir, self._source, method, call_key(method, args, kwargs) + '.json')
+
+    def _save(self, method: str, args: tuple, kwargs: dict, response):
+        if method == 'load_markets':
+            # Os mercados ficam no próprio cliente (markets/currencies)
+            response = {'markets': self._target.markets, 'currencies': self._target.currencies}
+        path = self._path(method, args, kwargs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'method': method, 'args': list(args), 'kwargs': kwargs, 'response': response}, f,
+                      default=str)
+        os.replace(tmp_path, path)
+
+    def _load(self, method: str, args: tuple, kwargs: dict):
+        path = self._path(method, args, kwargs)
+        if not os.path.exists(path):
+            if method == 'fetch_ohlcv':
+                # Além do que foi gravado não há velas novas: a paginação termina
+                return []
+            raise MarketDataMissing(f"Sem resposta gravada para {self._source}.{method}{tuple(args)} {kwargs or ''}")
+        with open(path, encoding='utf-8') as f:
+            response = json.load(f)['response']
+        if method == 'load_markets':
+            self._target.set_markets(response['markets'], response['currencies'] or None)
+            return self._target.markets
+        return response
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in NETWORK_METHODS or self._mode == 'live':
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            async def call_async(*args, **kwargs):
+                if self._mode == 'replay':
+                    if self._latency:
+                        await asyncio.sleep(self._latency)
+                    return self._load(name, args, kwargs)
+                response = await attr(*args, **kwargs)
+                self._save(name, args, kwargs, response)
+                return response
+            return call_async
+
+        def call(*args, **kwargs):
+            if self._mode == 'replay':
+                if self._latency:
+                    time.sleep(self._latency)
+                return self._load(name, args, kwargs)
+            response = attr(*args, **kwargs)
+            self._save(name, args, kwargs, response)
+            return response
+        return call
+
+
+def wrap(target, source: str, mode: str = None):
+    """Cliente com o backend de MARKET_DATA_MODE (no modo 'live', o próprio `target`)."""
+    mode = mode or MARKET_DATA_MODE
+    if mode == 'live':
+        return target
+    return MarketData(target, source, mode)
+
+
+def stats(base_dir: str = None) -> dict:
+    """Respostas gravadas por fonte e método: {(fonte, método): quantidade}."""
+    counts = {}
+    for path in glob.glob(os.path.join(base_dir or config.MARKET_DATA_DIR, '*', '*', '*.json')):
+        method_dir = os.path.dirname(path)
+        key = (os.path.basename(os.path.dirname(method_dir)), os.path.basename(method_dir))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Respostas gravadas de exchange/CoinGecko (MARKET_DATA_MODE=record)")
+    parser.add_argument('--dir', type=str, default=None, help='Diretório das gravações (padrão: MARKET_DATA_DIR)')
+    args = parser.parse_args()
+    args.dir = args.dir or config.MARKET_DATA_DIR
+    counts = stats(args.dir)
+    print(f"Modo atual: {MARKET_DATA_MODE} | gravações em: {args.dir}")
+    for (source, method), n in sorted(counts.items()):
+        print(f"{source:<12} {method:<20} {n:>6}")
+    if not counts:
+        print("Nenhuma resposta gravada.")
@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import contextlib
+from datetime import datetime
+from src import config
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage (pico de RSS e CPU dos filhos ficam ausentes)
+    resource = None
+
+# Diretório dos perfis da execução ativa; variável de ambiente para ser herdada pelos workers
+PROFILE_ENV = 'CRYPTO_ML_PROFILE_DIR'
+# Perfis mantidos por etapa com --profile (os símbolos mais lentos)
+PROFILE_TOP = 5
+
+# Linhas lidas/gravadas pelo storage neste processo (ver count_rows)
+_rows = {'rows_in': 0, 'rows_out': 0}
+# Execução ativa (start_run): arquivo JSON lines e registros já gravados
+_run = None
+
+
+def count_rows(direction: str, n: int):
+    """Contabiliza `n` linhas lidas ('rows_in') ou gravadas ('rows_out')."""
+    _rows[direction] += n
+
+
+def _peak_rss_mb(children: bool = False):
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss: KB no Linux, bytes no macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _cpu_seconds(children: bool = False) -> float:
+    cpu = time.process_time()
+    if children and resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += usage.ru_utime + usage.ru_stime
+    return cpu
+
+
+def _io_bytes() -> tuple:
+    """(bytes lidos, bytes gravados) pelo processo; (None, None) fora do Linux."""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class Probe:
+    """
+    Mede um trecho do processo: tempo de relógio, CPU, pico de RSS,
+    linhas lidas/gravadas pelo storage e bytes de I/O. Com `children`,
+    inclui a CPU e o RSS dos processos filhos já encerrados (pools).
+    """
+
+    def __init__(self, children: bool = False):
+        self.children = children
+        self.wall = time.perf_counter()
+        self.cpu = _cpu_seconds(children)
+        self.rows = dict(_rows)
+        self.io = _io_bytes()
+
+    def stop(self) -> dict:
+        io_read, io_write = _io_bytes()
+        return {
+            'wall_s': time.perf_counter() - self.wall,
+            'cpu_s': _cpu_seconds(self.children) - self.cpu,
+            'peak_rss_mb': _peak_rss_mb(self.children),
+            'rows_in': _rows['rows_in'] - self.rows['rows_in'],
+            'rows_out': _rows['rows_out'] - self.rows['rows_out'],
+            'io_read_bytes': io_read - self.io[0] if io_read is not None else None,
+            'io_write_bytes': io_write - self.io[1] if io_write is not None else None,
+        }
+
+
+def measure_symbol(stage: str, symbol: str, func, *args, **kwargs) -> tuple:
+    """
+    Executa func(*args, **kwargs) medindo-a (ver Probe); com perfil ativo
+    (--profile), também sob cProfile, gravado em <perfis>/<etapa>__<símbolo>.prof.
+    Roda dentro do worker. Retorna (resultado, exceção, registro).
+    """
+    profile_dir = os.environ.get(PROFILE_ENV)
+    profiler = cProfile.Profile() if profile_dir else None
+    probe = Probe()
+    result = error = None
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+    except Exception as e:
+        error = e
+    record = {'type': 'symbol', 'stage': stage, 'symbol': symbol, 'pid': os.getpid(), **probe.stop()}
+    if profiler:
+        os.makedirs(profile_dir, exist_ok=True)
+        record['profile'] = os.path.join(profile_dir, f"{stage}__{symbol}.prof")
+        profiler.dump_stats(record['profile'])
+    return result, error, record
+
+
+def record(rec: dict):
+    """Grava `rec` no arquivo da execução ativa (sem execução ativa, não faz nada)."""
+    if _run is None:
+        return
+    rec = {'time': datetime.now().isoformat(timespec='milliseconds'), **rec}
+    _run['file'].write(json.dumps(rec, default=str) + '\n')
+    _run['file'].flush()
+    _run['records'].append(rec)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """
+    Mede uma etapa inteira (incluindo os workers dos pools) e grava o
+    registro ao final. O dicionário devolvido aceita campos extras.
+    """
+    probe = Probe(children=True)
+    first = len(_run['records']) if _run is not None else 0
+    extra = {}
+    status = 'ok'
+    try:
+        yield extra
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        rec = {'type': 'stage', 'stage': name, 'status': status, **probe.stop()}
+        # Linhas e I/O dos workers (outros processos) chegam pelos registros por símbolo
+        workers = [r for r in (_run['records'][first:] if _run is not None else [])
+                   if r['type'] == 'symbol' and r.get('pid', os.getpid()) != os.getpid()]
+        for key in ('rows_in', 'rows_out', 'io_read_bytes', 'io_write_bytes'):
+            if rec[key] is not None:
+                rec[key] += sum(r.get(key) or 0 for r in workers)
+        rec.update(extra)
+        record(rec)
+        if _run is not None:
+            print(f"[METRICS] {name}: {rec['wall_s']:.2f}s (CPU {rec['cpu_s']:.2f}s) | "
+                  f"linhas {rec['rows_in']} → {rec['rows_out']}")
+
+
+def start_run(timeframe: str = None, profile: bool = False, top: int = PROFILE_TOP) -> str:
+    """
+    Inicia o registro de métricas da execução em
+    <timeframe>/metrics/run_YYYYmmdd_HHMMSS.jsonl. Com `profile`, os
+    símbolos passam a rodar sob cProfile (ver finish_run).
+    """
+    global _run
+    from src.storage import timeframe_dir
+
+    timeframe = timeframe or config.TIMEFRAME
+    run_id = f"run_{datetime.now():%Y%m%d_%H%M%S}"
+    out_dir = os.path.join(timeframe_dir(timeframe), 'metrics')
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{run_id}.jsonl")
+    _run = {'path': path, 'file': open(path, 'a', encoding='utf-8'), 'records': [], 'top': top,
+            'probe': Probe(children=True), 'profile_dir': None}
+    if profile:
+        _run['profile_dir'] = os.path.join(out_dir, f"{run_id}_profiles")
+        os.environ[PROFILE_ENV] = _run['profile_dir']
+    record({'type': 'run', 'event': 'start', 'argv': sys.argv, 'timeframe': timeframe, 'profile': profile})
+    return path
+
+
+def _keep_slowest_profiles(records: list, top: int) -> list:
+    """Mantém os perfis dos `top` símbolos mais lentos de cada etapa (com relatório .txt)."""
+    kept = []
+    by_stage = {}
+    for rec in records:
+        if rec.get('profile'):
+            by_stage.setdefault(rec['stage'], []).append(rec)
+    for recs in by_stage.values():
+        recs.sort(key=lambda r: r['wall_s'], reverse=True)
+        for rec in recs[:top]:
+            txt = rec['profile'][:-len('.prof')] + '.txt'
+            with open(txt, 'w', encoding='utf-8') as f:
+                pstats.Stats(rec['profile'], stream=f).sort_stats('cumulative').print_stats(30)
+            kept.append((rec, txt))
+        for rec in recs[top:]:
+            with contextlib.suppress(OSError):
+                os.remove(rec['profile'])
+    return kept
+
+
+def finish_run():
+    """Grava o total da execução, imprime o resumo e fecha o arquivo."""
+    global _run
+    if _run is None:
+        return
+    run, records = _run, _run['records']
+    record({'type': 'run', 'event': 'end', **run['probe'].stop()})
+
+    stages = [r for r in records if r['type'] == 'stage']
+    symbols = [r for r in records if r['type'] == 'symbol']
+    if stages:
+        print("\n### Métricas por etapa ###")
+        for r in stages:
+            rss = f"{r['peak_rss_mb']:.0f}MB" if r['peak_rss_mb'] is not None else '-'
+            print(f"{r['stage']:<14} {r['wall_s']:>9.2f}s | CPU {r['cpu_s']:>9.2f}s | pico RSS {rss:>7} | "
+                  f"linhas {r['rows_in']:>9} → {r['rows_out']:>9}")
+    if symbols:
+        print("Símbolos mais lentos:")
+        for r in sorted(symbols, key=lambda r: r['wall_s'], reverse=True)[:run['top']]:
+            print(f"  {r['stage']:<14} {r['symbol']:<10} {r['wall_s']:>8.2f}s (CPU {r.get('cpu_s') or 0:.2f}s)")
+    if run['profile_dir']:
+        os.environ.pop(PROFILE_ENV, None)
+        kept = _keep_slowest_profiles(symbols, run['top'])
+        if kept:
+            print(f"Perfis (cProfile) dos mais lentos por etapa em: {run['profile_dir']}")
+    print(f"Métricas gravadas em: {run['path']}")
+    run['file'].close()
+    _run = None
@@ -1,69 +1,401 @@
 import os
-import glob
+import json
+import time
+import random
+import itertools
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
 import joblib
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import classification_report, accuracy_score
-from src.config import DATA_DIR
+from sklearn.metrics import classification_report, accuracy_score, balanced_accuracy_score
+from src.forest import export_forest, compiled_path
+from src.config import TIMEFRAME, WORKERS, CPU_BUDGET, WARM_START_TREES, TUNE_MAX_FITS, TUNE_MAX_SECONDS
+from src.parallel import run_per_symbol, SkipSymbol
+from src.storage import list_symbols, read_table, models_dir as get_models_dir
+# Colunas de entrada e matriz do modelo pooled (em schema.py, sem dependência do sklearn)
+from src.schema import FEATURE_COLS, POOLED_MODEL, pooled_matrix
 
-def train_and_evaluate(symbol: str, df: pd.DataFrame):
+# Hiperparâmetros do RandomForest e número de folds da validação
+MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42}
+N_SPLITS = 5
+
+# Espaço de busca do --tune (somado a MODEL_PARAMS) e fator de corte do successive halving
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200, 400],
+    'max_depth': [None, 4, 8, 16],
+    'min_samples_leaf': [1, 5, 20],
+    'max_features': ['sqrt', 0.5, 1.0],
+}
+HALVING_ETA = 3
+
+
+def _take(a, idx):
+    return a.iloc[idx] if hasattr(a, 'iloc') else a[idx]
+
+
+def _fit_fold(X, y, train_idx, test_idx, n_jobs: int, params: dict = MODEL_PARAMS) -> tuple:
+    """Treina um fold e retorna (métricas, modelo)."""
+    model = RandomForestClassifier(**params, n_jobs=n_jobs)
+    model.fit(_take(X, train_idx), _take(y, train_idx))
+    y_test = _take(y, test_idx)
+    y_pred = model.predict(_take(X, test_idx))
+    metrics = {
+        'train_rows': int(len(train_idx)),
+        'test_rows': int(len(test_idx)),
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'report': classification_report(y_test, y_pred),
+    }
+    return metrics, model
+
+
+def data_key(X, y, params: dict = MODEL_PARAMS) -> str:
+    """Hash dos dados de treino e dos parâmetros (chave do cache de folds)."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(pd.DataFrame(np.asarray(X)), index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).values.tobytes())
+    digest.update(json.dumps({'model': params, 'n_splits': N_SPLITS}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def evaluate_folds(name: str, X, y, splits: list, cache_path: str, cpu_budget: int = CPU_BUDGET,
+                   params: dict = MODEL_PARAMS) -> tuple:
+    """
+    Avalia os folds walk-forward `splits` [(train_idx, test_idx), ...] em
+    paralelo: até `cpu_budget` núcleos, divididos entre folds simultâneos
+    e árvores de cada floresta (n_jobs). As métricas ficam em `cache_path`
+    e são reaproveitadas enquanto dados e parâmetros não mudarem.
+    Retorna (métricas por fold, modelo do último fold ou None se do cache).
+    """
+    key = data_key(X, y, params)
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            for fold, metrics in enumerate(cached['folds'], 1):
+                print(f"--- {name} Fold {fold} (cache) ---")
+                print(metrics['report'])
+            return cached['folds'], None
+
+    fold_jobs = max(1, min(len(splits), cpu_budget))
+    tree_jobs = max(1, cpu_budget // fold_jobs)
+    # Threads: o treino das árvores libera o GIL e os dados não são copiados
+    results = Parallel(n_jobs=fold_jobs, prefer='threads')(
+        delayed(_fit_fold)(X, y, train_idx, test_idx, tree_jobs, params) for train_idx, test_idx in splits)
+    folds = [metrics for metrics, _ in results]
+    for fold, metrics in enumerate(folds, 1):
+        print(f"--- {name} Fold {fold} ---")
+        print(metrics['report'])
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'folds': folds}, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    return folds, results[-1][1] if results else None
+
+
+def fit_final(X, y, last_model=None, cpu_budget: int = CPU_BUDGET, params: dict = MODEL_PARAMS,
+              last_train_idx=None):
+    """
+    Modelo final sobre todo o conjunto. Com WARM_START_TREES > 0, o modelo
+    do último fold é reaproveitado (warm_start) e recebe WARM_START_TREES
+    árvores novas treinadas com todos os dados, em vez de treinar a
+    floresta inteira de novo. Se os folds vieram do cache (`last_model`
+    None), o modelo do último fold é refeito a partir de `last_train_idx`,
+    para que o resultado não dependa do estado do cache. Com
+    WARM_START_TREES = 0, refit completo.
+    """
+    if WARM_START_TREES > 0 and (last_model is not None or last_train_idx is not None):
+        if last_model is None:
+            last_model = RandomForestClassifier(**params, n_jobs=cpu_budget)
+            last_model.fit(_take(X, last_train_idx), _take(y, last_train_idx))
+        last_model.set_params(warm_start=True, n_jobs=cpu_budget,
+                              n_estimators=last_model.n_estimators + WARM_START_TREES)
+        last_model.fit(X, y)
+        return last_model.set_params(warm_start=False)
+    model = RandomForestClassifier(**params, n_jobs=cpu_budget)
+    return model.fit(X, y)
+
+
+def folds_path(name: str, timeframe: str = TIMEFRAME) -> str:
+    """Cache das métricas dos folds: models/NAME_folds.json"""
+    return os.path.join(get_models_dir(timeframe), f"{name}_folds.json")
+
+
+def params_path(name: str, timeframe: str = TIMEFRAME) -> str:
+    """Melhores parâmetros do --tune: models/NAME_params.json"""
+    return os.path.join(get_models_dir(timeframe), f"{name}_params.json")
+
+
+def load_params(name: str, timeframe: str = TIMEFRAME) -> dict:
+    """MODEL_PARAMS com os parâmetros do --tune de `name` (se houver)."""
+    path = params_path(name, timeframe)
+    if not os.path.exists(path):
+        return dict(MODEL_PARAMS)
+    with open(path, encoding='utf-8') as f:
+        return {**MODEL_PARAMS, **json.load(f)['params']}
+
+
+def train_and_evaluate(symbol: str, df: pd.DataFrame, timeframe: str = TIMEFRAME,
+                       cpu_budget: int = CPU_BUDGET):
     """
     Treina um RandomForestClassifier usando TimeSeriesSplit e salva o modelo.
-    Imprime relatório de classificação do último fold.
+    Os folds são avaliados em paralelo (ver evaluate_folds); os parâmetros
+    vêm de models/SYMBOL_params.json quando o --tune já foi executado.
+    Retorna o modelo final, treinado em todo o conjunto.
     """
     # Define features e label
-    feature_cols = ['open', 'high', 'low', 'close', 'volume',
-                    'sma20', 'ema50', 'rsi14', 'macd', 'atr14', 'obv']
-    X = df[feature_cols]
+    X = df[FEATURE_COLS]
     y = df['label']
+    params = load_params(symbol, timeframe)
 
     # TimeSeriesSplit para validação
-    tscv = TimeSeriesSplit(n_splits=5)
-    model = None
-    for fold, (train_idx, test_idx) in enumerate(tscv.split(X), 1):
-        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
-        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        print(f"--- {symbol} Fold {fold} ---")
-        print(classification_report(y_test, y_pred))
+    splits = list(TimeSeriesSplit(n_splits=N_SPLITS).split(X))
+    _, last_model = evaluate_folds(symbol, X, y, splits, folds_path(symbol, timeframe), cpu_budget, params)
 
     # Treina em todo o conjunto
-    final_model = RandomForestClassifier(n_estimators=100, random_state=42)
-    final_model.fit(X, y)
+    final_model = fit_final(X, y, last_model, cpu_budget, params, splits[-1][0] if splits else None)
+    # Gravado com n_jobs=1: na inferência, um predict de poucas linhas não precisa de threads
+    final_model.set_params(n_jobs=1)
     # Salva o modelo
-    models_dir = os.path.join(DATA_DIR, 'models')
+    models_dir = get_models_dir(timeframe)
     os.makedirs(models_dir, exist_ok=True)
     model_path = os.path.join(models_dir, f"{symbol}_model.joblib")
     joblib.dump(final_model, model_path)
+    # Versão compilada (arrays NumPy) usada pela inferência
+    export_forest(final_model, compiled_path(model_path))
     print(f"[OK] Modelo final para {symbol} salvo em: {model_path}\n")
+    return final_model
 
 
-def main():
-    labels_dir = os.path.join(DATA_DIR, 'labels')
-    features_dir = os.path.join(DATA_DIR, 'features')
+def load_symbol_frame(symbol: str, timeframe: str = TIMEFRAME) -> pd.DataFrame:
+    """
+    Carrega features e labels de um símbolo, alinhados por data.
+    Lança SkipSymbol se não houver features para o símbolo.
+    """
+    try:
+        df_feat = read_table('features', symbol, timeframe=timeframe)
+    except FileNotFoundError:
+        raise SkipSymbol("arquivo de features não encontrado.")
+    # Dos labels, apenas as colunas necessárias
+    df_lab = read_table('labels', symbol, columns=['date', 'label'], timeframe=timeframe)
+    # Faz merge por data para alinhar features e labels
+    df = pd.merge(df_feat, df_lab[['date', 'label']], on='date', how='inner')
+    return df.dropna().reset_index(drop=True)
 
-    for label_file in glob.glob(os.path.join(labels_dir, '*_label.csv')):
-        symbol = os.path.basename(label_file).split('_')[0]
-        feat_file = os.path.join(features_dir, f"{symbol}_feat.csv")
-        if not os.path.exists(feat_file):
-            print(f"[SKIP] {symbol}: arquivo de features não encontrado.")
-            continue
 
-        # Carrega dados
-        df_feat = pd.read_csv(feat_file, parse_dates=['date'])
-        df_lab = pd.read_csv(label_file, parse_dates=['date'])
-        # Faz merge por data para alinhar features e labels
-        df = pd.merge(df_feat, df_lab[['date', 'label']], on='date', how='inner')
-        df = df.dropna().reset_index(drop=True)
+def train_symbol(symbol: str, timeframe: str = TIMEFRAME, cpu_budget: int = CPU_BUDGET):
+    """Carrega features e labels de um símbolo e treina (ver train_and_evaluate)."""
+    df = load_symbol_frame(symbol, timeframe)
+    print(f"\nTreinando modelo para {symbol} com {len(df)} amostras...")
+    train_and_evaluate(symbol, df, timeframe=timeframe, cpu_budget=cpu_budget)
 
-        print(f"\nTreinando modelo para {symbol} com {len(df)} amostras...")
+
+def load_pooled_frame(timeframe: str = TIMEFRAME) -> pd.DataFrame:
+    """Empilha features + label de todos os símbolos, com a coluna 'symbol'."""
+    frames = []
+    for symbol in list_symbols('labels', timeframe=timeframe):
         try:
-            train_and_evaluate(symbol, df)
-        except Exception as e:
-            print(f"[ERRO] {symbol}: {e}\n")
+            df_feat = read_table('features', symbol, timeframe=timeframe)
+            df_lab = read_table('labels', symbol, columns=['date', 'label'], timeframe=timeframe)
+        except FileNotFoundError as e:
+            print(f"[SKIP] {symbol}: {e}")
+            continue
+        df = pd.merge(df_feat, df_lab, on='date', how='inner').dropna()
+        frames.append(df.assign(symbol=symbol))
+    if not frames:
+        raise ValueError("Nenhum símbolo com features e labels")
+    return pd.concat(frames, ignore_index=True)
+
+
+def date_folds(dates, gap: int = 0) -> list:
+    """
+    Folds walk-forward (TimeSeriesSplit) sobre as datas distintas de
+    `dates`, com `gap` datas descartadas entre treino e teste.
+    Retorna [(datas de treino, datas de teste), ...].
+    """
+    dates = np.unique(np.asarray(dates))
+    return [(dates[train], dates[test]) for train, test in TimeSeriesSplit(n_splits=N_SPLITS, gap=gap).split(dates)]
+
+
+def pooled_dataset(timeframe: str = TIMEFRAME) -> tuple:
+    """
+    Matriz do modelo pooled e folds walk-forward por data: cada fold treina
+    com as datas anteriores e testa nas seguintes, para todos os símbolos.
+    Retorna (X, y, splits, símbolos).
+    """
+    df = load_pooled_frame(timeframe)
+    symbols = sorted(df['symbol'].unique())
+    symbol_id = df['symbol'].map({s: i for i, s in enumerate(symbols)}).to_numpy()
+    X = pooled_matrix(df, symbol_id)
+    y = df['label'].to_numpy()
+
+    # Folds sobre as datas distintas, não sobre as linhas
+    row_date = df['date'].to_numpy()
+    splits = [(np.flatnonzero(row_date <= train_dates[-1]),
+               np.flatnonzero((row_date >= test_dates[0]) & (row_date <= test_dates[-1])))
+              for train_dates, test_dates in date_folds(row_date)]
+    return X, y, splits, symbols
+
+
+def train_pooled(timeframe: str = TIMEFRAME, cpu_budget: int = CPU_BUDGET) -> str:
+    """
+    Treina um único modelo com as linhas de todos os símbolos, validado
+    walk-forward por data (ver pooled_dataset).
+    Salva {modelo, símbolos} em models/pooled_model.joblib e retorna o caminho.
+    """
+    X, y, splits, symbols = pooled_dataset(timeframe)
+    params = load_params('pooled', timeframe)
+    print(f"\nTreinando modelo pooled com {len(y)} amostras de {len(symbols)} símbolos...")
+    _, last_model = evaluate_folds('pooled', X, y, splits, folds_path('pooled', timeframe), cpu_budget, params)
+
+    final_model = fit_final(X, y, last_model, cpu_budget, params, splits[-1][0] if splits else None)
+    final_model.set_params(n_jobs=1)
+    models_dir = get_models_dir(timeframe)
+    os.makedirs(models_dir, exist_ok=True)
+    model_path = os.path.join(models_dir, POOLED_MODEL)
+    joblib.dump({'model': final_model, 'symbols': symbols}, model_path)
+    export_forest(final_model, compiled_path(model_path), symbols=symbols)
+    print(f"[OK] Modelo pooled salvo em: {model_path}\n")
+    return model_path
+
+
+def _score_fold(X, y, train_idx, test_idx, params: dict) -> float:
+    """Acurácia balanceada de `params` em um fold (os labels são desbalanceados)."""
+    model = RandomForestClassifier(**params, n_jobs=1)
+    model.fit(_take(X, train_idx), _take(y, train_idx))
+    return float(balanced_accuracy_score(_take(y, test_idx), model.predict(_take(X, test_idx))))
+
+
+def tune(name: str, X, y, splits: list, timeframe: str = TIMEFRAME, max_fits: int = TUNE_MAX_FITS,
+         max_seconds: float = TUNE_MAX_SECONDS, cpu_budget: int = CPU_BUDGET) -> dict:
+    """
+    Busca de hiperparâmetros por successive halving sobre os folds
+    walk-forward `splits` (os mesmos do treino; X e y carregados uma vez e
+    compartilhados por todos os candidatos). O recurso é o número de folds:
+    todos os candidatos começam avaliados nos folds mais recentes, e a
+    cada rodada só 1/HALVING_ETA dos melhores segue, com HALVING_ETA vezes
+    mais folds (as notas já calculadas são reaproveitadas).
+    Para ao atingir `max_fits` treinos ou `max_seconds` segundos.
+    Grava o melhor em models/NAME_params.json e o retorna.
+    """
+    start = time.perf_counter()
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    random.Random(MODEL_PARAMS.get('random_state')).shuffle(grid)
+    # Candidatos iniciais: o que cabe no orçamento com 1 fold na primeira rodada
+    n_rungs = 1
+    while HALVING_ETA ** n_rungs < len(splits):
+        n_rungs += 1
+    candidates = grid[:max(1, min(len(grid), max_fits // n_rungs))]
+    scores = {i: {} for i in range(len(candidates))}
+    order = list(range(len(splits)))[::-1]          # folds do mais recente para o mais antigo
+    alive = list(range(len(candidates)))
+    fits = 0
+    n_folds = 1
+    stopped = None
+
+    while True:
+        tasks = [(i, f) for i in alive for f in order[:n_folds] if f not in scores[i]]
+        # Em lotes de `cpu_budget` treinos, checando o orçamento entre eles
+        for b in range(0, len(tasks), cpu_budget):
+            if fits >= max_fits:
+                stopped = f"limite de {max_fits} treinos"
+            elif time.perf_counter() - start >= max_seconds:
+                stopped = f"limite de {max_seconds:.0f}s"
+            if stopped:
+                break
+            batch = tasks[b:b + min(cpu_budget, max_fits - fits)]
+            results = Parallel(n_jobs=min(cpu_budget, len(batch)), prefer='threads')(
+                delayed(_score_fold)(X, y, *splits[f], {**MODEL_PARAMS, **candidates[i]}) for i, f in batch)
+            for (i, f), score in zip(batch, results):
+                scores[i][f] = score
+            fits += len(batch)
+
+        # Só competem os candidatos com todas as notas da rodada
+        ranked = sorted((i for i in alive if all(f in scores[i] for f in order[:n_folds])),
+                        key=lambda i: -np.mean(list(scores[i].values())))
+        if not ranked:
+            # Orçamento esgotado antes da primeira rodada completa
+            ranked = sorted((i for i in alive if scores[i]), key=lambda i: -np.mean(list(scores[i].values())))
+        print(f"{name}: {len(ranked)} candidatos com {n_folds} fold(s), "
+              f"melhor {np.mean(list(scores[ranked[0]].values())) if ranked else float('nan'):.3f}")
+        if stopped or n_folds >= len(splits) or len(ranked) <= 1:
+            break
+        alive = ranked[:max(1, len(ranked) // HALVING_ETA)]
+        n_folds = min(len(splits), n_folds * HALVING_ETA)
+
+    if not ranked:
+        raise ValueError(f"Orçamento insuficiente para avaliar algum candidato de {name}")
+    best = ranked[0]
+    result = {
+        'params': candidates[best],
+        'score': float(np.mean(list(scores[best].values()))),
+        'folds': len(scores[best]),
+        'fits': fits,
+        'seconds': round(time.perf_counter() - start, 2),
+        'stopped': stopped,
+    }
+    path = params_path(name, timeframe)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"[OK] Parâmetros de {name}: {result['params']} (acurácia balanceada {result['score']:.3f}, "
+          f"{fits} treinos, {result['seconds']}s{', ' + stopped if stopped else ''}) → {path}")
+    return result
+
+
+def tune_symbol(symbol: str, timeframe: str = TIMEFRAME, max_fits: int = TUNE_MAX_FITS,
+                max_seconds: float = TUNE_MAX_SECONDS, cpu_budget: int = CPU_BUDGET) -> dict:
+    """Executa tune() com os dados e folds de train_and_evaluate para `symbol`."""
+    df = load_symbol_frame(symbol, timeframe)
+    X, y = df[FEATURE_COLS], df['label']
+    splits = list(TimeSeriesSplit(n_splits=N_SPLITS).split(X))
+    return tune(symbol, X, y, splits, timeframe, max_fits, max_seconds, cpu_budget)
+
+
+def main(timeframe: str = TIMEFRAME, workers: int = WORKERS):
+    """
+    Treina um modelo por símbolo com labels em DATA_DIR/labels.
+    Com `workers` > 1, treina os símbolos em paralelo, dividindo o
+    CPU_BUDGET entre eles.
+    """
+    run_per_symbol(train_symbol, list_symbols('labels', timeframe=timeframe), workers=workers,
+                   timeframe=timeframe, cpu_budget=max(1, CPU_BUDGET // max(1, workers)))
+
+def tune_main(timeframe: str = TIMEFRAME, pooled: bool = False, symbols: list = None,
+              max_fits: int = TUNE_MAX_FITS, max_seconds: float = TUNE_MAX_SECONDS, workers: int = WORKERS):
+    """
+    --tune: busca os parâmetros do modelo pooled ou de cada símbolo
+    (`max_fits`/`max_seconds` valem por modelo). O treino seguinte usa
+    os parâmetros encontrados.
+    """
+    if pooled:
+        X, y, splits, _ = pooled_dataset(timeframe)
+        tune('pooled', X, y, splits, timeframe, max_fits, max_seconds)
+        return
+    symbols = symbols or list_symbols('labels', timeframe=timeframe)
+    run_per_symbol(tune_symbol, symbols, workers=workers, timeframe=timeframe, max_fits=max_fits,
+                   max_seconds=max_seconds, cpu_budget=max(1, CPU_BUDGET // max(1, workers)))
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Treino dos modelos")
+    parser.add_argument('--pooled', action='store_true', help='Treina um único modelo com todos os símbolos')
+    parser.add_argument('--tune', action='store_true', help='Busca hiperparâmetros (successive halving) em vez de treinar')
+    parser.add_argument('--symbols', nargs='+', default=None, help='Com --tune: símbolos a ajustar (padrão: todos)')
+    parser.add_argument('--max-fits', type=int, default=TUNE_MAX_FITS, help='Com --tune: máximo de treinos por modelo')
+    parser.add_argument('--max-seconds', type=float, default=TUNE_MAX_SECONDS, help='Com --tune: tempo máximo (s) por modelo')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Processos (um símbolo por processo)')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    if args.tune:
+        tune_main(args.timeframe, args.pooled, args.symbols, args.max_fits, args.max_seconds, args.workers)
+    elif args.pooled:
+        train_pooled(args.timeframe)
+    else:
+        main(args.timeframe, args.workers)
@@ -0,0 +1,218 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src.config import TIMEFRAME
+from src.storage import list_symbols, read_table, write_table
+from src.indicators import (SMA_WINDOW, EMA_WINDOW, MACD_FAST, MACD_SLOW, MACD_SIGN,
+                            RSI_WINDOW, ATR_WINDOW, INDICATOR_COLS, remove_state)
+
+# Colunas de preço/volume alinhadas no painel
+PANEL_COLS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def build_panel(frames: dict) -> tuple:
+    """
+    Alinha os DataFrames OHLCV de vários símbolos (já em ordem temporal)
+    em matrizes (tempo × símbolo). O alinhamento é pela última vela: o
+    símbolo com n velas ocupa as últimas n linhas, e as linhas anteriores
+    ficam NaN (histórico menor).
+    Retorna (símbolos, {coluna: matriz T×S}, start), onde start[s] é a
+    linha da primeira vela de cada símbolo.
+    """
+    symbols = list(frames)
+    frames = [frames[s] for s in symbols]
+    T = max((len(df) for df in frames), default=0)
+    start = np.array([T - len(df) for df in frames], dtype=int)
+    arrays = {}
+    for col in PANEL_COLS:
+        arr = np.full((T, len(symbols)), np.nan)
+        for j, df in enumerate(frames):
+            arr[start[j]:, j] = df[col].to_numpy(dtype=float)
+        arrays[col] = arr
+    return symbols, arrays, start
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Média móvel por coluna via soma acumulada; NaN onde a janela não está cheia."""
+    valid = ~np.isnan(x)
+    cs = np.cumsum(np.where(valid, x, 0.0), axis=0)
+    cnt = np.cumsum(valid, axis=0)
+    out = cs.copy()
+    out[window:] -= cs[:-window]
+    n = cnt.copy()
+    n[window:] -= cnt[:-window]
+    out = out / window
+    out[n < window] = np.nan
+    return out
+
+
+def _ewm(x: np.ndarray, alpha: np.ndarray, start: np.ndarray, seed: np.ndarray = None) -> np.ndarray:
+    """
+    Médias exponenciais recursivas (como ewm(adjust=False)) de várias séries
+    de uma vez, numa única passada no tempo.
+    x: (T, K, S); alpha: (K,); start: (K, S) linha onde cada série começa,
+    com valor inicial `seed` (padrão: o próprio x). Antes de start, NaN.
+    """
+    seed = x if seed is None else seed
+    a = np.asarray(alpha, dtype=float)[:, None]
+    out = np.full(x.shape, np.nan)
+    prev = np.full(x.shape[1:], np.nan)
+    for t in range(x.shape[0]):
+        step = (1 - a) * prev + a * x[t]
+        prev = np.where(t == start, seed[t], np.where(t > start, step, np.nan))
+        out[t] = prev
+    return out
+
+
+def panel_indicators(arrays: dict, start: np.ndarray) -> dict:
+    """
+    Calcula todos os indicadores de features.generate_features sobre o
+    painel, com kernels vetorizados por símbolo. Os valores em aquecimento
+    (e antes do início de cada símbolo) ficam NaN.
+    Retorna {indicador: matriz T×S}.
+    """
+    high, low, close, volume = arrays['high'], arrays['low'], arrays['close'], arrays['volume']
+    T, S = close.shape
+    rows = np.arange(T)[:, None]
+    age = rows - start[None, :]          # índice da vela dentro de cada símbolo
+
+    prev_close = np.vstack([np.full((1, S), np.nan), close[:-1]])
+    prev_close[age == 0] = np.nan
+
+    # RSI: variações (a primeira vela conta como zero)
+    diff = np.where(age == 0, 0.0, close - prev_close)
+    up = np.maximum(diff, 0.0)
+    down = np.maximum(-diff, 0.0)
+
+    # True range e semente do ATR (média simples da primeira janela)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr_seed = _rolling_mean(tr, ATR_WINDOW)
+
+    # Uma passada para EMA50, EMA12, EMA26, médias do RSI e ATR
+    stack = np.stack([close, close, close, up, down, tr], axis=1)
+    alphas = [2 / (EMA_WINDOW + 1), 2 / (MACD_FAST + 1), 2 / (MACD_SLOW + 1),
+              1 / RSI_WINDOW, 1 / RSI_WINDOW, 1 / ATR_WINDOW]
+    starts = np.stack([start] * 5 + [start + ATR_WINDOW - 1])
+    seeds = np.stack([close, close, close, up, down, atr_seed], axis=1)
+    ema, ema_fast, ema_slow, rsi_up, rsi_down, atr = np.moveaxis(_ewm(stack, alphas, starts, seeds), 1, 0)
+
+    # MACD: sinal começa na primeira linha MACD válida
+    line = ema_fast - ema_slow
+    line[age < MACD_SLOW - 1] = np.nan
+    signal = _ewm(line[:, None, :], [2 / (MACD_SIGN + 1)], (start + MACD_SLOW - 1)[None, :])[:, 0, :]
+    macd = line - signal
+    macd[age < MACD_SLOW + MACD_SIGN - 2] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(rsi_down == 0, 100.0, 100 - 100 / (1 + rsi_up / rsi_down))
+    rsi[(age < RSI_WINDOW - 1) | np.isnan(rsi_down)] = np.nan
+
+    ema[age < EMA_WINDOW - 1] = np.nan
+
+    # OBV: soma acumulada do volume com sinal
+    signed = np.where(prev_close > close, -volume, volume)
+    obv = np.cumsum(np.nan_to_num(signed), axis=0)
+    obv[age < 0] = np.nan
+
+    return {
+        'sma20': _rolling_mean(close, SMA_WINDOW),
+        'ema50': ema,
+        'macd': macd,
+        'rsi14': rsi,
+        'atr14': atr,
+        'obv': obv,
+    }
+
+
+def generate_features_panel(frames: dict) -> dict:
+    """
+    Versão em painel de features.generate_features para vários símbolos.
+    Recebe {símbolo: DataFrame OHLCV} e retorna {símbolo: DataFrame de
+    features}, com as mesmas linhas e colunas da versão por símbolo.
+    """
+    frames = {symbol: _sorted(df) for symbol, df in frames.items()}
+    symbols, arrays, start = build_panel(frames)
+    indicators = panel_indicators(arrays, start)
+    out = {}
+    for j, symbol in enumerate(symbols):
+        df = frames[symbol]
+        block = np.column_stack([indicators[col][start[j]:, j] for col in INDICATOR_COLS])
+        # Equivalente ao dropna() de generate_features, sem reconstruir colunas
+        keep = ~np.isnan(block).any(axis=1) & df.notna().all(axis=1).to_numpy()
+        df_ind = pd.DataFrame(block, columns=INDICATOR_COLS)
+        out[symbol] = pd.concat([df, df_ind], axis=1)[keep].reset_index(drop=True)
+    return out
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante 'date' como datetime e ordem temporal, como em generate_features."""
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date']))
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date')
+    return df.reset_index(drop=True)
+
+
+def main(timeframe: str = TIMEFRAME):
+    """
+    Gera as features de todos os símbolos do `timeframe` de uma vez, em
+    modo painel, e salva em DATA_DIR/features como SYMBOL_feat.parquet.
+    """
+    frames = {}
+    for symbol in list_symbols('ohlcv', timeframe=timeframe):
+        try:
+            frames[symbol] = read_table('ohlcv', symbol, timeframe=timeframe)
+        except Exception as e:
+            print(f"[ERRO] {symbol}: {e}")
+
+    for symbol, df_feat in generate_features_panel(frames).items():
+        try:
+            out_path = write_table(df_feat, 'features', symbol, timeframe=timeframe)
+            # O estado incremental não corresponde mais à tabela gravada
+            remove_state(symbol, timeframe=timeframe)
+            print(f"[OK] Features para {symbol} → {out_path}")
+        except Exception as e:
+            print(f"[ERRO] {symbol}: {e}")
+
+
+def check(timeframe: str = TIMEFRAME, tolerance: float = 1e-9) -> bool:
+    """Compara o modo painel com generate_features símbolo a símbolo e mede o tempo."""
+    from src.features import generate_features
+
+    frames = {s: read_table('ohlcv', s, timeframe=timeframe) for s in list_symbols('ohlcv', timeframe=timeframe)}
+
+    t0 = time.perf_counter()
+    panel = generate_features_panel(frames)
+    t_panel = time.perf_counter() - t0
+
+    ok = True
+    t_single = 0.0
+    for symbol, df in frames.items():
+        t0 = time.perf_counter()
+        ref = generate_features(df.copy())
+        t_single += time.perf_counter() - t0
+        got = panel[symbol]
+        if len(got) != len(ref):
+            ok = False
+            print(f"[ERRO] {symbol}: {len(got)} linhas no painel, {len(ref)} por símbolo")
+            continue
+        a = got[INDICATOR_COLS].to_numpy(dtype=float)
+        b = ref[INDICATOR_COLS].to_numpy(dtype=float)
+        diff = float(np.max(np.abs(a - b) / np.maximum(np.abs(b), 1.0))) if len(b) else 0.0
+        if diff > tolerance:
+            ok = False
+            print(f"[ERRO] {symbol}: diferença máxima {diff:.2e} > {tolerance:.0e}")
+        else:
+            print(f"[OK] {symbol}: diferença máxima {diff:.2e}")
+    print(f"\nPainel: {t_panel:.3f}s | por símbolo: {t_single:.3f}s ({len(frames)} símbolos)")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Features em modo painel (tempo × símbolo)")
+    parser.add_argument('--check', action='store_true', help='Compara com o cálculo por símbolo')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check(args.timeframe) else 1)
+    main(args.timeframe)
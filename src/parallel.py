@@ -0,0 +1,53 @@
+import io
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.config import WORKERS
+from src.metrics import measure_symbol, record
+
+
+class SkipSymbol(Exception):
+    """Símbolo pulado (ex.: arquivo de entrada ausente); reportado como [SKIP]."""
+
+
+def _call(func, symbol: str, kwargs: dict) -> tuple:
+    """
+    Executa func(symbol, **kwargs) capturando o que ela imprime, para que
+    a saída de cada símbolo apareça inteira mesmo com vários processos,
+    e medindo-a (ver metrics.measure_symbol).
+    Retorna (símbolo, saída, resultado, exceção, métricas).
+    """
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        result, error, metrics = measure_symbol(func.__name__, symbol, func, symbol, **kwargs)
+    return symbol, out.getvalue(), result, error, metrics
+
+
+def run_per_symbol(func, symbols: list, workers: int = WORKERS, report: bool = True, **kwargs) -> dict:
+    """
+    Executa func(symbol, **kwargs) para cada símbolo; com `workers` > 1,
+    em um pool de processos. A falha de um símbolo não interrompe os demais.
+    Com `report`, imprime a saída de cada símbolo e as linhas [ERRO]/[SKIP].
+    Retorna {símbolo: resultado ou exceção}.
+    """
+    results = {}
+    if workers <= 1:
+        calls = (_call(func, symbol, kwargs) for symbol in symbols)
+        return _collect(calls, results, report)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_call, func, symbol, kwargs) for symbol in symbols]
+        return _collect((f.result() for f in as_completed(futures)), results, report)
+
+
+def _collect(calls, results: dict, report: bool) -> dict:
+    for symbol, output, result, error, metrics in calls:
+        status = 'skip' if isinstance(error, SkipSymbol) else 'error' if error is not None else 'ok'
+        record({**metrics, 'status': status, **({'error': str(error)} if error is not None else {})})
+        if report:
+            print(output, end='')
+            if isinstance(error, SkipSymbol):
+                print(f"[SKIP] {symbol}: {error}")
+            elif error is not None:
+                print(f"[ERRO] {symbol}: {error}")
+        results[symbol] = error if error is not None else result
+    return results
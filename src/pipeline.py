@@ -0,0 +1,197 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from src.config import TIMEFRAME, WORKERS, CPU_BUDGET, WARM_START_TREES
+from src.indicators import SMA_WINDOW, EMA_WINDOW, MACD_FAST, MACD_SLOW, MACD_SIGN, RSI_WINDOW, ATR_WINDOW
+from src.features import generate_features, features_for
+from src.label import generate_labels, labels_for, HORIZON, THRESHOLD
+from src.model import train_and_evaluate, train_symbol, params_path, MODEL_PARAMS, N_SPLITS
+from src.inference import predict_signal, report_signals
+from src.parallel import run_per_symbol
+from src.storage import list_symbols, read_table, write_table, table_path, models_dir, timeframe_dir, file_hash
+
+
+def fused_symbol(symbol: str, timeframe: str = TIMEFRAME, write_intermediate: bool = False,
+                 cpu_budget: int = CPU_BUDGET) -> int:
+    """
+    Executa features → labels → treino → inferência para um símbolo, com
+    os DataFrames em memória: sem regravar/reler features e labels e sem
+    o merge por data do model.main (os labels já trazem as features).
+    Com `write_intermediate`, grava também as tabelas de features e labels;
+    o treino usa até `cpu_budget` núcleos. Retorna o sinal de compra (1/0) da última vela.
+    """
+    df_ohlcv = read_table('ohlcv', symbol, timeframe=timeframe)
+    df_feat = generate_features(df_ohlcv)
+    df_lab = generate_labels(df_feat)
+    if write_intermediate:
+        write_table(df_feat, 'features', symbol, timeframe=timeframe)
+        write_table(df_lab, 'labels', symbol, timeframe=timeframe)
+
+    print(f"\nTreinando modelo para {symbol} com {len(df_lab)} amostras...")
+    model = train_and_evaluate(symbol, df_lab, timeframe=timeframe, cpu_budget=cpu_budget)
+    return predict_signal(model, df_feat)
+
+
+def run_fused(timeframe: str = TIMEFRAME, workers: int = WORKERS, write_intermediate: bool = False):
+    """
+    Modo fundido de `--all` (após o download): processa cada símbolo de
+    DATA_DIR/ohlcv inteiramente em memória e exporta os sinais de compra.
+    """
+    buy_list = []
+    skip_list = []
+    symbols = list_symbols('ohlcv', timeframe=timeframe)
+    # CPU_BUDGET dividido entre os processos (como em model.main)
+    results = run_per_symbol(fused_symbol, symbols, workers=workers, timeframe=timeframe,
+                             write_intermediate=write_intermediate, cpu_budget=max(1, CPU_BUDGET // max(1, workers)))
+    for symbol in symbols:
+        sig = results[symbol]
+        if isinstance(sig, Exception):
+            skip_list.append(f"{symbol}: {sig}")
+        elif sig == 1:
+            buy_list.append(symbol)
+    report_signals(buy_list, skip_list, timeframe=timeframe)
+
+
+# --- Execução em DAG com cache por hash de conteúdo ---------------------------
+
+def inputs_key(files: list, params: dict) -> str:
+    """Chave das entradas de uma etapa: hash dos arquivos + parâmetros."""
+    payload = json.dumps({'files': [file_hash(p) for p in files], 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def model_path(symbol: str, timeframe: str = TIMEFRAME) -> str:
+    return os.path.join(models_dir(timeframe), f"{symbol}_model.joblib")
+
+
+def _table(kind: str):
+    return lambda symbol, timeframe: table_path(kind, symbol, timeframe=timeframe)
+
+
+# Etapas por símbolo: dependências, entradas (arquivos + parâmetros) e saída
+STAGES = {
+    'features': {
+        'deps': [],
+        'func': features_for,
+        'files': lambda symbol, tf: [table_path('ohlcv', symbol, timeframe=tf)],
+        'params': {'sma': SMA_WINDOW, 'ema': EMA_WINDOW, 'macd': [MACD_FAST, MACD_SLOW, MACD_SIGN],
+                   'rsi': RSI_WINDOW, 'atr': ATR_WINDOW},
+        'output': _table('features'),
+    },
+    'labels': {
+        'deps': ['features'],
+        'func': labels_for,
+        'files': lambda symbol, tf: [table_path('features', symbol, timeframe=tf)],
+        'params': {'horizon': HORIZON, 'threshold': THRESHOLD},
+        'output': _table('labels'),
+    },
+    'model': {
+        'deps': ['features', 'labels'],
+        'func': train_symbol,
+        'files': lambda symbol, tf: [table_path('features', symbol, timeframe=tf),
+                                     table_path('labels', symbol, timeframe=tf),
+                                     params_path(symbol, tf)],
+        'params': {'model': MODEL_PARAMS, 'n_splits': N_SPLITS, 'warm_start_trees': WARM_START_TREES},
+        'output': model_path,
+    },
+}
+
+
+def manifest_path(symbol: str, timeframe: str = TIMEFRAME) -> str:
+    return os.path.join(timeframe_dir(timeframe), 'manifests', f"{symbol}.json")
+
+
+def load_manifest(symbol: str, timeframe: str = TIMEFRAME) -> dict:
+    path = manifest_path(symbol, timeframe)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(symbol: str, manifest: dict, timeframe: str = TIMEFRAME):
+    path = manifest_path(symbol, timeframe)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _stage_order() -> list:
+    """Ordem topológica das etapas de STAGES."""
+    order, seen = [], set()
+
+    def visit(name):
+        if name not in seen:
+            seen.add(name)
+            for dep in STAGES[name]['deps']:
+                visit(dep)
+            order.append(name)
+
+    for name in STAGES:
+        visit(name)
+    return order
+
+
+def run_dag(timeframe: str = TIMEFRAME, workers: int = WORKERS, force: bool = False,
+            incremental: bool = True) -> dict:
+    """
+    Executa as etapas de STAGES para cada símbolo de DATA_DIR/ohlcv,
+    pulando as que já têm saída gerada a partir das mesmas entradas
+    (hash do conteúdo dos arquivos + parâmetros, no manifesto do símbolo).
+    `force` executa tudo. Imprime um resumo do que foi pulado e por quê.
+    Retorna {etapa: {motivo: [símbolos]}}.
+    """
+    symbols = list_symbols('ohlcv', timeframe=timeframe)
+    manifests = {symbol: load_manifest(symbol, timeframe) for symbol in symbols}
+    failed = set()
+    summary = {}
+
+    for name in _stage_order():
+        stage = STAGES[name]
+        params = stage['params']
+        reasons = defaultdict(list)
+        to_run = {}
+        for symbol in symbols:
+            if symbol in failed:
+                reasons['pulado: etapa anterior falhou'].append(symbol)
+                continue
+            key = inputs_key(stage['files'](symbol, timeframe), params)
+            previous = manifests[symbol].get(name, {}).get('inputs')
+            if force:
+                reasons['executado: --force'].append(symbol)
+            elif previous is None:
+                reasons['executado: sem manifesto'].append(symbol)
+            elif not os.path.exists(stage['output'](symbol, timeframe)):
+                reasons['executado: saída ausente'].append(symbol)
+            elif previous != key:
+                reasons['executado: entradas mudaram'].append(symbol)
+            else:
+                reasons['pulado: entradas inalteradas'].append(symbol)
+                continue
+            to_run[symbol] = key
+
+        kwargs = {}
+        if name == 'features':
+            kwargs['incremental'] = incremental
+        elif name == 'model':
+            # CPU_BUDGET dividido entre os processos (como em model.main)
+            kwargs['cpu_budget'] = max(1, CPU_BUDGET // max(1, workers))
+        results = run_per_symbol(stage['func'], list(to_run), workers=workers, timeframe=timeframe, **kwargs)
+        for symbol, key in to_run.items():
+            if isinstance(results[symbol], Exception):
+                failed.add(symbol)
+                manifests[symbol].pop(name, None)
+            else:
+                manifests[symbol][name] = {'inputs': key, 'output': stage['output'](symbol, timeframe)}
+            save_manifest(symbol, manifests[symbol], timeframe)
+        summary[name] = dict(reasons)
+
+    print("\n### Resumo das etapas ###")
+    for name, reasons in summary.items():
+        for reason, syms in sorted(reasons.items()):
+            shown = ', '.join(syms[:10]) + (' …' if len(syms) > 10 else '')
+            print(f"{name:<9} {reason:<32} {len(syms):>4}  {shown}")
+    return summary
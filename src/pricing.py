@@ -0,0 +1,104 @@
+import time
+from src.exchange import QUOTE_CURRENCIES, get_exchange
+from src.config import FEES_TTL
+from src.fees import DEFAULT_TAKER_FEE
+
+
+class Pricing:
+    """
+    Preços e taxas da exchange para as simulações, com o mínimo de
+    chamadas: os tickers de todos os pares pedidos vêm de um único
+    fetch_tickers, e a tabela de taxas (fetch_trading_fees) é carregada
+    uma vez e reaproveitada por `fees_ttl` segundos. A exchange só é
+    criada no primeiro uso; `exchange` permite injetar outra instância.
+    """
+
+    def __init__(self, exchange=None, exchange_id: str = None, fees_ttl: int = FEES_TTL):
+        self._exchange = exchange
+        self.exchange_id = exchange_id
+        self.fees_ttl = fees_ttl
+        self._fees = None
+        self._fees_at = 0.0
+        self.calls = {'fetch_tickers': 0, 'fetch_ticker': 0, 'fetch_trading_fees': 0}
+
+    @property
+    def exchange(self):
+        if self._exchange is None:
+            self._exchange = get_exchange(self.exchange_id)
+        return self._exchange
+
+    def candidate_pairs(self, symbol: str) -> list:
+        """Pares de `symbol` listados na exchange, na ordem de QUOTE_CURRENCIES."""
+        markets = self.exchange.markets or {}
+        return [f"{symbol}/{quote}" for quote in QUOTE_CURRENCIES if f"{symbol}/{quote}" in markets]
+
+    def tickers(self, pairs: list) -> dict:
+        """Último preço {par: last} de `pairs`, numa única requisição quando a exchange permite."""
+        pairs = list(dict.fromkeys(pairs))
+        if not pairs:
+            return {}
+        if self.exchange.has.get('fetchTickers'):
+            self.calls['fetch_tickers'] += 1
+            raw = self.exchange.fetch_tickers(pairs)
+        else:
+            raw = {}
+            for pair in pairs:
+                self.calls['fetch_ticker'] += 1
+                raw[pair] = self.exchange.fetch_ticker(pair)
+        return {pair: float(t['last']) for pair, t in raw.items() if t and t.get('last') is not None}
+
+    def prices(self, symbols: list, extra_pairs: list = ()) -> dict:
+        """
+        Último preço de cada símbolo (no primeiro par de QUOTE_CURRENCIES
+        com preço) e de cada par em `extra_pairs` (ex.: 'USDT/BRL').
+        Símbolos e pares sem preço ficam de fora do resultado.
+        """
+        candidates = {symbol: self.candidate_pairs(symbol) for symbol in symbols}
+        extra_pairs = [pair for pair in extra_pairs if pair in (self.exchange.markets or {})]
+        last = self.tickers([p for pairs in candidates.values() for p in pairs] + extra_pairs)
+        out = {}
+        for symbol, pairs in candidates.items():
+            price = next((last[p] for p in pairs if p in last), None)
+            if price is not None:
+                out[symbol] = price
+        out.update({pair: last[pair] for pair in extra_pairs if pair in last})
+        return out
+
+    def price(self, symbol: str) -> float:
+        price = self.prices([symbol]).get(symbol)
+        if price is None:
+            raise ValueError(f"Não foi possível obter preço para {symbol} em {QUOTE_CURRENCIES}")
+        return price
+
+    def fee_table(self) -> dict:
+        """Tabela {par: {'taker', ...}} da conta; {} se a exchange não a fornecer."""
+        if self._fees is None or time.time() - self._fees_at >= self.fees_ttl:
+            self.calls['fetch_trading_fees'] += 1
+            try:
+                self._fees = self.exchange.fetch_trading_fees() or {}
+            except Exception as e:
+                # Sem credenciais ou sem suporte: usa a taxa padrão até o TTL vencer
+                print(f"[SKIP] Tabela de taxas indisponível ({e}); usando taxa padrão {DEFAULT_TAKER_FEE}")
+                self._fees = {}
+            self._fees_at = time.time()
+        return self._fees
+
+    def taker_fee(self, symbol: str) -> float:
+        """Taxa taker do melhor par de `symbol`, ou DEFAULT_TAKER_FEE."""
+        fees = self.fee_table()
+        for quote in QUOTE_CURRENCIES:
+            fee = fees.get(f"{symbol}/{quote}", {}).get('taker')
+            if fee is not None:
+                return float(fee)
+        return DEFAULT_TAKER_FEE
+
+
+# Instâncias compartilhadas do processo, por exchange
+_pricing = {}
+
+
+def get_pricing(exchange_id: str = None) -> Pricing:
+    """Retorna o Pricing compartilhado de `exchange_id` (criado sem contatar a exchange)."""
+    if exchange_id not in _pricing:
+        _pricing[exchange_id] = Pricing(exchange_id=exchange_id)
+    return _pricing[exchange_id]
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from src import config
+from src.storage import file_hash
+from src.forest import CompiledForest, load_model, compiled_path
+
+
+def model_bytes(model) -> int:
+    """Memória ocupada pelos arrays de um modelo carregado."""
+    if isinstance(model, CompiledForest):
+        # Por id: os índices intp podem ser os próprios arrays gravados
+        arrays = {id(a): a for a in [*vars(model).values(), *model.extra.values()] if isinstance(a, np.ndarray)}
+        return sum(a.nbytes for a in arrays.values())
+    if isinstance(model, dict):
+        return sum(model_bytes(v) for v in model.values())
+    if hasattr(model, 'estimators_'):
+        # Tree.__setstate__ copia nós e valores para memória própria (também com mmap):
+        # capacity × (struct do nó + valores de um nó)
+        from sklearn.tree._tree import NODE_DTYPE
+        return sum(est.tree_.capacity * (NODE_DTYPE.itemsize + est.tree_.value[0].nbytes)
+                   for est in model.estimators_)
+    return sys.getsizeof(model)
+
+
+class ModelRegistry:
+    """
+    Cache LRU de modelos carregados, limitado por memória (`max_bytes`).
+    Uma entrada vale enquanto o arquivo tiver o mesmo mtime e tamanho (e,
+    com `verify_hash`, o mesmo SHA-256); senão é recarregada. Com `mmap`,
+    os pickles .joblib são abertos com mmap_mode='r'; os nós das árvores do
+    sklearn são copiados para a memória do processo mesmo assim, então só
+    os demais arrays grandes do pickle deixam de ser copiados.
+    Seguro para uso por várias threads.
+    """
+
+    def __init__(self, max_bytes: int = None, mmap: bool = None, verify_hash: bool = None):
+        # Padrões do .env: REGISTRY_MAX_MB, REGISTRY_MMAP e REGISTRY_VERIFY_HASH
+        self.max_bytes = config.REGISTRY_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.mmap = bool(config.REGISTRY_MMAP) if mmap is None else mmap
+        self.verify_hash = bool(config.REGISTRY_VERIFY_HASH) if verify_hash is None else verify_hash
+        self.entries = OrderedDict()     # caminho → (assinatura, modelo, bytes)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _signature(self, path: str) -> tuple:
+        # A versão compilada (.npz) também conta: load_model pode preferi-la
+        sig = []
+        for p in (path, compiled_path(path)):
+            if os.path.exists(p):
+                st = os.stat(p)
+                sig.append((st.st_mtime_ns, st.st_size, file_hash(p) if self.verify_hash else None))
+            else:
+                sig.append(None)
+        return tuple(sig)
+
+    def get(self, path: str):
+        """Retorna o modelo de `path`, do cache ou carregando do disco."""
+        if not os.path.exists(path) and not os.path.exists(compiled_path(path)):
+            raise FileNotFoundError(f"Modelo não encontrado: {path}")
+        sig = self._signature(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                if entry[0] == sig:
+                    self.hits += 1
+                    self.entries.move_to_end(path)
+                    return entry[1]
+                self.invalidations += 1
+                self._drop(path)
+            self.misses += 1
+
+        start = time.perf_counter()
+        model = load_model(path, mmap_mode='r' if self.mmap else None)
+        elapsed = time.perf_counter() - start
+        size = model_bytes(model)
+
+        with self.lock:
+            self.load_seconds += elapsed
+            if path in self.entries:
+                self._drop(path)
+            self.entries[path] = (sig, model, size)
+            self.bytes += size
+            # Descarta os menos usados recentemente, mantendo ao menos o atual
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+        return model
+
+    def _drop(self, path: str):
+        _, _, size = self.entries.pop(path)
+        self.bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'load_seconds': self.load_seconds,
+                'avg_load_ms': 1000 * self.load_seconds / self.misses if self.misses else 0.0,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Modelos em cache: {s['entries']} ({s['bytes'] / 1e6:.1f}MB) | acertos {s['hits']}/"
+                f"{s['hits'] + s['misses']} ({s['hit_rate']:.0%}) | carga média {s['avg_load_ms']:.1f}ms | "
+                f"invalidações {s['invalidations']} | descartes {s['evictions']}")
+
+
+def _registry() -> ModelRegistry:
+    # Registro do processo (cada worker de run_per_symbol tem o seu), criado
+    # no primeiro uso: importar o módulo não lê o .env
+    if 'registry' not in globals():
+        globals()['registry'] = ModelRegistry()
+    return globals()['registry']
+
+
+def __getattr__(name: str):
+    if name == 'registry':
+        return _registry()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_model(path: str):
+    """Atalho para registry.get(path)."""
+    return _registry().get(path)
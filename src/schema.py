@@ -0,0 +1,34 @@
+# Entradas dos modelos, compartilhadas pelo treino (model.py) e pela
+# inferência (inference.py, service.py, stream.py, backtest.py) sem
+# importar o sklearn (nem o pandas, que só aparece na anotação)
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Colunas de entrada dos modelos por símbolo
+FEATURE_COLS = ['open', 'high', 'low', 'close', 'volume',
+                'sma20', 'ema50', 'rsi14', 'macd', 'atr14', 'obv']
+
+# Modelo único para todos os símbolos (modo pooled)
+POOLED_MODEL = 'pooled_model.joblib'
+# Colunas de preço normalizadas pelo fechamento no modo pooled
+PRICE_COLS = ['open', 'high', 'low', 'sma20', 'ema50', 'macd', 'atr14']
+
+
+def pooled_matrix(df: 'pd.DataFrame', symbol_id: np.ndarray) -> np.ndarray:
+    """
+    Features comparáveis entre ativos para o modelo pooled: preços e
+    indicadores de preço relativos ao fechamento, volume e OBV em escala
+    log, RSI como está e o id do símbolo. Usa só a própria linha, então
+    serve igualmente para treino e para a última vela na inferência.
+    """
+    close = df['close'].to_numpy(dtype=float)
+    cols = [df[c].to_numpy(dtype=float) / close for c in PRICE_COLS]
+    cols.append(df['rsi14'].to_numpy(dtype=float))
+    cols.append(np.log1p(df['volume'].to_numpy(dtype=float)))
+    obv = df['obv'].to_numpy(dtype=float)
+    cols.append(np.sign(obv) * np.log1p(np.abs(obv)))
+    cols.append(np.asarray(symbol_id, dtype=float))
+    return np.column_stack(cols)
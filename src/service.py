@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from src.config import TIMEFRAME, SERVICE_HOST, SERVICE_PORT
+from src.inference import FEATURE_COLS, last_feature_row, score_rows
+from src.registry import registry
+from src.storage import list_symbols, table_path
+
+# Janela de requisições usada para as latências p50/p99
+LATENCY_WINDOW = 10000
+
+
+class SignalService:
+    """
+    Sinais com modelos e últimas linhas de features em memória. Os
+    modelos vêm do registro (recarregados quando o arquivo muda); a linha
+    de features de cada símbolo é relida quando o arquivo muda (mtime ou
+    tamanho). Seguro para várias threads.
+    """
+
+    def __init__(self, timeframe: str = TIMEFRAME, pooled: bool = False):
+        self.timeframe = timeframe
+        self.pooled = pooled
+        self.rows = {}                   # símbolo → (assinatura do arquivo, linha)
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.started = time.time()
+
+    def _row(self, symbol: str) -> np.ndarray:
+        path = table_path('features', symbol, timeframe=self.timeframe)
+        csv_path = table_path('features', symbol, ext='.csv', timeframe=self.timeframe)
+        source = path if os.path.exists(path) else csv_path
+        st = os.stat(source) if os.path.exists(source) else None
+        sig = (source, st.st_mtime_ns, st.st_size) if st else None
+        with self.lock:
+            cached = self.rows.get(symbol)
+        if cached is not None and sig is not None and cached[0] == sig:
+            return cached[1]
+        row = last_feature_row(symbol, self.timeframe)
+        with self.lock:
+            self.rows[symbol] = (sig, row)
+        return row
+
+    def signals(self, symbols: list = None) -> dict:
+        """{símbolo: {'signal', 'proba'} ou {'error'}} para `symbols` (padrão: todos)."""
+        start = time.perf_counter()
+        symbols = symbols or list_symbols('features', timeframe=self.timeframe)
+        frames = {}
+        out = {}
+        for symbol in symbols:
+            try:
+                frames[symbol] = self._row(symbol)
+            except Exception as e:
+                out[symbol] = {'error': str(e)}
+        result, errors = score_rows(frames, self.timeframe, self.pooled)
+        for symbol, e in errors.items():
+            out[symbol] = {'error': str(e)}
+        for symbol, row in result.iterrows():
+            out[symbol] = {'signal': int(row['signal']), 'proba': float(row['proba'])}
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.requests += 1
+        return out
+
+    def stats(self) -> dict:
+        with self.lock:
+            lat = np.array(self.latencies) * 1000
+            cached_rows = len(self.rows)
+            requests = self.requests
+        return {
+            'requests': requests,
+            'p50_ms': float(np.percentile(lat, 50)) if len(lat) else None,
+            'p99_ms': float(np.percentile(lat, 99)) if len(lat) else None,
+            'cached_rows': cached_rows,
+            'uptime_s': round(time.time() - self.started, 1),
+            'models': registry.stats(),
+            'feature_cols': FEATURE_COLS,
+        }
+
+
+def make_handler(service: SignalService):
+    class Handler(BaseHTTPRequestHandler):
+        """
+        GET /signal/SYMBOL           → sinal de um símbolo
+        GET /signals?symbols=A,B     → sinais em lote (sem `symbols`: todos)
+        GET /stats                   → latências p50/p99 e cache de modelos
+        """
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split('/') if p]
+            try:
+                if parts[:1] == ['signal'] and len(parts) == 2:
+                    symbol = parts[1].upper()
+                    result = service.signals([symbol])[symbol]
+                    self._send(404 if 'error' in result else 200, {symbol: result})
+                elif parts == ['signals']:
+                    query = parse_qs(url.query).get('symbols')
+                    symbols = [s.upper() for s in ','.join(query).split(',') if s] if query else None
+                    self._send(200, service.signals(symbols))
+                elif parts == ['stats']:
+                    self._send(200, service.stats())
+                else:
+                    self._send(404, {'error': 'rota inválida (use /signal/SYMBOL, /signals ou /stats)'})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            # Sem log por requisição (os painéis consultam com frequência)
+            pass
+
+    return Handler
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, timeframe: str = TIMEFRAME, pooled: bool = False):
+    """Sobe o serviço HTTP local; carrega modelos e features antes de aceitar requisições."""
+    service = SignalService(timeframe, pooled)
+    start = time.perf_counter()
+    warm = service.signals()
+    print(f"[OK] {len(warm)} símbolos carregados em {time.perf_counter() - start:.2f}s")
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serviço de sinais em http://{host}:{server.server_port} (/signal/SYMBOL, /signals, /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(service.stats()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço local de sinais com modelos em memória")
+    parser.add_argument('--host', type=str, default=SERVICE_HOST, help='Endereço (padrão: só localhost)')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='Porta HTTP')
+    parser.add_argument('--pooled', action='store_true', help='Usa o modelo pooled')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.timeframe, args.pooled)
@@ -1,73 +1,59 @@
 import os
 import json
+import glob
 import argparse
 from datetime import datetime
 import pandas as pd
-import ccxt
-from src.config import DATA_DIR
+from src import config
+from src.config import TIMEFRAME
+from src.storage import read_table, signals_path
+from src.pricing import get_pricing
+# Taxas de rede (USD) por ativo: ver src/fees.py
+from src.fees import DEFAULT_NETWORK_FEE, NETWORK_FEES
 
-# Configuração de taxas de rede (USD) por ativo; personalize conforme necessário
-DEFAULT_NETWORK_FEE = 2.0  # taxa padrão se ativo não estiver em NETWORK_FEES
-NETWORK_FEES = {
-    'BTC': 5.0,
-    'ETH': 10.0,
-    # adicione mais símbolos se desejar
-}
+# Exchange das simulações (instanciada só no primeiro uso, em src.pricing)
+EXCHANGE_ID = 'binance'
 
-# Cotação preferencial
-QUOTE_CURRENCIES = ['USDT', 'BUSD', 'USDC']
-
-# Inicializa exchange CCXT Binance
-exchange = ccxt.binance({'enableRateLimit': True})
-exchange.load_markets()
-
-def fetch_price(symbol: str) -> float:
+def fetch_price(symbol: str, pricing=None) -> float:
     """Retorna o último preço de mercado do símbolo usando os pares de cotação definidos."""
-    for quote in QUOTE_CURRENCIES:
-        pair = f"{symbol}/{quote}"
-        if pair in exchange.markets:
-            ticker = exchange.fetch_ticker(pair)
-            price = ticker.get('last')
-            if price is not None:
-                return float(price)
-    raise ValueError(f"Não foi possível obter preço para {symbol} em {QUOTE_CURRENCIES}")
-
-def fetch_exchange_fee(symbol: str) -> float:
-    """Retorna a taxa taker para o melhor par disponível, ou fallback padrão."""
-    for quote in QUOTE_CURRENCIES:
-        pair = f"{symbol}/{quote}"
-        try:
-            fees = exchange.fetch_trading_fees()
-            fee = fees.get(pair, {}).get('taker')
-            if fee is not None:
-                return float(fee)
-        except Exception:
-            continue
-    # fallback padrão
-    return 0.001
+    return (pricing or get_pricing(EXCHANGE_ID)).price(symbol)
+
+def fetch_exchange_fee(symbol: str, pricing=None) -> float:
+    """Retorna a taxa taker para o melhor par disponível (tabela de taxas em cache), ou fallback padrão."""
+    return (pricing or get_pricing(EXCHANGE_ID)).taker_fee(symbol)
 
-def simulate_purchase(investment: float):
+def simulate_purchase(investment: float, pricing=None, timeframe: str = TIMEFRAME):
     """
     Lê buy_signals.json, simula compra hoje com investimento total em USD,
     e salva em data/simulations/purchase_YYYY-MM-DD.csv
     """
-    signals_path = os.path.join(DATA_DIR, 'buy_signals.json')
-    if not os.path.exists(signals_path):
+    signals_file = signals_path(timeframe)
+    if not os.path.exists(signals_file):
         print("Arquivo buy_signals.json não encontrado.")
         return
 
-    symbols = json.load(open(signals_path))
+    symbols = json.load(open(signals_file))
     if not symbols:
         print("Nenhum sinal de compra para simular.")
         return
 
+    pricing = pricing or get_pricing(EXCHANGE_ID)
+    try:
+        # Um único fetch_tickers para todos os símbolos
+        prices = pricing.prices(symbols)
+    except Exception as e:
+        print(f"Erro ao buscar preços: {e}")
+        return
+
     per_asset = investment / len(symbols)
     records = []
     for symbol in symbols:
         try:
-            price = fetch_price(symbol)
+            if symbol not in prices:
+                raise ValueError(f"Não foi possível obter preço para {symbol}")
+            price = prices[symbol]
             quantity = per_asset / price
-            fee_rate = fetch_exchange_fee(symbol)
+            fee_rate = pricing.taker_fee(symbol)
             exchange_fee = fee_rate * per_asset
             network_fee = NETWORK_FEES.get(symbol, DEFAULT_NETWORK_FEE)
             total_cost = per_asset + exchange_fee + network_fee
@@ -89,59 +75,26 @@ def simulate_purchase(investment: float):
         return
 
     df = pd.DataFrame(records)
-    sim_dir = os.path.join(DATA_DIR, 'simulations')
+    sim_dir = os.path.join(config.DATA_DIR, 'simulations')
     os.makedirs(sim_dir, exist_ok=True)
     filename = f"purchase_{datetime.now():%Y-%m-%d}.csv"
     out_path = os.path.join(sim_dir, filename)
     df.to_csv(out_path, index=False)
     print(f"Simulação salva em: {out_path}")
 
-def evaluate_simulation(sim_file: str):
-    """
-    Lê CSV de simulação e calcula lucro/prejuízo atual.
-    Salva em *_eval.csv, exibe resultado tabular e um resumo final.
-    """
+def add_values(df: pd.DataFrame, current_price) -> pd.DataFrame:
+    """Colunas de valor atual e lucro das compras de `df`, a partir de `current_price` (por linha)."""
+    df = df.assign(current_price=pd.Series(current_price, index=df.index).astype(float))
+    df['current_value'] = df['current_price'] * df['quantity']
+    df['profit'] = df['current_value'] - df['total_cost']
+    df['profit_pct'] = (df['profit'] / df['total_cost']).where(df['total_cost'] != 0, 0.0)
+    return df
+
+def print_evaluation(df_eval: pd.DataFrame):
+    """Exibe a tabela de avaliação e o resumo final."""
     import locale
     locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
 
-    if not os.path.exists(sim_file):
-        print(f"Arquivo de simulação não encontrado: {sim_file}")
-        return
-
-    df = pd.read_csv(sim_file)
-    if df.empty:
-        print("Arquivo de simulação vazio.")
-        return
-
-    eval_records = []
-    for _, row in df.iterrows():
-        symbol = row['symbol']
-        try:
-            current_price = fetch_price(symbol)
-            current_value = current_price * row['quantity']
-            profit = current_value - row['total_cost']
-            profit_pct = profit / row['total_cost'] if row['total_cost'] else 0.0
-            rec = row.to_dict()
-            rec.update({
-                'current_price': current_price,
-                'current_value': current_value,
-                'profit': profit,
-                'profit_pct': profit_pct
-            })
-            eval_records.append(rec)
-        except Exception as e:
-            print(f"Erro ao avaliar {symbol}: {e}")
-            continue
-
-    if not eval_records:
-        print("Nenhuma avaliação realizada.")
-        return
-
-    df_eval = pd.DataFrame(eval_records)
-    out_file = sim_file.replace('.csv', '_eval.csv')
-    df_eval.to_csv(out_file, index=False)
-    print(f"[✅] Avaliação salva em: {out_file}")
-
     # Formatação para exibição
     df_fmt = df_eval[['symbol', 'quantity', 'price', 'total_cost', 'current_value', 'profit', 'profit_pct']].copy()
     df_fmt['quantity'] = df_fmt['quantity'].apply(lambda x: f"{x:.8f}")
@@ -165,19 +118,153 @@ def evaluate_simulation(sim_file: str):
     print(f"➡️  Total Investido: {locale.currency(total_investido, grouping=True)}")
     print(f"💰 Lucro/Prejuízo:  {locale.currency(total_lucro, grouping=True)}")
     print(f"📊 Variação (%):    {total_pct:.2%}")
-    
+
+def evaluate_simulation(sim_file: str, pricing=None):
+    """
+    Lê CSV de simulação e calcula lucro/prejuízo atual.
+    Salva em *_eval.csv, exibe resultado tabular e um resumo final.
+    """
+    if not os.path.exists(sim_file):
+        print(f"Arquivo de simulação não encontrado: {sim_file}")
+        return
+
+    df = pd.read_csv(sim_file)
+    if df.empty:
+        print("Arquivo de simulação vazio.")
+        return
+
+    pricing = pricing or get_pricing(EXCHANGE_ID)
+    try:
+        # Um único fetch_tickers para todos os símbolos do arquivo
+        prices = pricing.prices(df['symbol'].unique().tolist())
+    except Exception as e:
+        print(f"Erro ao buscar preços: {e}")
+        return
+
+    priced = df['symbol'].isin(prices)
+    for symbol in df.loc[~priced, 'symbol']:
+        print(f"Erro ao avaliar {symbol}: Não foi possível obter preço para {symbol}")
+    if not priced.any():
+        print("Nenhuma avaliação realizada.")
+        return
+
+    df_eval = add_values(df[priced], df.loc[priced, 'symbol'].map(prices))
+    out_file = sim_file.replace('.csv', '_eval.csv')
+    df_eval.to_csv(out_file, index=False)
+    print(f"[✅] Avaliação salva em: {out_file}")
+    print_evaluation(df_eval)
+
+def load_simulations(sim_dir: str = None) -> pd.DataFrame:
+    """
+    Junta todos os purchase_YYYY-MM-DD.csv de `sim_dir` (sem os *_eval.csv)
+    num só DataFrame, com a data da compra (purchase_date) tirada do nome.
+    """
+    sim_dir = sim_dir or os.path.join(config.DATA_DIR, 'simulations')
+    frames = []
+    for path in sorted(glob.glob(os.path.join(sim_dir, 'purchase_*.csv'))):
+        name = os.path.basename(path)
+        if name.endswith('_eval.csv'):
+            continue
+        try:
+            purchase_date = datetime.strptime(name[len('purchase_'):-len('.csv')], '%Y-%m-%d')
+        except ValueError:
+            print(f"[SKIP] {name}: nome fora do padrão purchase_YYYY-MM-DD.csv")
+            continue
+        df = pd.read_csv(path)
+        if not df.empty:
+            frames.append(df.assign(purchase_date=pd.Timestamp(purchase_date), file=name))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def stored_closes(symbols: list) -> pd.DataFrame:
+    """Fechamentos diários gravados (datas × símbolos) dos `symbols` com OHLCV '1d'."""
+    closes = {}
+    for symbol in symbols:
+        try:
+            df = read_table('ohlcv', symbol, columns=['date', 'close'], timeframe='1d')
+        except FileNotFoundError:
+            print(f"[SKIP] {symbol}: OHLCV diário não encontrado")
+            continue
+        close = df.set_index(pd.to_datetime(df['date']).dt.normalize())['close']
+        closes[symbol] = close[~close.index.duplicated(keep='last')]
+    return pd.DataFrame(closes).sort_index()
+
+def portfolio_history(purchases: pd.DataFrame, closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Série diária da carteira formada por todas as compras: quantidades
+    acumuladas por data de compra, marcadas a mercado pelos fechamentos.
+    """
+    dates = closes.index[closes.index >= purchases['purchase_date'].min()]
+    timeline = dates.union(pd.DatetimeIndex(purchases['purchase_date'].unique()))
+    qty = purchases.pivot_table(index='purchase_date', columns='symbol', values='quantity', aggfunc='sum')
+    held = qty.reindex(index=timeline, columns=closes.columns).fillna(0.0).cumsum().reindex(dates)
+    invested = (purchases.groupby('purchase_date')['total_cost'].sum()
+                .reindex(timeline).fillna(0.0).cumsum().reindex(dates))
+    value = (held * closes.ffill().reindex(dates)).sum(axis=1)
+    history = pd.DataFrame({'invested': invested, 'value': value}, index=pd.Index(dates, name='date'))
+    history['profit'] = history['value'] - history['invested']
+    history['profit_pct'] = (history['profit'] / history['invested']).where(history['invested'] != 0, 0.0)
+    return history
+
+def evaluate_all(sim_dir: str = None, live: bool = False, pricing=None):
+    """
+    Avalia de uma vez todas as simulações de `sim_dir`: junta os arquivos
+    aos fechamentos gravados e calcula valor e lucro de cada compra (pelo
+    último fechamento, ou com `live` por um único snapshot de tickers).
+    Salva all_eval.csv e portfolio_history.csv (série diária da carteira)
+    e exibe o resumo final.
+    """
+    sim_dir = sim_dir or os.path.join(config.DATA_DIR, 'simulations')
+    purchases = load_simulations(sim_dir)
+    if purchases.empty:
+        print(f"Nenhuma simulação encontrada em: {sim_dir}")
+        return
+
+    symbols = purchases['symbol'].unique().tolist()
+    closes = stored_closes(symbols)
+    if live:
+        try:
+            prices = (pricing or get_pricing(EXCHANGE_ID)).prices(symbols)
+        except Exception as e:
+            print(f"Erro ao buscar preços: {e}")
+            return
+    else:
+        prices = closes.ffill().iloc[-1].dropna().to_dict() if not closes.empty else {}
+
+    priced = purchases['symbol'].isin(prices)
+    for symbol in purchases.loc[~priced, 'symbol'].unique():
+        print(f"Erro ao avaliar {symbol}: Não foi possível obter preço para {symbol}")
+    if not priced.any():
+        print("Nenhuma avaliação realizada.")
+        return
+
+    df_eval = add_values(purchases[priced], purchases.loc[priced, 'symbol'].map(prices))
+    out_file = os.path.join(sim_dir, 'all_eval.csv')
+    df_eval.to_csv(out_file, index=False)
+    print(f"[✅] {len(df_eval)} compras de {purchases['file'].nunique()} arquivos avaliadas em: {out_file}")
+
+    history = portfolio_history(purchases[purchases['symbol'].isin(closes.columns)], closes)
+    history_file = os.path.join(sim_dir, 'portfolio_history.csv')
+    history.to_csv(history_file)
+    print(f"[✅] Histórico diário da carteira ({len(history)} dias) em: {history_file}")
+    print_evaluation(df_eval)
+    return df_eval, history
 
 def main():
     parser = argparse.ArgumentParser(description="Simulação e avaliação de sinais de compra")
     parser.add_argument('--simulate', action='store_true', help='Executa simulação de compra hoje')
     parser.add_argument('--evaluate', type=str, help='Avalia arquivo de simulação (CSV)')
     parser.add_argument('--investment', type=float, default=1000.0, help='Valor total a investir em USD')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe dos sinais (ex.: '1d', '1h')")
+    parser.add_argument('--evaluate-all', action='store_true', help='Avalia todos os arquivos de data/simulations')
+    parser.add_argument('--live', action='store_true', help='Com --evaluate-all: preços atuais da exchange em vez do último fechamento gravado')
     args = parser.parse_args()
 
     if args.simulate:
-        simulate_purchase(args.investment)
+        simulate_purchase(args.investment, timeframe=args.timeframe)
     elif args.evaluate:
         evaluate_simulation(args.evaluate)
+    elif args.evaluate_all:
+        evaluate_all(live=args.live)
     else:
         parser.print_help()
 
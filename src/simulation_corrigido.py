@@ -4,68 +4,56 @@ import json
 import argparse
 from datetime import datetime
 import pandas as pd
-import ccxt
 import locale
-from src.config import DATA_DIR
-
-# Configuração de taxas de rede (USD) por ativo; personalize conforme necessário
-DEFAULT_NETWORK_FEE = 2.0
-NETWORK_FEES = {
-    'BTC': 5.0,
-    'ETH': 10.0,
-}
-
-QUOTE_CURRENCIES = ['USDT', 'BUSD', 'USDC']
-exchange = ccxt.binance({'enableRateLimit': True})
-exchange.load_markets()
-
-def fetch_price(symbol: str) -> float:
-    for quote in QUOTE_CURRENCIES:
-        pair = f"{symbol}/{quote}"
-        if pair in exchange.markets:
-            ticker = exchange.fetch_ticker(pair)
-            price = ticker.get('last')
-            if price is not None:
-                return float(price)
-    raise ValueError(f"Não foi possível obter preço para {symbol} em {QUOTE_CURRENCIES}")
-
-def get_usd_brl_rate():
-    pair = "USDT/BRL"
-    if pair in exchange.markets:
-        ticker = exchange.fetch_ticker(pair)
-        return float(ticker.get('last'))
-    raise ValueError("Não foi possível obter a cotação USD/BRL")
-
-def fetch_exchange_fee(symbol: str) -> float:
-    for quote in QUOTE_CURRENCIES:
-        pair = f"{symbol}/{quote}"
-        try:
-            fees = exchange.fetch_trading_fees()
-            fee = fees.get(pair, {}).get('taker')
-            if fee is not None:
-                return float(fee)
-        except Exception:
-            continue
-    return 0.001
-
-def simulate_purchase(investment: float):
-    signals_path = os.path.join(DATA_DIR, 'buy_signals.json')
-    if not os.path.exists(signals_path):
+from src import config
+from src.config import TIMEFRAME
+from src.storage import signals_path
+from src.pricing import get_pricing
+from src.fees import DEFAULT_NETWORK_FEE, NETWORK_FEES
+
+EXCHANGE_ID = 'binance'
+USD_BRL_PAIR = 'USDT/BRL'
+
+def fetch_price(symbol: str, pricing=None) -> float:
+    return (pricing or get_pricing(EXCHANGE_ID)).price(symbol)
+
+def get_usd_brl_rate(pricing=None):
+    rate = (pricing or get_pricing(EXCHANGE_ID)).prices([], extra_pairs=[USD_BRL_PAIR]).get(USD_BRL_PAIR)
+    if rate is None:
+        raise ValueError("Não foi possível obter a cotação USD/BRL")
+    return rate
+
+def fetch_exchange_fee(symbol: str, pricing=None) -> float:
+    return (pricing or get_pricing(EXCHANGE_ID)).taker_fee(symbol)
+
+def simulate_purchase(investment: float, pricing=None, timeframe: str = TIMEFRAME):
+    signals_file = signals_path(timeframe)
+    if not os.path.exists(signals_file):
         print("Arquivo buy_signals.json não encontrado.")
         return
 
-    symbols = json.load(open(signals_path))
+    symbols = json.load(open(signals_file))
     if not symbols:
         print("Nenhum sinal de compra para simular.")
         return
 
+    pricing = pricing or get_pricing(EXCHANGE_ID)
+    try:
+        # Um único fetch_tickers para todos os símbolos
+        prices = pricing.prices(symbols)
+    except Exception as e:
+        print(f"Erro ao buscar preços: {e}")
+        return
+
     per_asset = investment / len(symbols)
     records = []
     for symbol in symbols:
         try:
-            price = fetch_price(symbol)
+            if symbol not in prices:
+                raise ValueError(f"Não foi possível obter preço para {symbol}")
+            price = prices[symbol]
             quantity = per_asset / price
-            fee_rate = fetch_exchange_fee(symbol)
+            fee_rate = pricing.taker_fee(symbol)
             exchange_fee = fee_rate * per_asset
             network_fee = NETWORK_FEES.get(symbol, DEFAULT_NETWORK_FEE)
             total_cost = per_asset + exchange_fee + network_fee
@@ -87,14 +75,14 @@ def simulate_purchase(investment: float):
         return
 
     df = pd.DataFrame(records)
-    sim_dir = os.path.join(DATA_DIR, 'simulations')
+    sim_dir = os.path.join(config.DATA_DIR, 'simulations')
     os.makedirs(sim_dir, exist_ok=True)
     filename = f"purchase_{datetime.now():%Y-%m-%d}.csv"
     out_path = os.path.join(sim_dir, filename)
     df.to_csv(out_path, index=False)
     print(f"Simulação salva em: {out_path}")
 
-def evaluate_simulation(sim_file: str):
+def evaluate_simulation(sim_file: str, pricing=None):
     locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
 
     if not os.path.exists(sim_file):
@@ -106,18 +94,26 @@ def evaluate_simulation(sim_file: str):
         print("Arquivo de simulação vazio.")
         return
 
+    pricing = pricing or get_pricing(EXCHANGE_ID)
     try:
-        usd_brl = get_usd_brl_rate()
-        print(f"[📈] Cotação atual do dólar (USD/BRL): R$ {usd_brl:.2f}")
+        # Preços atuais e cotação do dólar num único fetch_tickers
+        prices = pricing.prices(df['symbol'].unique().tolist(), extra_pairs=[USD_BRL_PAIR])
     except Exception as e:
-        print(f"[❌] Erro ao buscar cotação do dólar: {e}")
+        print(f"[❌] Erro ao buscar preços: {e}")
+        return
+    usd_brl = prices.get(USD_BRL_PAIR)
+    if usd_brl is None:
+        print("[❌] Erro ao buscar cotação do dólar: Não foi possível obter a cotação USD/BRL")
         return
+    print(f"[📈] Cotação atual do dólar (USD/BRL): R$ {usd_brl:.2f}")
 
     eval_records = []
     for _, row in df.iterrows():
         symbol = row['symbol']
         try:
-            current_price = fetch_price(symbol)
+            if symbol not in prices:
+                raise ValueError(f"Não foi possível obter preço para {symbol}")
+            current_price = prices[symbol]
             current_value_usd = current_price * row['quantity']
             profit_usd = current_value_usd - row['total_cost']
             profit_pct = profit_usd / row['total_cost'] if row['total_cost'] else 0.0
@@ -177,10 +173,11 @@ def main():
     parser.add_argument('--simulate', action='store_true', help='Executa simulação de compra hoje')
     parser.add_argument('--evaluate', type=str, help='Avalia arquivo de simulação (CSV)')
     parser.add_argument('--investment', type=float, default=1000.0, help='Valor total a investir em USD')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe dos sinais (ex.: '1d', '1h')")
     args = parser.parse_args()
 
     if args.simulate:
-        simulate_purchase(args.investment)
+        simulate_purchase(args.investment, timeframe=args.timeframe)
     elif args.evaluate:
         evaluate_simulation(args.evaluate)
     else:
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Módulos importados por cada comando antes de começar a trabalhar
+COMMANDS = {
+    'main': ['src.main'],
+    'infer': ['src.main', 'src.inference', 'src.registry', 'src.storage'],
+}
+# Dependências pesadas que nenhum desses comandos deve carregar na partida
+# (pandas/pyarrow só na primeira leitura de tabela)
+FORBIDDEN = ['ccxt', 'pycoingecko', 'sklearn', 'scipy', 'joblib', 'ta', 'pandas', 'pyarrow']
+# Referência medida na mesma máquina (o numpy, que a inferência já importa):
+# o orçamento é um múltiplo dela, e não um tempo fixo que depende da máquina
+BASELINE = ['numpy']
+DEFAULT_BUDGET_RATIO = 3.0
+
+
+def import_profile(modules: list) -> dict:
+    """
+    Importa `modules` num processo novo com `python -X importtime` e
+    retorna o tempo de import (ms, soma dos imports de topo pedidos ou do
+    pacote src), o tempo total do processo e os pacotes carregados. O
+    processo roda com MARKET_DATA_MODE=replay num diretório vazio: uma
+    chamada de rede durante o import falha em vez de passar despercebida.
+    """
+    env = dict(os.environ, MARKET_DATA_MODE='replay', MARKET_DATA_DIR=tempfile.mkdtemp(prefix='crypto-ml-startup-'))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {', '.join(modules)}"],
+                          env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'falha no import')
+
+    import_ms, loaded = 0.0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip().split('.')[0])
+        # Só as linhas de topo (sem indentação) somam; as demais já estão no cumulativo delas
+        if not name[1:].startswith(' ') and (name.strip() in modules or name.strip().startswith('src')):
+            import_ms += int(cumulative) / 1000
+    return {'import_ms': import_ms, 'wall_ms': wall_ms, 'loaded': loaded}
+
+
+def profile_command(command: str, repeat: int = 3) -> dict:
+    """
+    Melhor de `repeat` execuções de import_profile para os módulos de
+    `command`, com os módulos de FORBIDDEN carregados em 'forbidden'.
+    """
+    best = min((import_profile(COMMANDS[command]) for _ in range(repeat)), key=lambda r: r['import_ms'])
+    return {**best, 'forbidden': sorted(set(FORBIDDEN) & best['loaded'])}
+
+
+def budget(ratio: float = DEFAULT_BUDGET_RATIO, repeat: int = 3) -> float:
+    """Orçamento (ms): `ratio` × o melhor tempo de import de BASELINE."""
+    baseline = min(import_profile(BASELINE)['import_ms'] for _ in range(repeat))
+    return ratio * baseline
+
+
+def check(commands: list = None, budget_ms: float = None, repeat: int = 3,
+          ratio: float = DEFAULT_BUDGET_RATIO) -> bool:
+    """
+    Verifica, para cada comando, que o import fica dentro de `budget_ms`
+    (padrão: `ratio` × o import de BASELINE, medido agora; vale a melhor de
+    `repeat` execuções) e que nenhum módulo de FORBIDDEN é carregado.
+    Retorna True se todos passarem.
+    """
+    budget_ms = budget_ms or budget(ratio, repeat)
+    ok = True
+    for command in commands or list(COMMANDS):
+        try:
+            best = profile_command(command, repeat)
+        except RuntimeError as e:
+            print(f"[ERRO] {command}: {e}")
+            ok = False
+            continue
+        passed = best['import_ms'] <= budget_ms and not best['forbidden']
+        ok = ok and passed
+        print(f"[{'OK' if passed else 'ERRO'}] {command:<6} import {best['import_ms']:>7.1f}ms "
+              f"(orçamento {budget_ms:.0f}ms) | processo {best['wall_ms']:>7.1f}ms"
+              + (f" | carrega {', '.join(best['forbidden'])}" if best['forbidden'] else ''))
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tempo de partida dos comandos (python -X importtime)")
+    parser.add_argument('--commands', nargs='+', choices=list(COMMANDS), default=None, help='Comandos a verificar (padrão: todos)')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Tempo máximo de import (ms) por comando (padrão: --ratio × import do numpy)')
+    parser.add_argument('--ratio', type=float, default=DEFAULT_BUDGET_RATIO, help='Orçamento relativo ao import de BASELINE')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por comando (vale a mais rápida)')
+    args = parser.parse_args()
+    sys.exit(0 if check(args.commands, args.budget_ms, args.repeat, args.ratio) else 1)
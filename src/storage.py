@@ -0,0 +1,354 @@
+import io
+import os
+import glob
+import hashlib
+import argparse
+from typing import TYPE_CHECKING
+from src import config
+from src.metrics import count_rows
+
+# pandas/pyarrow só são importados ao ler ou gravar (a partida de --infer não paga por eles)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Extensão do formato colunar (Parquet, tipado, com leitura por coluna)
+TABLE_EXT = '.parquet'
+# Linhas por row group: read_tail decodifica só os últimos grupos, não o arquivo inteiro
+ROW_GROUP_SIZE = 2048
+
+# Tipos de tabela: subdiretório em DATA_DIR e sufixo do arquivo
+KINDS = {
+    'ohlcv': ('ohlcv', ''),
+    'features': ('features', '_feat'),
+    'labels': ('labels', '_label'),
+}
+
+
+def timeframe_dir(timeframe: str = None, data_dir: str = None) -> str:
+    """
+    Raiz dos dados de um timeframe: o próprio DATA_DIR para '1d'
+    (layout original) e DATA_DIR/<timeframe> para os demais (ex.: '1h').
+    """
+    timeframe = timeframe or config.TIMEFRAME
+    data_dir = data_dir or config.DATA_DIR
+    return data_dir if timeframe == '1d' else os.path.join(data_dir, timeframe)
+
+
+def models_dir(timeframe: str = None, data_dir: str = None) -> str:
+    """Diretório dos modelos treinados para o timeframe."""
+    return os.path.join(timeframe_dir(timeframe, data_dir), 'models')
+
+
+def signals_path(timeframe: str = None, data_dir: str = None) -> str:
+    """Sinais de compra exportados pela inferência (lidos pelas simulações)."""
+    return os.path.join(timeframe_dir(timeframe, data_dir), 'buy_signals.json')
+
+
+def table_path(kind: str, symbol: str, ext: str = TABLE_EXT, data_dir: str = None,
+               timeframe: str = None) -> str:
+    """
+    Retorna o caminho do arquivo de `kind` ('ohlcv', 'features', 'labels')
+    para `symbol`. Ex.: DATA_DIR/features/BTC_feat.parquet
+    """
+    subdir, suffix = KINDS[kind]
+    return os.path.join(timeframe_dir(timeframe, data_dir), subdir, f"{symbol}{suffix}{ext}")
+
+
+def list_symbols(kind: str, data_dir: str = None, timeframe: str = None) -> list:
+    """
+    Lista os símbolos que possuem tabela do tipo `kind`.
+    Considera arquivos Parquet e, para árvores ainda não migradas, CSV.
+    """
+    subdir, suffix = KINDS[kind]
+    base = os.path.join(timeframe_dir(timeframe, data_dir), subdir)
+    symbols = set()
+    for ext in (TABLE_EXT, '.csv'):
+        for filepath in glob.glob(os.path.join(base, f"*{suffix}{ext}")):
+            name = os.path.basename(filepath)[:-len(ext)]
+            if suffix:
+                name = name[:-len(suffix)]
+            symbols.add(name)
+    return sorted(symbols)
+
+
+def read_table(kind: str, symbol: str, columns: list = None, data_dir: str = None,
+               timeframe: str = None) -> 'pd.DataFrame':
+    """
+    Lê a tabela `kind` de `symbol`, opcionalmente apenas as colunas pedidas.
+    Usa o arquivo Parquet; se não existir, cai para o CSV legado.
+    Lança FileNotFoundError se nenhum dos dois existir.
+    """
+    import pandas as pd
+
+    path = table_path(kind, symbol, data_dir=data_dir, timeframe=timeframe)
+    if os.path.exists(path):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        csv_path = table_path(kind, symbol, ext='.csv', data_dir=data_dir, timeframe=timeframe)
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Tabela '{kind}' não encontrada para {symbol}")
+        parse_dates = ['date'] if columns is None or 'date' in columns else None
+        df = pd.read_csv(csv_path, usecols=columns, parse_dates=parse_dates)
+    count_rows('rows_in', len(df))
+    return df
+
+
+def read_rows_after(kind: str, symbol: str, column: str, value, columns: list = None, data_dir: str = None,
+                    timeframe: str = None) -> 'pd.DataFrame':
+    """
+    Lê apenas as linhas com `column` >= `value`. No Parquet, o filtro é
+    aplicado na leitura e os row groups anteriores nem são lidos.
+    """
+    import pandas as pd
+
+    path = table_path(kind, symbol, data_dir=data_dir, timeframe=timeframe)
+    if os.path.exists(path):
+        df = pd.read_parquet(path, columns=columns, filters=[(column, '>=', value)])
+        count_rows('rows_in', len(df))
+        return df
+    df = read_table(kind, symbol, columns=columns, data_dir=data_dir, timeframe=timeframe)
+    return df[df[column] >= value].reset_index(drop=True)
+
+
+def read_tail(kind: str, symbol: str, n: int = 1, columns: list = None, data_dir: str = None,
+              timeframe: str = None) -> 'pd.DataFrame':
+    """
+    Lê só as últimas `n` linhas da tabela. No Parquet, lê os row groups
+    do fim para o início até juntar `n` linhas; no CSV legado, lê o
+    cabeçalho e os últimos blocos do arquivo (seek a partir do fim).
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = table_path(kind, symbol, data_dir=data_dir, timeframe=timeframe)
+    if os.path.exists(path):
+        pf = pq.ParquetFile(path)
+        groups = []
+        rows = 0
+        for i in range(pf.num_row_groups - 1, -1, -1):
+            if rows >= n:
+                break
+            groups.insert(0, pf.read_row_group(i, columns=columns))
+            rows += groups[0].num_rows
+        if not groups:
+            return pf.schema_arrow.empty_table().to_pandas()[columns or slice(None)]
+        df = pa.concat_tables(groups).to_pandas()
+        count_rows('rows_in', len(df))
+        return df.iloc[-n:].reset_index(drop=True)
+
+    csv_path = table_path(kind, symbol, ext='.csv', data_dir=data_dir, timeframe=timeframe)
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Tabela '{kind}' não encontrada para {symbol}")
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        end = f.seek(0, os.SEEK_END)
+        pos, block = end, b''
+        # Blocos a partir do fim até ter n linhas completas (+1 para a quebra inicial)
+        while pos > start and block.count(b'\n') <= n:
+            step = min(64 * 1024, pos - start)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step) + block
+    lines = block.splitlines()
+    if pos > start:
+        lines = lines[1:]  # a primeira linha do bloco pode estar cortada
+    text = b'\n'.join([header.rstrip(b'\r\n')] + lines[-n:]).decode('utf-8')
+    parse_dates = ['date'] if columns is None or 'date' in columns else None
+    df = pd.read_csv(io.StringIO(text), usecols=columns, parse_dates=parse_dates)
+    count_rows('rows_in', len(df))
+    return df
+
+
+def write_table(df: 'pd.DataFrame', kind: str, symbol: str, data_dir: str = None,
+                timeframe: str = None) -> str:
+    """
+    Grava `df` como Parquet de forma atômica (arquivo temporário + rename),
+    em row groups de ROW_GROUP_SIZE linhas. Retorna o caminho gravado.
+    """
+    path = table_path(kind, symbol, data_dir=data_dir, timeframe=timeframe)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    df.to_parquet(tmp_path, index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+    count_rows('rows_out', len(df))
+    return path
+
+
+class TableWriter:
+    """
+    Grava uma tabela em partes, sem manter o histórico inteiro em memória:
+    as partes são reagrupadas em row groups de ROW_GROUP_SIZE linhas (só o
+    último fica menor). O arquivo só substitui o anterior em close(); em
+    caso de erro dentro do `with`, nada é alterado.
+
+    Com `append_key`, as linhas já gravadas com `append_key` menor que o
+    da primeira parte nova são copiadas antes dela (append com remoção
+    da sobreposição). A cópia também é reagrupada, então appends
+    sucessivos não acumulam row groups pequenos.
+    """
+
+    def __init__(self, kind: str, symbol: str, append_key: str = None, data_dir: str = None,
+                 timeframe: str = None):
+        self.path = table_path(kind, symbol, data_dir=data_dir, timeframe=timeframe)
+        self.csv_path = table_path(kind, symbol, ext='.csv', data_dir=data_dir, timeframe=timeframe)
+        self.tmp_path = self.path + '.tmp'
+        self.append_key = append_key
+        self.writer = None
+        self.rows = 0
+        self.pending = []      # partes ainda não gravadas (menos de ROW_GROUP_SIZE linhas no total)
+        self.pending_rows = 0
+
+    def _old_groups(self):
+        """Partes da tabela atual (Parquet, ou o CSV legado ainda não migrado)."""
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if os.path.exists(self.path):
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=ROW_GROUP_SIZE):
+                yield pa.Table.from_batches([batch]).to_pandas()
+        elif os.path.exists(self.csv_path):
+            yield pd.read_csv(self.csv_path, parse_dates=['date'])
+
+    def _open(self, df: 'pd.DataFrame'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        self.writer = pq.ParquetWriter(self.tmp_path, schema)
+        if self.append_key:
+            first_key = df[self.append_key].min()
+            for group in self._old_groups():
+                self.write(group[group[self.append_key] < first_key])
+
+    def write(self, df: 'pd.DataFrame'):
+        import pyarrow as pa
+
+        if df.empty and self.writer is not None:
+            return
+        if self.writer is None:
+            self._open(df)
+        self.pending.append(pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False))
+        self.pending_rows += len(df)
+        if self.pending_rows >= ROW_GROUP_SIZE:
+            self._flush()
+        self.rows += len(df)
+        count_rows('rows_out', len(df))
+
+    def _flush(self, final: bool = False):
+        """Grava os row groups completos das partes pendentes (com `final`, também o resto)."""
+        import pyarrow as pa
+
+        if not self.pending:
+            return
+        table = pa.concat_tables(self.pending)
+        n = table.num_rows if final else table.num_rows - table.num_rows % ROW_GROUP_SIZE
+        if n:
+            self.writer.write_table(table.slice(0, n), row_group_size=ROW_GROUP_SIZE)
+        rest = table.slice(n)
+        self.pending = [rest] if rest.num_rows else []
+        self.pending_rows = rest.num_rows
+
+    def close(self) -> str:
+        """Finaliza e publica o arquivo. Sem nenhuma parte gravada, mantém o atual."""
+        if self.writer is None:
+            return self.path
+        self._flush(final=True)
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.remove(self.tmp_path)
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def append_table(df: 'pd.DataFrame', kind: str, symbol: str, key: str = 'timestamp', data_dir: str = None,
+                 timeframe: str = None) -> str:
+    """
+    Acrescenta `df` (ordenado por `key`) à tabela existente de `symbol`,
+    substituindo as linhas a partir do primeiro `key` novo (ex.: a vela do
+    dia, que pode ter sido salva incompleta). A gravação é atômica.
+    """
+    with TableWriter(kind, symbol, append_key=key, data_dir=data_dir, timeframe=timeframe) as writer:
+        writer.write(df)
+    return writer.path
+
+
+def last_value(kind: str, symbol: str, column: str = 'timestamp', data_dir: str = None,
+               timeframe: str = None):
+    """
+    Retorna o maior valor de `column` na tabela de `symbol` (lendo só essa
+    coluna), ou None se a tabela não existir ou estiver vazia.
+    """
+    try:
+        df = read_table(kind, symbol, columns=[column], data_dir=data_dir, timeframe=timeframe)
+    except FileNotFoundError:
+        return None
+    if df.empty:
+        return None
+    return df[column].max()
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 do conteúdo de um arquivo (None se não existir)."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate(data_dir: str = None, remove_csv: bool = False):
+    """
+    Converte todos os CSVs de ohlcv/, features/ e labels/ em `data_dir`
+    para Parquet. Com `remove_csv`, apaga o CSV após a conversão.
+    """
+    import pandas as pd
+
+    data_dir = data_dir or config.DATA_DIR
+    for kind in KINDS:
+        for symbol in list_symbols(kind, data_dir=data_dir, timeframe='1d'):
+            csv_path = table_path(kind, symbol, ext='.csv', data_dir=data_dir, timeframe='1d')
+            if not os.path.exists(csv_path):
+                continue
+            try:
+                df = pd.read_csv(csv_path, parse_dates=['date'])
+                out_path = write_table(df, kind, symbol, data_dir=data_dir, timeframe='1d')
+                if remove_csv:
+                    os.remove(csv_path)
+                print(f"[OK] {csv_path} → {out_path}")
+            except Exception as e:
+                print(f"[ERRO] {csv_path}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazenamento colunar dos dados do pipeline")
+    parser.add_argument('--migrate', action='store_true', help='Converte os CSVs existentes em DATA_DIR para Parquet')
+    parser.add_argument('--data-dir', type=str, default=None, help='Diretório de dados (padrão: DATA_DIR)')
+    parser.add_argument('--remove-csv', action='store_true', help='Remove os CSVs após a conversão')
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate(args.data_dir, remove_csv=args.remove_csv)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import heapq
+import argparse
+from abc import ABC, abstractmethod
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from src.config import TIMEFRAME
+from src.indicators import IndicatorState, INDICATOR_COLS, history_state
+from src.inference import FEATURE_COLS, score_rows
+from src.storage import list_symbols, read_table, timeframe_dir
+
+# Vela fechada recebida do feed
+Candle = namedtuple('Candle', ['symbol', 'timestamp', 'open', 'high', 'low', 'close', 'volume'])
+
+
+class CandleFeed(ABC):
+    """
+    Interface de um feed de velas: iterar devolve Candle à medida que
+    cada vela fecha, em ordem de timestamp.
+    """
+
+    @abstractmethod
+    def __iter__(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class ReplayFeed(CandleFeed):
+    """
+    Reproduz o OHLCV gravado de `symbols` a partir de `start` (timestamp
+    em ms), intercalando os símbolos em ordem de timestamp. Com `speed`
+    > 0, espera entre velas o intervalo real dividido por `speed` (ex.:
+    86400 toca um dia por segundo); com 0, o mais rápido possível.
+    """
+
+    def __init__(self, symbols: list, timeframe: str = TIMEFRAME, start: int = None, speed: float = 0.0):
+        self.symbols = symbols
+        self.timeframe = timeframe
+        self.start = start
+        self.speed = speed
+
+    def _rows(self, symbol: str):
+        df = read_table('ohlcv', symbol, timeframe=self.timeframe).sort_values('timestamp')
+        if self.start is not None:
+            df = df[df['timestamp'] >= self.start]
+        cols = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+        for ts, o, h, l, c, v in df[cols].itertuples(index=False, name=None):
+            yield Candle(symbol, int(ts), o, h, l, c, v)
+
+    def __iter__(self):
+        merged = heapq.merge(*(self._rows(s) for s in self.symbols), key=lambda c: c.timestamp)
+        last_ts = None
+        for candle in merged:
+            if self.speed > 0 and last_ts is not None and candle.timestamp > last_ts:
+                time.sleep((candle.timestamp - last_ts) / 1000 / self.speed)
+            last_ts = candle.timestamp
+            yield candle
+
+
+def _json_safe(event: dict) -> dict:
+    """Troca NaN (indicadores no aquecimento, proba ausente) por None: NaN não é JSON válido."""
+    return {k: None if isinstance(v, float) and v != v else v for k, v in event.items()}
+
+
+class StreamEngine:
+    """
+    Atualiza os indicadores de cada símbolo vela a vela (IndicatorState,
+    com janelas em buffers circulares de tamanho fixo) e emite o sinal de
+    compra do modelo treinado a cada vela fechada.
+    """
+
+    def __init__(self, timeframe: str = TIMEFRAME, pooled: bool = False):
+        self.timeframe = timeframe
+        self.pooled = pooled
+        self.states = {}
+        self.latencies = []
+
+    def warmup(self, symbol: str, before: int = None):
+        """Aquece os indicadores com o histórico gravado anterior a `before`."""
+        df = read_table('ohlcv', symbol, timeframe=self.timeframe).sort_values('timestamp')
+        if before is not None:
+            df = df[df['timestamp'] < before]
+        self.states[symbol] = history_state(df)
+
+    def on_candle(self, candle: Candle, received: float = None) -> dict:
+        """
+        Processa uma vela fechada e retorna o evento: indicadores, sinal
+        (None no aquecimento ou sem modelo) e latência (ms) desde `received`,
+        o instante em que o feed entregou a vela (padrão: agora).
+        """
+        received = time.perf_counter() if received is None else received
+        state = self.states.setdefault(candle.symbol, IndicatorState())
+        values = state.update(candle.high, candle.low, candle.close, candle.volume)
+        row = dict(zip(['open', 'high', 'low', 'close', 'volume'], candle[2:]), **values)
+        event = {'symbol': candle.symbol, 'timestamp': candle.timestamp,
+                 **{c: float(values[c]) for c in INDICATOR_COLS}, 'signal': None, 'proba': None}
+
+        x = np.array([row[c] for c in FEATURE_COLS], dtype=float)
+        if not np.isnan(x).any():
+            result, errors = score_rows({candle.symbol: x}, self.timeframe, self.pooled)
+            if candle.symbol in errors:
+                event['error'] = str(errors[candle.symbol])
+            else:
+                event['signal'] = int(result.at[candle.symbol, 'signal'])
+                event['proba'] = float(result.at[candle.symbol, 'proba'])
+
+        event['latency_ms'] = (time.perf_counter() - received) * 1000
+        self.latencies.append(event['latency_ms'])
+        return event
+
+    def run(self, feed: CandleFeed, output: str = None, verbose: bool = True) -> list:
+        """
+        Consome `feed` até o fim, emitindo um evento por vela. Com `output`,
+        grava os eventos em JSON lines (NaN como null). Retorna a lista de
+        eventos. A latência de cada evento vai da entrega da vela pelo feed
+        até o sinal pronto: não inclui o tempo gasto dentro do feed (leitura
+        do disco, espera do replay ou da rede) para produzir a vela.
+        """
+        events = []
+        out = open(output, 'a', encoding='utf-8') if output else None
+        try:
+            for candle in feed:
+                event = self.on_candle(candle, received=time.perf_counter())
+                events.append(event)
+                if out:
+                    out.write(json.dumps(_json_safe(event), allow_nan=False) + '\n')
+                if verbose and event['signal'] == 1:
+                    date = pd.to_datetime(candle.timestamp, unit='ms')
+                    print(f"[COMPRA] {candle.symbol} {date} (p={event['proba']:.2f}, {event['latency_ms']:.2f}ms)")
+        finally:
+            feed.close()
+            if out:
+                out.close()
+        return events
+
+    def latency_summary(self) -> str:
+        if not self.latencies:
+            return "Nenhum evento processado."
+        lat = np.array(self.latencies)
+        return (f"{len(lat)} eventos | latência p50 {np.percentile(lat, 50):.2f}ms, "
+                f"p99 {np.percentile(lat, 99):.2f}ms, máx {lat.max():.2f}ms")
+
+
+def main(symbols: list = None, last: int = 100, speed: float = 0.0, timeframe: str = TIMEFRAME,
+         pooled: bool = False, output: str = None):
+    """
+    Reproduz as últimas `last` velas de cada símbolo (o histórico anterior
+    aquece os indicadores) e imprime os sinais emitidos e as latências.
+    """
+    symbols = symbols or list_symbols('ohlcv', timeframe=timeframe)
+    engine = StreamEngine(timeframe, pooled)
+    # Início comum: a `last`-ésima vela mais recente entre os símbolos
+    starts = []
+    for symbol in symbols:
+        ts = read_table('ohlcv', symbol, columns=['timestamp'], timeframe=timeframe)['timestamp'].sort_values()
+        if len(ts):
+            starts.append(int(ts.iloc[max(0, len(ts) - last)]))
+    start = min(starts) if starts else None
+    for symbol in symbols:
+        engine.warmup(symbol, before=start)
+
+    output = output or os.path.join(timeframe_dir(timeframe), 'stream_signals.jsonl')
+    engine.run(ReplayFeed(symbols, timeframe, start=start, speed=speed), output=output)
+    print(engine.latency_summary())
+    print(f"Eventos gravados em: {output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sinais em streaming a partir de um feed de velas (replay local)")
+    parser.add_argument('--symbols', nargs='+', default=None, help='Símbolos (padrão: todos com OHLCV)')
+    parser.add_argument('--last', type=int, default=100, help='Velas mais recentes a reproduzir por símbolo')
+    parser.add_argument('--speed', type=float, default=0.0, help='Aceleração do replay (0: sem espera; 86400: 1 dia/s)')
+    parser.add_argument('--pooled', action='store_true', help='Usa o modelo pooled')
+    parser.add_argument('--output', type=str, default=None, help='Arquivo JSON lines dos eventos')
+    parser.add_argument('--timeframe', type=str, default=TIMEFRAME, help="Timeframe das velas (ex.: '1d', '1h')")
+    args = parser.parse_args()
+    main(args.symbols, args.last, args.speed, args.timeframe, args.pooled, args.output)
@@ -0,0 +1,36 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Raiz do repositório no path: os testes importam o pacote src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """DATA_DIR temporário para o teste (config.DATA_DIR é lido na chamada)."""
+    # No __dict__ do módulo: getattr resolveria (e validaria) o .env antes da troca
+    monkeypatch.setitem(vars(config), 'DATA_DIR', str(tmp_path))
+    return str(tmp_path)
+
+
+def make_ohlcv(n_bars: int, seed: int = 0, start: str = '2020-01-01') -> pd.DataFrame:
+    """OHLCV diário sintético (passeio aleatório), com as colunas do fetch."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.03, n_bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.01, n_bars))
+    date = pd.date_range(start, periods=n_bars, freq='D')
+    return pd.DataFrame({
+        'timestamp': date.as_unit('ms').asi8,
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + spread),
+        'low': np.minimum(open_, close) * (1 - spread),
+        'close': close,
+        'volume': rng.lognormal(10, 1, n_bars),
+        'date': date,
+    })
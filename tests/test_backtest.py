@@ -0,0 +1,33 @@
+import numpy as np
+import sklearn.ensemble
+from src.backtest import _walk_forward
+from src.label import HORIZON
+
+
+class LastTrainDate:
+    """No lugar do RandomForest: "prevê" a última data vista no treino."""
+
+    def __init__(self, **params):
+        pass
+
+    def fit(self, X, y):
+        self.last = X[:, 0].max()
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.last)
+
+
+def test_walk_forward_only_uses_past_labels(monkeypatch):
+    monkeypatch.setattr(sklearn.ensemble, 'RandomForestClassifier', LastTrainDate)
+    # Labels até a vela 299; as features vão até a 306 (as últimas HORIZON velas ainda sem label)
+    train_dates = np.arange(300)
+    test_dates = np.arange(0, 307, 3)
+    signal = _walk_forward(train_dates, train_dates[:, None].astype(float), np.zeros(300),
+                           test_dates, test_dates[:, None].astype(float), {}, 1)
+
+    scored = np.isfinite(signal)
+    assert scored.any() and not scored[0]
+    assert scored[test_dates >= 299].all()
+    # O label da última vela de treino (fechamento HORIZON velas à frente) já era conhecido na data avaliada
+    assert (signal[scored] + HORIZON < test_dates[scored]).all()
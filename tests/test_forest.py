@@ -0,0 +1,32 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from conftest import make_ohlcv
+from src.features import generate_features
+from src.forest import CompiledForest, compile_forest, export_forest
+from src.label import generate_labels
+from src.schema import FEATURE_COLS
+
+
+def trained_forest():
+    df = generate_labels(generate_features(make_ohlcv(600, seed=4)))
+    model = RandomForestClassifier(n_estimators=25, min_samples_leaf=3, random_state=0)
+    return model.fit(df[FEATURE_COLS], df['label']), df[FEATURE_COLS]
+
+
+def test_compiled_forest_matches_sklearn(tmp_path):
+    model, X = trained_forest()
+    compiled = CompiledForest.load(export_forest(model, str(tmp_path / 'model.npz'), symbols=['AAA']))
+
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    # Sem nomes de coluna (matriz na ordem de FEATURE_COLS) e com o extra gravado junto
+    np.testing.assert_array_equal(compiled.predict(X.to_numpy()), model.predict(X))
+    assert list(compiled.extra['symbols']) == ['AAA']
+
+
+def test_compiled_forest_follows_missing_value_side():
+    model, X = trained_forest()
+    X = X.copy()
+    X.iloc[::7, 3] = np.nan
+    compiled = CompiledForest(compile_forest(model))
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from conftest import make_ohlcv
+from src.features import generate_features
+from src.indicators import (INDICATOR_COLS, IndicatorState, compute_rows, compute_history, history_state,
+                            update_features, check_parity)
+from src.storage import read_table, write_table
+
+SYMBOL = 'TEST'
+
+
+def assert_same_features(inc, full):
+    assert inc['timestamp'].tolist() == full['timestamp'].tolist()
+    a = inc[INDICATOR_COLS].to_numpy(dtype=float)
+    b = full[INDICATOR_COLS].to_numpy(dtype=float)
+    np.testing.assert_allclose(a, b, rtol=1e-9, atol=1e-9)
+
+
+def test_update_after_append_matches_full_history(data_dir):
+    ohlcv = make_ohlcv(400)
+    write_table(ohlcv.iloc[:300], 'ohlcv', SYMBOL)
+    update_features(SYMBOL)
+
+    # Novas velas acrescentadas pelo fetch: só elas (e a última processada) são recalculadas
+    write_table(ohlcv, 'ohlcv', SYMBOL)
+    _, n_rows = update_features(SYMBOL)
+    assert n_rows == 101
+
+    assert_same_features(read_table('features', SYMBOL), generate_features(ohlcv.copy()))
+
+
+def test_update_after_revised_last_candle(data_dir):
+    ohlcv = make_ohlcv(300, seed=1)
+    write_table(ohlcv.iloc[:200], 'ohlcv', SYMBOL)
+    update_features(SYMBOL)
+
+    # A última vela processada foi revisada (ainda estava aberta) e chegaram outras
+    ohlcv.loc[199, ['close', 'high']] *= 1.05
+    write_table(ohlcv, 'ohlcv', SYMBOL)
+    update_features(SYMBOL)
+
+    assert_same_features(read_table('features', SYMBOL), generate_features(ohlcv.copy()))
+
+
+def test_check_parity_in_chunks():
+    assert check_parity(make_ohlcv(500, seed=2), chunks=7) <= 1e-9
+
+
+
+def assert_same_state(got, expected):
+    assert got.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None:
+            assert got[key] is None, key
+        else:
+            np.testing.assert_allclose(got[key], value, rtol=1e-12, err_msg=key)
+
+
+@pytest.mark.parametrize('n_bars', [1, 14, 26, 60, 400])
+def test_compute_history_matches_candle_by_candle(n_bars):
+    ohlcv = make_ohlcv(n_bars, seed=3)
+    expected, expected_snapshot = compute_rows(IndicatorState(), ohlcv)
+    got, snapshot = compute_history(ohlcv)
+    assert_same_state(snapshot, expected_snapshot)
+    assert_same_state(history_state(ohlcv).to_dict(), _loop_state(ohlcv))
+    if len(expected):
+        assert_same_features(got, expected)
+    else:
+        assert got.empty
+
+
+def _loop_state(ohlcv):
+    state = IndicatorState()
+    for high, low, close, volume in ohlcv[['high', 'low', 'close', 'volume']].itertuples(index=False, name=None):
+        state.update(high, low, close, volume)
+    return state.to_dict()
@@ -0,0 +1,19 @@
+import pandas as pd
+from conftest import make_ohlcv
+from src.features import generate_features
+from src.panel import generate_features_panel
+
+
+def test_panel_matches_generate_features():
+    # Históricos de tamanhos diferentes: o painel alinha pela última vela
+    frames = {
+        'AAA': make_ohlcv(400, seed=1),
+        'BBB': make_ohlcv(150, seed=2, start='2020-09-01'),
+        'CCC': make_ohlcv(40, seed=3, start='2021-01-01'),
+    }
+    panel = generate_features_panel({symbol: df.copy() for symbol, df in frames.items()})
+
+    assert list(panel) == list(frames)
+    for symbol, df in frames.items():
+        pd.testing.assert_frame_equal(panel[symbol], generate_features(df.copy()),
+                                      check_exact=False, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,26 @@
+from conftest import make_ohlcv
+from src import model
+from src.pipeline import run_dag
+from src.storage import write_table
+
+SKIPPED = 'pulado: entradas inalteradas'
+
+
+def test_second_run_skips_unchanged_stages(data_dir, monkeypatch):
+    # Florestas pequenas: o teste é do DAG, não do modelo
+    monkeypatch.setitem(model.MODEL_PARAMS, 'n_estimators', 5)
+    ohlcv = make_ohlcv(300)
+    for symbol in ('AAA', 'BBB'):
+        write_table(ohlcv, 'ohlcv', symbol)
+
+    first = run_dag(timeframe='1d', workers=1)
+    assert all(reasons == {'executado: sem manifesto': ['AAA', 'BBB']} for reasons in first.values())
+
+    second = run_dag(timeframe='1d', workers=1)
+    assert all(reasons == {SKIPPED: ['AAA', 'BBB']} for reasons in second.values())
+
+    # Uma vela nova em AAA: só ele passa de novo pelas etapas
+    write_table(make_ohlcv(301), 'ohlcv', 'AAA')
+    third = run_dag(timeframe='1d', workers=1)
+    assert all(reasons[SKIPPED] == ['BBB'] for reasons in third.values())
+    assert third['features']['executado: entradas mudaram'] == ['AAA']
@@ -0,0 +1,32 @@
+import os
+import pytest
+from src import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def no_required_env(monkeypatch):
+    # Importar os comandos não pode ler nem validar as variáveis obrigatórias do .env
+    for name in ('CCXT_EXCHANGE', 'CG_CURRENCY', 'DATA_DIR', 'MARKET_DATA_DIR'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('PYTHONPATH', ROOT)
+
+
+@pytest.fixture(scope='module')
+def budget_ms():
+    # Relativo ao import do numpy nesta máquina, não um tempo fixo
+    return startup.budget()
+
+
+@pytest.mark.parametrize('command', list(startup.COMMANDS))
+def test_startup_within_budget(command, budget_ms):
+    profile = startup.profile_command(command)
+    assert not profile['forbidden'], f"{command} importa {', '.join(profile['forbidden'])} na partida"
+    assert profile['import_ms'] <= budget_ms, \
+        f"{command}: import em {profile['import_ms']:.0f}ms (orçamento {budget_ms:.0f}ms)"
+
+
+def test_check_reports_forbidden_import(monkeypatch):
+    monkeypatch.setitem(startup.COMMANDS, 'heavy', ['src.model'])
+    assert not startup.check(['heavy'], repeat=1)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from conftest import make_ohlcv
+from src.storage import ROW_GROUP_SIZE, TableWriter, append_table, read_table, read_tail, table_path, write_table
+
+SYMBOL = 'TEST'
+
+
+def row_groups(kind: str = 'ohlcv') -> list:
+    meta = pq.ParquetFile(table_path(kind, SYMBOL)).metadata
+    return [meta.row_group(i).num_rows for i in range(meta.num_row_groups)]
+
+
+def assert_full_groups(n_rows: int):
+    # Todos os row groups com ROW_GROUP_SIZE linhas, menos o último
+    sizes = row_groups()
+    assert sum(sizes) == n_rows
+    assert len(sizes) == -(-n_rows // ROW_GROUP_SIZE)
+    assert all(size == ROW_GROUP_SIZE for size in sizes[:-1])
+
+
+def test_table_writer_round_trip(data_dir):
+    ohlcv = make_ohlcv(5000)
+    with TableWriter('ohlcv', SYMBOL) as writer:
+        for start in range(0, len(ohlcv), 300):
+            writer.write(ohlcv.iloc[start:start + 300])
+
+    pd.testing.assert_frame_equal(read_table('ohlcv', SYMBOL), ohlcv)
+    assert_full_groups(len(ohlcv))
+    pd.testing.assert_frame_equal(read_tail('ohlcv', SYMBOL, 5), ohlcv.iloc[-5:].reset_index(drop=True))
+
+
+def test_table_writer_error_keeps_previous_table(data_dir):
+    ohlcv = make_ohlcv(100)
+    write_table(ohlcv, 'ohlcv', SYMBOL)
+    try:
+        with TableWriter('ohlcv', SYMBOL) as writer:
+            writer.write(ohlcv.iloc[:10])
+            raise RuntimeError('falha no meio da gravação')
+    except RuntimeError:
+        pass
+    pd.testing.assert_frame_equal(read_table('ohlcv', SYMBOL), ohlcv)
+
+
+def test_append_replaces_overlap_and_keeps_groups_compact(data_dir):
+    ohlcv = make_ohlcv(3000)
+    write_table(ohlcv.iloc[:2500], 'ohlcv', SYMBOL)
+
+    # A última vela gravada foi revisada: o append a substitui
+    revised = ohlcv.copy()
+    revised.loc[2499, 'close'] *= 1.05
+    append_table(revised.iloc[2499:2510], 'ohlcv', SYMBOL)
+    # Appends pequenos e sucessivos (como o fetch incremental)
+    for start in range(2510, 3000, 10):
+        append_table(revised.iloc[start:start + 10], 'ohlcv', SYMBOL)
+
+    pd.testing.assert_frame_equal(read_table('ohlcv', SYMBOL), revised)
+    assert_full_groups(len(revised))
+    assert np.isclose(read_tail('ohlcv', SYMBOL, 501)['close'].iloc[0], revised['close'].iloc[2499])